@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recapitulatifsemestriel',
+            name='fichier_donnees',
+            field=models.FileField(blank=True, null=True, upload_to='recapitulatifs/'),
+        ),
+    ]
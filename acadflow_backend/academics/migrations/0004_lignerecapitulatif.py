@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_recapitulatifsemestriel_fichier_donnees'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LigneRecapitulatif',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('rang', models.PositiveIntegerField()),
+                ('matricule', models.CharField(max_length=20)),
+                ('nom_complet', models.CharField(max_length=200)),
+                ('moyennes_ue', models.JSONField(blank=True, default=list)),
+                ('moyenne_semestre', models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True)),
+                ('credits_obtenus', models.PositiveIntegerField(default=0)),
+                ('credits_requis', models.PositiveIntegerField(default=0)),
+                ('mention', models.CharField(blank=True, max_length=20)),
+                ('decision', models.CharField(blank=True, max_length=50)),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.etudiant')),
+                ('recapitulatif', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='academics.recapitulatifsemestriel')),
+            ],
+            options={
+                'db_table': 'lignes_recapitulatifs',
+                'ordering': ['recapitulatif', 'rang'],
+                'indexes': [models.Index(fields=['recapitulatif', 'rang'], name='lignes_reca_recapit_8b5381_idx'), models.Index(fields=['recapitulatif', 'decision'], name='lignes_reca_recapit_0eb9bb_idx'), models.Index(fields=['recapitulatif', 'matricule'], name='lignes_reca_recapit_c18c9c_idx')],
+                'unique_together': {('recapitulatif', 'etudiant')},
+            },
+        ),
+    ]
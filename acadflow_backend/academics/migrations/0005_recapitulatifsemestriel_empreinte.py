@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_lignerecapitulatif'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recapitulatifsemestriel',
+            name='empreinte',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0005_recapitulatifsemestriel_empreinte'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recapitulatifsemestriel',
+            name='fichier_donnees',
+        ),
+    ]
@@ -279,6 +279,9 @@ class RecapitulatifSemestriel(TimestampedModel):
     fichier_pdf = models.FileField(upload_to='recapitulatifs/', null=True, blank=True)
     fichier_excel = models.FileField(upload_to='recapitulatifs/', null=True, blank=True)
     
+    # Empreinte des données d'entrée : régénération inutile si elle n'a pas changé
+    empreinte = models.CharField(max_length=64, blank=True)
+    
     def __str__(self):
         return f"Récap {self.classe.nom} - {self.semestre.nom} - {self.session.nom}"
     
@@ -286,6 +289,36 @@ class RecapitulatifSemestriel(TimestampedModel):
         db_table = 'recapitulatifs_semestriels'
         unique_together = ['classe', 'semestre', 'session', 'annee_academique']
 
+class LigneRecapitulatif(TimestampedModel):
+    """Ligne d'un récapitulatif semestriel : résultats d'un étudiant"""
+    recapitulatif = models.ForeignKey(
+        RecapitulatifSemestriel, on_delete=models.CASCADE, related_name='lignes'
+    )
+    etudiant = models.ForeignKey('users.Etudiant', on_delete=models.CASCADE)
+    rang = models.PositiveIntegerField()
+    
+    matricule = models.CharField(max_length=20)
+    nom_complet = models.CharField(max_length=200)
+    moyennes_ue = models.JSONField(default=list, blank=True)
+    moyenne_semestre = models.DecimalField(max_digits=4, decimal_places=2, null=True, blank=True)
+    credits_obtenus = models.PositiveIntegerField(default=0)
+    credits_requis = models.PositiveIntegerField(default=0)
+    mention = models.CharField(max_length=20, blank=True)
+    decision = models.CharField(max_length=50, blank=True)
+    
+    def __str__(self):
+        return f"{self.recapitulatif} - {self.matricule}"
+    
+    class Meta:
+        db_table = 'lignes_recapitulatifs'
+        unique_together = ['recapitulatif', 'etudiant']
+        ordering = ['recapitulatif', 'rang']
+        indexes = [
+            models.Index(fields=['recapitulatif', 'rang']),
+            models.Index(fields=['recapitulatif', 'decision']),
+            models.Index(fields=['recapitulatif', 'matricule']),
+        ]
+
 class ParametrageSysteme(TimestampedModel):
     """Paramètres système"""
     cle = models.CharField(max_length=100, unique=True)
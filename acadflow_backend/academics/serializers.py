@@ -1,9 +1,11 @@
 # academics/serializers.py - Version corrigée avec tous les imports
 from rest_framework import serializers
+from django.db.models import Count, Q
 from .models import (
     AnneeAcademique, Session, Semestre, Classe, UE, EC, 
     TypeEvaluation, ConfigurationEvaluationEC
 )
+from core.contexte import ContexteAcademique
 from core.serializers import FiliereSerializer, OptionSerializer, NiveauSerializer
 
 class AnneeAcademiqueSerializer(serializers.ModelSerializer):
@@ -33,7 +35,18 @@ class ClasseSerializer(serializers.ModelSerializer):
         model = Classe
         fields = '__all__'
     
+    @staticmethod
+    def optimiser_queryset(queryset):
+        """Charge les relations et l'effectif en une requête pour toute la liste"""
+        return queryset.select_related(
+            'filiere', 'option', 'niveau', 'annee_academique', 'responsable_classe__user'
+        ).annotate(
+            effectif_actuel=Count('inscription', filter=Q(inscription__active=True), distinct=True)
+        )
+    
     def get_effectif_actuel(self, obj):
+        if hasattr(obj, 'effectif_actuel'):
+            return obj.effectif_actuel
         try:
             return obj.inscription_set.filter(active=True).count()
         except:
@@ -49,7 +62,15 @@ class UESerializer(serializers.ModelSerializer):
         model = UE
         fields = '__all__'
     
+    @staticmethod
+    def optimiser_queryset(queryset):
+        return queryset.select_related('niveau', 'semestre').annotate(
+            nombre_ec=Count('elements_constitutifs', filter=Q(elements_constitutifs__actif=True), distinct=True)
+        )
+    
     def get_nombre_ec(self, obj):
+        if hasattr(obj, 'nombre_ec'):
+            return obj.nombre_ec
         return obj.elements_constitutifs.filter(actif=True).count()
 
 class ECSerializer(serializers.ModelSerializer):
@@ -61,8 +82,16 @@ class ECSerializer(serializers.ModelSerializer):
         model = EC
         fields = '__all__'
     
+    @staticmethod
+    def optimiser_queryset(queryset):
+        return queryset.select_related('ue').annotate(
+            nombre_classes=Count('ecclasse', filter=Q(ecclasse__classe__active=True), distinct=True)
+        )
+    
     def get_nombre_classes(self, obj):
-        return obj.classes.filter(active=True).count()
+        if hasattr(obj, 'nombre_classes'):
+            return obj.nombre_classes
+        return obj.ecclasse_set.filter(classe__active=True).count()
 
 class TypeEvaluationSerializer(serializers.ModelSerializer):
     nombre_utilisations = serializers.SerializerMethodField()
@@ -71,7 +100,15 @@ class TypeEvaluationSerializer(serializers.ModelSerializer):
         model = TypeEvaluation
         fields = '__all__'
     
+    @staticmethod
+    def optimiser_queryset(queryset):
+        return queryset.annotate(
+            nombre_utilisations=Count('configurationevaluationec', distinct=True)
+        )
+    
     def get_nombre_utilisations(self, obj):
+        if hasattr(obj, 'nombre_utilisations'):
+            return obj.nombre_utilisations
         return obj.configurationevaluationec_set.count()
 
 class ConfigurationEvaluationECSerializer(serializers.ModelSerializer):
@@ -219,7 +256,7 @@ class UECompleteSerializer(serializers.ModelSerializer):
         from users.models import Inscription
         
         try:
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             
             # Nombre d'étudiants concernés
             classes = obj.niveau.classe_set.filter(
@@ -301,7 +338,7 @@ class ECDetailSerializer(serializers.ModelSerializer):
         from evaluations.models import MoyenneEC
         
         try:
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             moyennes = MoyenneEC.objects.filter(
                 ec=obj,
                 annee_academique=annee_active
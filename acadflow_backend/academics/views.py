@@ -3,20 +3,25 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count, Sum, Avg
+from django.db.models import Q, Count, Sum, Avg, Case, When, Value, TextField
 from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 
 from .models import (
     AnneeAcademique, RecapitulatifSemestriel, Session, Semestre, Classe, UE, EC,
-    TypeEvaluation, ConfigurationEvaluationEC
+    TypeEvaluation, ConfigurationEvaluationEC, ParametrageSysteme
 )
 from .serializers import (
     AnneeAcademiqueSerializer, SessionSerializer, SemestreSerializer,
     ClasseSerializer, UESerializer, ECSerializer, UEDetailSerializer,
     TypeEvaluationSerializer, ConfigurationEvaluationECSerializer
 )
+from core import cache
+from core.contexte import ContexteAcademique
+from core.mixins import CacheReferentielMixin, GetConditionnelMixin
+from core.models import Filiere, Niveau
+from users.models import User
 # Import conditionnel pour éviter les erreurs circulaires
 try:
     from core.services import AutomationService, NotificationService
@@ -48,7 +53,7 @@ except ImportError:
         def notifier_fin_semestre(semestre, session):
             return {'success': True, 'notifications_envoyees': 0}
 
-class AnneeAcademiqueViewSet(viewsets.ModelViewSet):
+class AnneeAcademiqueViewSet(GetConditionnelMixin, viewsets.ModelViewSet):
     queryset = AnneeAcademique.objects.all()
     serializer_class = AnneeAcademiqueSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -57,7 +62,7 @@ class AnneeAcademiqueViewSet(viewsets.ModelViewSet):
     def active(self, request):
         """Retourne l'année académique active"""
         try:
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             serializer = self.get_serializer(annee_active)
             return Response(serializer.data)
         except AnneeAcademique.DoesNotExist:
@@ -127,35 +132,48 @@ class AnneeAcademiqueViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        classes = Classe.objects.filter(
+        classes = list(Classe.objects.filter(
             annee_academique=annee,
             active=True
+        ))
+        
+        if not classes:
+            return Response(
+                {'error': 'Aucune classe active pour cette année académique'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Une tâche par classe, exécutées en parallèle par les workers Celery
+        lot = AutomationService.lancer_recapitulatifs_masse(
+            annee, semestre, session, classes
         )
         
-        resultats = {
-            'total_classes': classes.count(),
-            'recaps_generes': 0,
-            'echecs': 0,
-            'details': []
-        }
+        return Response({
+            'message': f'Génération lancée pour {len(classes)} classes',
+            'lot_id': lot.id,
+            'total_classes': len(classes)
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def progression_recaps(self, request, pk=None):
+        """Avancement d'une génération de récapitulatifs en masse"""
+        from evaluations.models import TacheAutomatisee
         
-        for classe in classes:
-            resultat = AutomationService.generer_recapitulatif_semestriel(
-                classe, semestre, session
+        annee = self.get_object()
+        
+        try:
+            lot = TacheAutomatisee.objects.get(
+                pk=request.query_params.get('lot_id'),
+                type_tache='recaps_masse',
+                annee_academique=annee
+            )
+        except (TacheAutomatisee.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'error': 'Lot de génération non trouvé'}, 
+                status=status.HTTP_404_NOT_FOUND
             )
-            
-            if resultat['success']:
-                resultats['recaps_generes'] += 1
-            else:
-                resultats['echecs'] += 1
-            
-            resultats['details'].append({
-                'classe': classe.nom,
-                'statut': 'succès' if resultat['success'] else 'échec',
-                'message': resultat.get('message', resultat.get('error'))
-            })
         
-        return Response(resultats)
+        return Response(AutomationService.progression_lot(lot))
     
     @action(detail=True, methods=['get'])
     def statistiques(self, request, pk=None):
@@ -163,44 +181,28 @@ class AnneeAcademiqueViewSet(viewsets.ModelViewSet):
         annee = self.get_object()
         
         try:
-            from users.models import Inscription
-            from core.models import Filiere, Niveau
+            from users.models import EffectifInscription
+            
+            # Effectifs pré-agrégés, tenus à jour à chaque inscription
+            effectifs = EffectifInscription.objects.filter(annee_academique=annee, nombre__gt=0)
             
             stats = {
                 'nombre_classes': annee.classe_set.filter(active=True).count(),
-                'nombre_inscriptions': Inscription.objects.filter(
-                    annee_academique=annee, active=True
-                ).count(),
-                'inscriptions_par_filiere': [],
-                'inscriptions_par_niveau': []
+                'nombre_inscriptions': effectifs.aggregate(total=Sum('nombre'))['total'] or 0,
+                'inscriptions_par_filiere': [
+                    {'filiere': ligne['filiere__nom'], 'nombre': ligne['total']}
+                    for ligne in effectifs.filter(filiere__actif=True).values(
+                        'filiere_id', 'filiere__nom'
+                    ).annotate(total=Sum('nombre')).order_by('filiere_id')
+                ],
+                'inscriptions_par_niveau': [
+                    {'niveau': ligne['niveau__nom'], 'nombre': ligne['total']}
+                    for ligne in effectifs.filter(niveau__actif=True).values(
+                        'niveau_id', 'niveau__nom'
+                    ).annotate(total=Sum('nombre')).order_by('niveau__cycle_id', 'niveau__numero')
+                ]
             }
             
-            # Statistiques par filière
-            for filiere in Filiere.objects.filter(actif=True):
-                nombre = Inscription.objects.filter(
-                    annee_academique=annee,
-                    classe__filiere=filiere,
-                    active=True
-                ).count()
-                if nombre > 0:
-                    stats['inscriptions_par_filiere'].append({
-                        'filiere': filiere.nom,
-                        'nombre': nombre
-                    })
-            
-            # Statistiques par niveau
-            for niveau in Niveau.objects.filter(actif=True):
-                nombre = Inscription.objects.filter(
-                    annee_academique=annee,
-                    classe__niveau=niveau,
-                    active=True
-                ).count()
-                if nombre > 0:
-                    stats['inscriptions_par_niveau'].append({
-                        'niveau': niveau.nom,
-                        'nombre': nombre
-                    })
-            
             return Response(stats)
             
         except ImportError:
@@ -211,7 +213,7 @@ class AnneeAcademiqueViewSet(viewsets.ModelViewSet):
                 'inscriptions_par_niveau': []
             })
 
-class SessionViewSet(viewsets.ModelViewSet):
+class SessionViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
     queryset = Session.objects.filter(actif=True)
     serializer_class = SessionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -257,7 +259,7 @@ class SessionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(sessions_actives, many=True)
         return Response(serializer.data)
 
-class SemestreViewSet(viewsets.ModelViewSet):
+class SemestreViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
     queryset = Semestre.objects.all()
     serializer_class = SemestreSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -298,7 +300,7 @@ class SemestreViewSet(viewsets.ModelViewSet):
             active=True
         ).distinct()
         
-        serializer = ClasseSerializer(classes, many=True)
+        serializer = ClasseSerializer(ClasseSerializer.optimiser_queryset(classes), many=True)
         return Response(serializer.data)
 
 class ClasseViewSet(viewsets.ModelViewSet):
@@ -307,7 +309,7 @@ class ClasseViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = ClasseSerializer.optimiser_queryset(super().get_queryset())
         filiere_id = self.request.query_params.get('filiere', None)
         niveau_id = self.request.query_params.get('niveau', None)
         annee_id = self.request.query_params.get('annee_academique', None)
@@ -592,7 +594,7 @@ class UEViewSet(viewsets.ModelViewSet):
         return UESerializer
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = UESerializer.optimiser_queryset(super().get_queryset())
         niveau_id = self.request.query_params.get('niveau', None)
         semestre_id = self.request.query_params.get('semestre', None)
         
@@ -637,14 +639,14 @@ class ECViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = ECSerializer.optimiser_queryset(super().get_queryset())
         ue_id = self.request.query_params.get('ue', None)
         classe_id = self.request.query_params.get('classe', None)
         
         if ue_id:
             queryset = queryset.filter(ue_id=ue_id)
         if classe_id:
-            queryset = queryset.filter(classes__id=classe_id)
+            queryset = queryset.filter(ecclasse__classe_id=classe_id)
             
         return queryset
     
@@ -690,22 +692,23 @@ class ECViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Module evaluations non disponible'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class TypeEvaluationViewSet(viewsets.ModelViewSet):
+class TypeEvaluationViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (ConfigurationEvaluationEC,)  # nombre_utilisations
     queryset = TypeEvaluation.objects.filter(actif=True)
     serializer_class = TypeEvaluationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    def get_queryset(self):
+        return TypeEvaluationSerializer.optimiser_queryset(super().get_queryset())
+    
     @action(detail=False, methods=['get'])
     def usage_statistics(self, request):
         """Statistiques d'utilisation des types d'évaluation"""
         stats = []
         for type_eval in self.get_queryset():
-            usage = ConfigurationEvaluationEC.objects.filter(
-                type_evaluation=type_eval
-            ).count()
             stats.append({
                 'type_evaluation': TypeEvaluationSerializer(type_eval).data,
-                'nombre_utilisations': usage
+                'nombre_utilisations': type_eval.nombre_utilisations
             })
         
         return Response(sorted(stats, key=lambda x: x['nombre_utilisations'], reverse=True))
@@ -763,9 +766,12 @@ class ConfigurationEvaluationECViewSet(viewsets.ModelViewSet):
         
         return Response({'message': 'Configuration mise à jour avec succès'})
 
-class RecapitulatifSemestrielViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = RecapitulatifSemestriel.objects.all()
+class RecapitulatifSemestrielViewSet(GetConditionnelMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = RecapitulatifSemestriel.objects.select_related(
+        'classe__niveau', 'classe__filiere', 'semestre', 'session', 'genere_par'
+    )
     permission_classes = [permissions.IsAuthenticated]
+    modeles_dependants = (Classe, Niveau, Filiere, Semestre, Session, User)
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -808,22 +814,68 @@ class RecapitulatifSemestrielViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=True, methods=['get'])
     def donnees_detaillees(self, request, pk=None):
-        """Récupère les données détaillées du récapitulatif"""
+        """
+        Récupère les données détaillées du récapitulatif, par page.
+        
+        Filtres optionnels : etudiant, matricule, decision, mention.
+        """
+        from django.core.paginator import Paginator
+        
         recap = self.get_object()
+        effectif = recap.lignes.count()
         
-        # Charger les données depuis le fichier JSON si disponible
-        donnees = {}
-        if recap.fichier_excel:
-            try:
-                import json
-                with recap.fichier_excel.open('r') as f:
-                    donnees = json.load(f)
-            except:
-                donnees = {'erreur': 'Impossible de charger les données'}
+        filtres = {
+            'etudiant_id': request.query_params.get('etudiant'),
+            'matricule': request.query_params.get('matricule'),
+            'decision': request.query_params.get('decision'),
+            'mention': request.query_params.get('mention'),
+        }
+        
+        try:
+            lignes = recap.lignes.filter(**{champ: valeur for champ, valeur in filtres.items() if valeur})
+            page_size = min(int(request.query_params.get('page_size', 50)), 500)
+            page = int(request.query_params.get('page', 1))
+        except ValueError:
+            return Response(
+                {'error': 'Paramètres invalides'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        paginator = Paginator(lignes, max(page_size, 1))
+        page_obj = paginator.get_page(page)
+        classe = recap.classe
         
         return Response({
             'recap': self.get_serializer(recap).data,
-            'donnees': donnees
+            'donnees': {
+                'classe': {
+                    'nom': classe.nom,
+                    'code': classe.code,
+                    'niveau': classe.niveau.nom,
+                    'filiere': classe.filiere.nom,
+                    'effectif': effectif
+                },
+                'semestre': recap.semestre.nom,
+                'session': recap.session.nom,
+                'date_generation': recap.updated_at.isoformat(),
+                'etudiants': [
+                    {
+                        'etudiant_id': ligne.etudiant_id,
+                        'matricule': ligne.matricule,
+                        'nom_complet': ligne.nom_complet,
+                        'moyennes_ue': ligne.moyennes_ue,
+                        'moyenne_semestre': float(ligne.moyenne_semestre) if ligne.moyenne_semestre is not None else None,
+                        'credits_obtenus': ligne.credits_obtenus,
+                        'credits_requis': ligne.credits_requis,
+                        'mention': ligne.mention or None,
+                        'decision': ligne.decision or None
+                    }
+                    for ligne in page_obj
+                ]
+            },
+            'count': paginator.count,
+            'next': page_obj.next_page_number() if page_obj.has_next() else None,
+            'previous': page_obj.previous_page_number() if page_obj.has_previous() else None
         })
     
     @action(detail=True, methods=['post'])
@@ -836,23 +888,19 @@ class RecapitulatifSemestrielViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         recap = self.get_object()
+        forcer = str(request.data.get('force', '')).lower() in ['1', 'true', 'oui']
         
-        # Supprimer l'ancien récap
-        recap.delete()
-        
-        # Régénérer
+        # Reconstruit seulement si les données d'entrée ont changé (ou si forcé)
         resultat = AutomationService.generer_recapitulatif_semestriel(
-            recap.classe, recap.semestre, recap.session
+            recap.classe, recap.semestre, recap.session, forcer=forcer
         )
         
         if resultat['success']:
             # Marquer comme généré manuellement
-            try:
-                nouveau_recap = RecapitulatifSemestriel.objects.get(id=resultat['recap_id'])
-                nouveau_recap.genere_par = request.user
-                nouveau_recap.save()
-            except:
-                pass
+            if not resultat.get('reutilise'):
+                RecapitulatifSemestriel.objects.filter(id=resultat['recap_id']).update(
+                    genere_par=request.user, updated_at=timezone.now()
+                )
             
             return Response(resultat)
         else:
@@ -956,17 +1004,7 @@ class SystemeViewSet(viewsets.ViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        parametres = ParametrageSysteme.objects.all()
-        params_data = {}
-        
-        for param in parametres:
-            params_data[param.cle] = {
-                'valeur': param.get_valeur(),
-                'description': param.description,
-                'type': param.type_valeur
-            }
-        
-        return Response(params_data)
+        return Response(ContexteAcademique.parametres_detailles())
     
     @action(detail=False, methods=['post'])
     def modifier_parametres(self, request):
@@ -978,21 +1016,34 @@ class SystemeViewSet(viewsets.ViewSet):
             )
         
         parametres = request.data.get('parametres', {})
+        if not isinstance(parametres, dict):
+            return Response(
+                {'error': 'parametres doit être un objet {cle: valeur}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        for cle, valeur in parametres.items():
-            try:
-                param = ParametrageSysteme.objects.get(cle=cle)
-                param.valeur = str(valeur)
-                param.save()
-            except ParametrageSysteme.DoesNotExist:
-                continue
+        # Une seule requête UPDATE ; les clés inconnues sont ignorées
+        modifies = 0
+        if parametres:
+            modifies = ParametrageSysteme.objects.filter(cle__in=parametres).update(
+                valeur=Case(
+                    *[When(cle=cle, then=Value(str(valeur))) for cle, valeur in parametres.items()],
+                    output_field=TextField()
+                ),
+                updated_at=timezone.now()
+            )
+        if modifies:
+            # update() n'envoie pas de signaux
+            transaction.on_commit(
+                lambda: cache.invalider(cache.espace_modele(ParametrageSysteme))
+            )
         
-        return Response({'message': 'Paramètres mis à jour'})
+        return Response({'message': 'Paramètres mis à jour', 'parametres_modifies': modifies})
     
     @action(detail=False, methods=['get'])
     def statut_automatisations(self, request):
         """Statut des automatisations en cours"""
-        from evaluations.models import TacheAutomatisee
+        from evaluations.models import TacheAutomatisee, MoyenneARecalculer
         
         if request.user.type_utilisateur not in ['admin', 'scolarite']:
             return Response(
@@ -1011,7 +1062,9 @@ class SystemeViewSet(viewsets.ViewSet):
             'taches_terminees': taches_recentes.filter(statut='terminee').count(),
             'taches_erreur': taches_recentes.filter(statut='erreur').count(),
             'derniere_execution': None,
-            'prochaine_execution': None
+            'prochaine_execution': None,
+            'moyennes_a_recalculer': MoyenneARecalculer.objects.count(),
+            'moyennes_en_echec': MoyenneARecalculer.objects.filter(tentatives__gt=0).count()
         }
         
         # Dernière exécution
@@ -0,0 +1,16 @@
+"""
+Application Celery du projet acadflow_backend.
+
+Les tâches sont déclarées avec @shared_task dans les modules tasks.py des
+applications et découvertes automatiquement.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'acadflow_backend.settings')
+
+app = Celery('acadflow_backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -78,7 +78,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -149,6 +149,42 @@ if EMAIL_BACKEND != 'django.core.mail.backends.console.EmailBackend':
 
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@acadflow.com')
 
+# Configuration du cache
+# Avec CACHE_URL (ex. redis://localhost:6379/1), le cache et ses versions sont
+# partagés par tous les processus et serveurs. Sans, un cache en mémoire du
+# processus est utilisé : il ne convient qu'à un déploiement à processus unique.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'acadflow',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'acadflow',
+        }
+    }
+
+# Utilisateurs authentifiés par jeton gardés en mémoire de chaque processus
+# (core.authentication.CachedTokenAuthentication) : nombre et durée en secondes.
+# Uniquement avec CACHE_URL : sans cache partagé, une déconnexion ne serait pas
+# vue des autres processus et le jeton est relu en base à chaque requête
+AUTH_JETON_CACHE_TAILLE = config('AUTH_JETON_CACHE_TAILLE', default=10000, cast=int)
+AUTH_JETON_CACHE_DUREE = config('AUTH_JETON_CACHE_DUREE', default=300, cast=int)
+
+# Synchronisation incrémentale (core.mixins.SynchronisationMixin) : délai en
+# secondes pendant lequel les objets modifiés sont renvoyés à chaque appel,
+# le temps que les transactions plus lentes soient validées
+SYNCHRONISATION_MARGE_SECONDES = config('SYNCHRONISATION_MARGE_SECONDES', default=300, cast=int)
+# Durée de conservation des traces de suppression ; au-delà, un client doit
+# refaire une synchronisation complète
+SYNCHRONISATION_RETENTION_JOURS = config('SYNCHRONISATION_RETENTION_JOURS', default=90, cast=int)
+
 # Configuration Celery
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -157,6 +193,27 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Les récapitulatifs peuvent être générés sur une file dédiée, consommée par
+# un worker à concurrence bornée pour ne pas saturer la base de données.
+# Vide par défaut : file 'celery', consommée par un worker standard. Avec
+# CELERY_FILE_RECAPITULATIFS=recapitulatifs, lancer aussi :
+#   celery -A acadflow_backend worker -Q recapitulatifs
+CELERY_FILE_RECAPITULATIFS = config('CELERY_FILE_RECAPITULATIFS', default='')
+CELERY_TASK_ROUTES = {
+    'core.tasks.generer_recapitulatif_async': {'queue': CELERY_FILE_RECAPITULATIFS},
+} if CELERY_FILE_RECAPITULATIFS else {}
+CELERY_WORKER_CONCURRENCY = config('CELERY_WORKER_CONCURRENCY', default=4, cast=int)
+# Une tâche à la fois par processus : les longues générations ne bloquent pas les suivantes
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Délai (secondes) pendant lequel les saisies de notes successives d'une même
+# classe/EC/session sont regroupées en un seul recalcul des moyennes
+CALCUL_MOYENNES_DELAI_REGROUPEMENT = config('CALCUL_MOYENNES_DELAI_REGROUPEMENT', default=60, cast=int)
+
+# Processus de rendu des PDF, partagés par tous les exports d'un processus
+# serveur (0 : un par cœur)
+RENDU_PDF_PROCESSUS = config('RENDU_PDF_PROCESSUS', default=0, cast=int) or None
+
 # Tâches périodiques Celery
 from celery.schedules import crontab
 
@@ -169,6 +226,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'core.tasks.envoyer_notifications_delais',
         'schedule': crontab(minute=0, hour=8),
     },
+    'propager-moyennes': {
+        'task': 'core.tasks.propager_moyennes_a_recalculer_periodique',
+        'schedule': crontab(minute='*/5'),
+    },
+    'purger-objets-supprimes': {
+        'task': 'core.tasks.purger_objets_supprimes',
+        'schedule': crontab(minute=30, hour=2),
+    },
     'nettoyer-donnees': {
         'task': 'core.tasks.nettoyer_donnees_anciennes',
         'schedule': crontab(minute=0, hour=2, day_of_week=0),
@@ -243,7 +308,9 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 
 # Configuration des sessions
 SESSION_COOKIE_AGE = 86400
-SESSION_SAVE_EVERY_REQUEST = True
+# Session lue depuis le cache, écrite en base seulement lorsqu'elle change
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_SAVE_EVERY_REQUEST = False
 
 # Paramètres de sécurité pour la production
 if not DEBUG:
@@ -0,0 +1,146 @@
+# ========================================
+# FICHIER: core/authentication.py
+# ========================================
+
+"""
+Authentification par jeton sans requête en base.
+
+TokenAuthentication lit le jeton et son utilisateur à chaque appel. Ici,
+l'utilisateur résolu (avec son profil enseignant ou étudiant) est conservé
+dans un cache LRU du processus, borné et à durée de vie limitée. Chaque
+entrée porte la version de son jeton dans le cache partagé (voir
+core.cache) : la déconnexion, la désactivation ou toute modification de
+l'utilisateur change cette version et l'entrée est relue en base, dans
+tous les processus.
+
+Ces versions ne sont vues de tous les processus qu'avec un cache partagé
+(CACHE_URL) : avec un cache local au processus, une déconnexion ne serait
+connue que du processus qui l'a traitée. Le cache des utilisateurs est alors
+désactivé et chaque requête relit le jeton en base.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core import cache
+
+ESPACE_JETON = 'auth_jeton'
+
+
+class CacheLRU:
+    """Dictionnaire borné dont les entrées expirent après `duree` secondes"""
+
+    def __init__(self, taille, duree):
+        self.taille = taille
+        self.duree = duree
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            expiration, valeur = entree
+            if expiration <= time.monotonic():
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return valeur
+
+    def set(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic() + self.duree, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+    def retirer(self, cle):
+        with self._verrou:
+            self._entrees.pop(cle, None)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+def _identifiant_jeton(cle):
+    # Le jeton lui-même n'apparaît pas dans les clés du cache partagé
+    return hashlib.sha256(cle.encode()).hexdigest()[:32]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication dont les utilisateurs résolus sont gardés en mémoire.
+    Une requête authentifiée ne coûte qu'un aller-retour au cache partagé ;
+    sans cache partagé, le jeton est relu en base à chaque requête.
+    """
+
+    utilisateurs = CacheLRU(
+        getattr(settings, 'AUTH_JETON_CACHE_TAILLE', 10000),
+        getattr(settings, 'AUTH_JETON_CACHE_DUREE', 300)
+    )
+
+    def authenticate_credentials(self, key):
+        if not cache.cache_partage():
+            return self._charger(key)
+
+        # Version lue avant le chargement : une invalidation concurrente la
+        # change après coup et l'entrée sera relue
+        version = cache.version(ESPACE_JETON, _identifiant_jeton(key))
+
+        entree = self.utilisateurs.get(key)
+        if entree is not None and entree[0] == version:
+            # Copie : les vues peuvent modifier request.user
+            return copy.copy(entree[1]), entree[2]
+
+        user, token = self._charger(key)
+        self.utilisateurs.set(key, (version, user, token))
+        return copy.copy(user), token
+
+    def _charger(self, key):
+        """Jeton et utilisateur (avec son profil) lus en base"""
+        model = self.get_model()
+        try:
+            token = model.objects.select_related(
+                'user__enseignant', 'user__etudiant'
+            ).get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user = token.user
+        if not user.is_active or not user.actif:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, token
+
+
+def invalider_jetons(cles):
+    """Fait relire en base les utilisateurs de ces jetons, dans tous les processus"""
+    cles = [cle for cle in cles if cle]
+    if not cles:
+        return
+
+    for cle in cles:
+        CachedTokenAuthentication.utilisateurs.retirer(cle)
+
+    def invalider():
+        for cle in cles:
+            cache.invalider(ESPACE_JETON, _identifiant_jeton(cle))
+
+    transaction.on_commit(invalider)
+
+
+def invalider_utilisateur(user_id):
+    """Invalide les jetons d'un utilisateur (désactivation, changement de profil)"""
+    from rest_framework.authtoken.models import Token
+
+    invalider_jetons(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
@@ -0,0 +1,120 @@
+# ========================================
+# FICHIER: core/cache.py
+# ========================================
+
+"""
+Cache à clés versionnées.
+
+Chaque espace de cache (par exemple les statistiques d'une classe pour une
+session) possède un numéro de version conservé dans le cache ; les valeurs
+sont enregistrées sous une clé qui inclut ce numéro. Invalider un espace
+revient à changer sa version : les anciennes valeurs ne sont plus lues et
+expirent d'elles-mêmes.
+
+Les versions étant stockées dans le cache partagé (Redis, voir CACHE_URL),
+tous les processus et serveurs voient la même invalidation.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DUREE_DEFAUT = 300
+
+# Caches propres à chaque processus
+BACKENDS_LOCAUX = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_partage():
+    """
+    Vrai si le cache par défaut est partagé entre les processus. Sinon, une
+    invalidation n'est vue que du processus qui l'a faite : les copies en
+    mémoire du processus ne doivent pas être utilisées.
+    """
+    return settings.CACHES.get('default', {}).get('BACKEND') not in BACKENDS_LOCAUX
+
+
+def _cle(espace, identifiants):
+    return ':'.join([espace] + [str(identifiant) for identifiant in identifiants])
+
+
+def _nouvelle_version():
+    # Dérivée de l'horloge : une version perdue (éviction) n'est jamais réutilisée
+    return int(time.time() * 1000)
+
+
+def version(espace, *identifiants):
+    """Version courante d'un espace de cache"""
+    cle = f'version:{_cle(espace, identifiants)}'
+    valeur = cache.get(cle)
+    if valeur is None:
+        cache.add(cle, _nouvelle_version(), timeout=None)
+        valeur = cache.get(cle)
+    return valeur
+
+
+def versions(*espaces):
+    """Versions courantes de plusieurs espaces, en un seul aller-retour au cache"""
+    cles = [f'version:{espace}' for espace in espaces]
+    valeurs = cache.get_many(cles)
+    for cle in cles:
+        if cle not in valeurs:
+            cache.add(cle, _nouvelle_version(), timeout=None)
+            valeurs[cle] = cache.get(cle)
+    return [valeurs[cle] for cle in cles]
+
+
+def espace_modele(modele):
+    """Espace de cache dont la version change à chaque écriture sur `modele`"""
+    return f'modele:{modele._meta.label_lower}'
+
+
+def invalider(espace, *identifiants):
+    """Rend obsolètes toutes les valeurs en cache d'un espace"""
+    cle = f'version:{_cle(espace, identifiants)}'
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.set(cle, _nouvelle_version(), timeout=None)
+
+
+def suivre_modeles(*modeles):
+    """Invalide l'espace de chaque modèle après toute sauvegarde ou suppression"""
+    from django.db import transaction
+    from django.db.models.signals import post_save, post_delete
+
+    def changer_version(sender, **kwargs):
+        transaction.on_commit(lambda: invalider(espace_modele(sender)))
+
+    for modele in modeles:
+        post_save.connect(changer_version, sender=modele, weak=False,
+                          dispatch_uid=f'cache_{modele._meta.label_lower}_save')
+        post_delete.connect(changer_version, sender=modele, weak=False,
+                            dispatch_uid=f'cache_{modele._meta.label_lower}_delete')
+
+
+def cle_valeur(espace, identifiants, variante=None):
+    """Clé de la valeur courante d'un espace (et d'une variante de cette valeur)"""
+    cle = f'{_cle(espace, identifiants)}:v{version(espace, *identifiants)}'
+    if variante is not None:
+        cle += f':{variante}'
+    return cle
+
+
+def obtenir(espace, identifiants, calcul, timeout=DUREE_DEFAUT, variante=None):
+    """
+    Valeur en cache de l'espace, calculée par `calcul()` si absente.
+
+    `variante` distingue plusieurs valeurs d'un même espace, invalidées
+    ensemble (par exemple les relevés d'un étudiant pour chaque session).
+    """
+    cle = cle_valeur(espace, identifiants, variante)
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = calcul()
+        cache.set(cle, valeur, timeout)
+    return valeur
@@ -0,0 +1,95 @@
+# ========================================
+# FICHIER: core/contexte.py
+# ========================================
+
+"""
+Contexte académique conservé en mémoire du processus.
+
+L'année académique active et les paramètres système sont lus sur de
+nombreux chemins de requête mais ne changent presque jamais. Ils sont gardés
+en mémoire avec la version de leur modèle (voir core.cache.suivre_modeles) :
+chaque lecture ne coûte qu'un aller-retour au cache partagé, et une
+modification faite par n'importe quel processus les fait recharger partout.
+Sans cache partagé, les valeurs sont relues en base à chaque appel.
+"""
+
+import copy
+import threading
+
+from core import cache
+
+
+class ContexteAcademique:
+    """Année académique active et paramètres système, en cache par processus"""
+
+    _valeurs = {}
+    _verrou = threading.Lock()
+
+    @classmethod
+    def _obtenir(cls, modele, charger):
+        if not cache.cache_partage():
+            return charger()
+
+        espace = cache.espace_modele(modele)
+        # Version lue avant le chargement : une écriture concurrente la
+        # change après coup et force un nouveau chargement
+        version = cache.version(espace)
+        en_memoire = cls._valeurs.get(espace)
+        if en_memoire is not None and en_memoire[0] == version:
+            return en_memoire[1]
+
+        valeur = charger()
+        with cls._verrou:
+            cls._valeurs[espace] = (version, valeur)
+        return valeur
+
+    @classmethod
+    def annee_active(cls):
+        """
+        Année académique active (copie modifiable sans effet sur le cache).
+        Lève AnneeAcademique.DoesNotExist si aucune année n'est active.
+        """
+        from academics.models import AnneeAcademique
+
+        annee = cls._obtenir(
+            AnneeAcademique,
+            lambda: AnneeAcademique.objects.filter(active=True).first()
+        )
+        if annee is None:
+            raise AnneeAcademique.DoesNotExist('Aucune année académique active')
+        return copy.copy(annee)
+
+    @classmethod
+    def _parametres(cls):
+        from academics.models import ParametrageSysteme
+
+        return cls._obtenir(ParametrageSysteme, lambda: {
+            parametre.cle: {
+                'valeur': parametre.get_valeur(),
+                'description': parametre.description,
+                'type': parametre.type_valeur
+            }
+            for parametre in ParametrageSysteme.objects.all()
+        })
+
+    @classmethod
+    def parametres_detailles(cls):
+        """Paramètres système avec leur valeur convertie, description et type"""
+        return {cle: dict(details) for cle, details in cls._parametres().items()}
+
+    @classmethod
+    def parametres(cls):
+        """Valeurs converties des paramètres système, par clé"""
+        return {cle: details['valeur'] for cle, details in cls._parametres().items()}
+
+    @classmethod
+    def parametre(cls, cle, defaut=None):
+        """Valeur convertie d'un paramètre système"""
+        details = cls._parametres().get(cle)
+        return details['valeur'] if details is not None else defaut
+
+    @classmethod
+    def vider(cls):
+        """Oublie les valeurs en mémoire du processus (tests, commandes)"""
+        with cls._verrou:
+            cls._valeurs.clear()
@@ -0,0 +1,165 @@
+# ========================================
+# FICHIER: core/exports.py
+# ========================================
+
+"""
+Export XLSX des récapitulatifs semestriels.
+
+Le classeur est écrit en mode streaming (openpyxl write_only) : chaque ligne
+est envoyée au fichier dès qu'elle est construite, et les moyennes sont
+chargées par lots d'étudiants. La mémoire utilisée ne dépend donc pas de
+l'effectif de la classe.
+"""
+
+from itertools import islice
+
+from django.utils import timezone
+
+TAILLE_LOT_ETUDIANTS = 200
+
+
+def _decimal(valeur):
+    return float(valeur) if valeur is not None else None
+
+
+def colonnes_recapitulatif(ues, ecs_par_ue):
+    """
+    Deux lignes d'en-tête : le groupe (UE) puis le détail de chaque colonne.
+    Chaque UE occupe une colonne par EC, puis sa moyenne et ses crédits.
+    """
+    groupes = ['', '']
+    details = ['Matricule', 'Nom et prénom']
+
+    for ue in ues:
+        ecs = ecs_par_ue.get(ue.id, [])
+        groupes += [f'{ue.code} - {ue.nom} ({ue.credits} cr.)'] + [''] * (len(ecs) + 1)
+        details += [ec.code for ec in ecs] + ['Moy. UE', 'Crédits']
+
+    groupes += ['Semestre', '', '', '']
+    details += ['Moyenne', 'Crédits obtenus', 'Mention', 'Décision']
+    return groupes, details
+
+
+def ecrire_recapitulatif_excel(classe, semestre, session, destination, inscriptions=None,
+                               taille_lot=TAILLE_LOT_ETUDIANTS):
+    """
+    Écrit le récapitulatif d'une classe dans `destination` (chemin ou fichier
+    binaire) et retourne le nombre d'étudiants exportés.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    from academics.models import UE, EC
+    from evaluations.models import MoyenneEC, MoyenneUE, MoyenneSemestre
+    from users.models import Inscription
+    from core.services import AutomationService
+
+    annee = classe.annee_academique
+
+    if inscriptions is None:
+        inscriptions = Inscription.objects.filter(classe=classe, active=True)
+    inscriptions = inscriptions.select_related('etudiant__user').order_by(
+        'etudiant__user__last_name', 'etudiant__user__first_name', 'id'
+    )
+
+    ues = list(UE.objects.filter(
+        niveau=classe.niveau,
+        semestre=semestre,
+        actif=True
+    ).order_by('code'))
+    ecs_par_ue = {}
+    for ec in EC.objects.filter(ue__in=ues, actif=True).order_by('code'):
+        ecs_par_ue.setdefault(ec.ue_id, []).append(ec)
+    ecs = [ec for ue in ues for ec in ecs_par_ue.get(ue.id, [])]
+
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet(title=f'{classe.code} {semestre.nom}'[:31])
+    gras = Font(bold=True)
+
+    def entete(valeurs):
+        cellules = []
+        for valeur in valeurs:
+            cellule = WriteOnlyCell(feuille, value=valeur)
+            cellule.font = gras
+            cellules.append(cellule)
+        return cellules
+
+    feuille.append(entete([
+        f'Récapitulatif {classe.nom} - {semestre.nom} - {session.nom} ({annee.libelle})'
+    ]))
+    feuille.append([f'Généré le {timezone.localtime():%d/%m/%Y %H:%M}'])
+    for ligne in colonnes_recapitulatif(ues, ecs_par_ue):
+        feuille.append(entete(ligne))
+
+    nombre = 0
+    iterateur = inscriptions.iterator(chunk_size=taille_lot)
+
+    while True:
+        lot = list(islice(iterateur, taille_lot))
+        if not lot:
+            break
+
+        etudiants_ids = [inscription.etudiant_id for inscription in lot]
+        moyennes_ec = dict(
+            ((etudiant_id, ec_id), moyenne)
+            for etudiant_id, ec_id, moyenne in MoyenneEC.objects.filter(
+                etudiant_id__in=etudiants_ids,
+                ec__in=ecs,
+                session=session,
+                annee_academique=annee
+            ).values_list('etudiant_id', 'ec_id', 'moyenne')
+        )
+        moyennes_ue = {
+            (etudiant_id, ue_id): (moyenne, credits_obtenus)
+            for etudiant_id, ue_id, moyenne, credits_obtenus in MoyenneUE.objects.filter(
+                etudiant_id__in=etudiants_ids,
+                ue__in=ues,
+                session=session,
+                annee_academique=annee
+            ).values_list('etudiant_id', 'ue_id', 'moyenne', 'credits_obtenus')
+        }
+        moyennes_semestre = dict(
+            MoyenneSemestre.objects.filter(
+                etudiant_id__in=etudiants_ids,
+                classe=classe,
+                semestre=semestre,
+                session=session,
+                annee_academique=annee
+            ).values_list('etudiant_id', 'moyenne_generale')
+        )
+
+        for inscription in lot:
+            etudiant_id = inscription.etudiant_id
+            user = inscription.etudiant.user
+            ligne = [user.matricule, user.get_full_name()]
+            credits_obtenus = 0
+            credits_requis = 0
+
+            for ue in ues:
+                ligne += [
+                    _decimal(moyennes_ec.get((etudiant_id, ec.id)))
+                    for ec in ecs_par_ue.get(ue.id, [])
+                ]
+                moyenne_ue, credits_ue = moyennes_ue.get((etudiant_id, ue.id), (None, None))
+                ligne += [_decimal(moyenne_ue), credits_ue]
+                if moyenne_ue is not None:
+                    credits_obtenus += credits_ue
+                    credits_requis += ue.credits
+
+            moyenne = moyennes_semestre.get(etudiant_id)
+            if moyenne is not None:
+                ligne += [
+                    float(moyenne),
+                    credits_obtenus,
+                    AutomationService._get_mention(moyenne),
+                    AutomationService._get_decision(moyenne, credits_obtenus, credits_requis)
+                ]
+            else:
+                ligne += [None, credits_obtenus, None, None]
+
+            feuille.append(ligne)
+            nombre += 1
+
+    classeur.save(destination)
+    return nombre
@@ -0,0 +1,197 @@
+"""
+Mesure le temps et la mémoire de génération de l'export XLSX d'un récapitulatif.
+
+Par défaut, une promotion fictive (500 étudiants) est créée dans une
+transaction annulée en fin de mesure : la base n'est pas modifiée. Chaque
+mesure est ajoutée à un historique JSON Lines pour suivre son évolution.
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.exports import ecrire_recapitulatif_excel
+
+
+class AnnulerTransaction(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mesure la génération de l'export XLSX d'un récapitulatif semestriel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--effectif', type=int, default=500, help='Étudiants de la promotion fictive')
+        parser.add_argument('--ues', type=int, default=8, help='UEs du semestre')
+        parser.add_argument('--ecs', type=int, default=3, help='ECs par UE')
+        parser.add_argument('--classe', type=int, help='Mesurer une classe existante plutôt qu\'une promotion fictive')
+        parser.add_argument('--semestre', type=int, help='Semestre (avec --classe)')
+        parser.add_argument('--session', type=int, help='Session (avec --classe)')
+        parser.add_argument(
+            '--historique',
+            default=os.path.join(settings.BASE_DIR, 'logs', 'benchmark_recapitulatifs.jsonl'),
+            help='Fichier JSON Lines où ajouter la mesure'
+        )
+
+    def handle(self, *args, **options):
+        if options['classe']:
+            from academics.models import Classe, Semestre, Session
+
+            try:
+                classe = Classe.objects.select_related('niveau', 'annee_academique').get(pk=options['classe'])
+                semestre = Semestre.objects.get(pk=options['semestre'])
+                session = Session.objects.get(pk=options['session'])
+            except (Classe.DoesNotExist, Semestre.DoesNotExist, Session.DoesNotExist, ValueError, TypeError):
+                raise CommandError('--classe, --semestre et --session doivent désigner des objets existants')
+
+            mesure = self.mesurer(classe, semestre, session)
+        else:
+            try:
+                with transaction.atomic():
+                    classe, semestre, session = self.promotion_fictive(
+                        options['effectif'], options['ues'], options['ecs']
+                    )
+                    mesure = self.mesurer(classe, semestre, session)
+                    raise AnnulerTransaction
+            except AnnulerTransaction:
+                pass
+            mesure['promotion_fictive'] = {'ues': options['ues'], 'ecs_par_ue': options['ecs']}
+
+        precedente = self.derniere_mesure(options['historique'], mesure['effectif'])
+        with open(options['historique'], 'a', encoding='utf-8') as historique:
+            historique.write(json.dumps(mesure) + '\n')
+
+        self.stdout.write(
+            f"{mesure['effectif']} étudiants : {mesure['duree_secondes']:.2f} s, "
+            f"pic mémoire {mesure['pic_memoire_mo']:.1f} Mo, fichier {mesure['taille_fichier_ko']} Ko"
+        )
+        if precedente:
+            ecart = (mesure['duree_secondes'] - precedente['duree_secondes']) / precedente['duree_secondes'] * 100
+            self.stdout.write(f"Mesure précédente ({precedente['date']}) : {precedente['duree_secondes']:.2f} s ({ecart:+.0f} %)")
+
+    def mesurer(self, classe, semestre, session):
+        with tempfile.TemporaryFile() as fichier:
+            tracemalloc.start()
+            debut = time.perf_counter()
+            effectif = ecrire_recapitulatif_excel(classe, semestre, session, fichier)
+            duree = time.perf_counter() - debut
+            _, pic = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            fichier.seek(0, os.SEEK_END)
+            taille = fichier.tell()
+
+        return {
+            'date': timezone.now().isoformat(),
+            'effectif': effectif,
+            'duree_secondes': round(duree, 3),
+            'pic_memoire_mo': round(pic / 1024 / 1024, 2),
+            'taille_fichier_ko': taille // 1024
+        }
+
+    @staticmethod
+    def derniere_mesure(chemin, effectif):
+        if not os.path.exists(chemin):
+            return None
+        derniere = None
+        with open(chemin, encoding='utf-8') as historique:
+            for ligne in historique:
+                mesure = json.loads(ligne)
+                if mesure.get('effectif') == effectif:
+                    derniere = mesure
+        return derniere
+
+    @staticmethod
+    def promotion_fictive(effectif, nombre_ues, ecs_par_ue):
+        """Crée une classe complète avec ses moyennes, sans notes individuelles"""
+        from core.models import TypeEtablissement, Etablissement, Domaine, Cycle, TypeFormation, Filiere, Niveau
+        from academics.models import AnneeAcademique, Session, Semestre, Classe, UE, EC
+        from users.models import User, Etudiant, StatutEtudiant, Inscription
+        from evaluations.models import MoyenneEC, MoyenneUE, MoyenneSemestre
+
+        aleatoire = random.Random(0)
+        type_etablissement = TypeEtablissement.objects.create(nom='Benchmark', code='BENCH')
+        etablissement = Etablissement.objects.create(
+            nom='Benchmark', nom_complet='Benchmark', acronyme='BENCH',
+            type_etablissement=type_etablissement, adresse='-', ville='-', telephone='-',
+            email='benchmark@acadflow.com', numero_autorisation='BENCH',
+            date_creation='2000-01-01', date_autorisation='2000-01-01', ministre_tutelle='-'
+        )
+        domaine = Domaine.objects.create(nom='Benchmark', code='BENCH', etablissement=etablissement)
+        cycle = Cycle.objects.create(nom='Benchmark', code='BENCH', etablissement=etablissement, duree_annees=3)
+        type_formation = TypeFormation.objects.create(nom='Benchmark', code='BENCH', cycle=cycle)
+        filiere = Filiere.objects.create(nom='Benchmark', code='BENCH', domaine=domaine, type_formation=type_formation)
+        niveau = Niveau.objects.create(nom='Benchmark', numero=1, cycle=cycle)
+        annee = AnneeAcademique.objects.create(
+            libelle='BENCH', date_debut='2000-09-01', date_fin='2001-07-31', active=False
+        )
+        session = Session.objects.create(nom='Benchmark', code='BENCH', ordre=99)
+        # Le numéro de semestre est unique : prendre le premier libre
+        numero = (Semestre.objects.aggregate(numero=Max('numero'))['numero'] or 0) + 1
+        semestre = Semestre.objects.create(nom='Benchmark', numero=numero)
+        classe = Classe.objects.create(
+            nom='Benchmark', code='BENCH', filiere=filiere, niveau=niveau, annee_academique=annee
+        )
+        statut = StatutEtudiant.objects.create(nom='Benchmark', code='BENCH')
+
+        ues = [
+            UE.objects.create(
+                nom=f'UE {i}', code=f'BENCH{i}', credits=aleatoire.randint(2, 6),
+                niveau=niveau, semestre=semestre
+            )
+            for i in range(nombre_ues)
+        ]
+        ecs = EC.objects.bulk_create([
+            EC(nom=f'EC {ue.code}-{j}', code=f'{ue.code}-{j}', ue=ue, poids_ec=Decimal('100') / ecs_par_ue)
+            for ue in ues for j in range(ecs_par_ue)
+        ])
+
+        users = User.objects.bulk_create([
+            User(
+                username=f'bench{i}', matricule=f'BENCH{i:05d}', type_utilisateur='etudiant',
+                first_name=f'Prénom {i}', last_name=f'Nom {i}'
+            )
+            for i in range(effectif)
+        ])
+        etudiants = Etudiant.objects.bulk_create([
+            Etudiant(user=user, numero_carte=user.matricule) for user in users
+        ])
+        Inscription.objects.bulk_create([
+            Inscription(etudiant=etudiant, classe=classe, annee_academique=annee, statut=statut)
+            for etudiant in etudiants
+        ])
+
+        def moyenne():
+            return Decimal(aleatoire.randint(0, 2000)) / 100
+
+        MoyenneEC.objects.bulk_create([
+            MoyenneEC(etudiant=etudiant, ec=ec, session=session, annee_academique=annee, moyenne=moyenne())
+            for etudiant in etudiants for ec in ecs
+        ], batch_size=5000)
+        MoyenneUE.objects.bulk_create([
+            MoyenneUE(
+                etudiant=etudiant, ue=ue, session=session, annee_academique=annee,
+                moyenne=moyenne(), credits_obtenus=ue.credits
+            )
+            for etudiant in etudiants for ue in ues
+        ], batch_size=5000)
+        MoyenneSemestre.objects.bulk_create([
+            MoyenneSemestre(
+                etudiant=etudiant, classe=classe, semestre=semestre, session=session,
+                annee_academique=annee, moyenne_generale=moyenne(),
+                credits_requis=sum(ue.credits for ue in ues)
+            )
+            for etudiant in etudiants
+        ])
+
+        return classe, semestre, session
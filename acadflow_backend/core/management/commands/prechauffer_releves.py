@@ -0,0 +1,52 @@
+"""
+Pré-calcule les relevés de notes d'une année académique dans le cache.
+
+À lancer avant la publication des résultats : les relevés des étudiants
+inscrits sont construits par lots et mis en cache pour chaque session, de
+sorte que les premières consultations ne recalculent rien.
+"""
+
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Pré-calcule en cache les relevés de notes d'une année académique"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=int, required=True, help='Année académique à pré-calculer')
+        parser.add_argument('--session', type=int, help='Session à pré-calculer (toutes les sessions actives par défaut)')
+        parser.add_argument('--taille-lot', type=int, default=200, help="Nombre d'étudiants par lot")
+
+    def handle(self, *args, **options):
+        from academics.models import AnneeAcademique, Session
+        from users.models import Etudiant
+        from core.services import NoteService
+
+        try:
+            annee = AnneeAcademique.objects.get(pk=options['annee'])
+        except AnneeAcademique.DoesNotExist:
+            raise CommandError(f"Année académique {options['annee']} introuvable")
+
+        sessions = Session.objects.filter(actif=True)
+        if options['session']:
+            sessions = Session.objects.filter(pk=options['session'])
+            if not sessions.exists():
+                raise CommandError(f"Session {options['session']} introuvable")
+
+        taille_lot = options['taille_lot']
+        for session in sessions:
+            etudiants = Etudiant.objects.filter(
+                inscription__annee_academique=annee,
+                inscription__active=True
+            ).distinct().select_related('user').order_by('id').iterator(chunk_size=taille_lot)
+
+            total = 0
+            while True:
+                lot = list(islice(etudiants, taille_lot))
+                if not lot:
+                    break
+                total += NoteService.prechauffer_releves(lot, session)
+
+            self.stdout.write(f'{session.nom} : {total} relevés mis en cache')
@@ -0,0 +1,19 @@
+"""
+Purge les traces de suppression plus anciennes que la durée de rétention.
+
+Exécutée chaque jour par Celery beat (core.tasks.purger_objets_supprimes).
+Les clients dont le curseur de synchronisation est antérieur à la rétention
+doivent refaire une synchronisation complète.
+"""
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Purge les traces de suppression expirées (synchronisation des clients)'
+
+    def handle(self, *args, **options):
+        from core.models import ObjetSupprime
+
+        supprimes = ObjetSupprime.purger()
+        self.stdout.write(f'{supprimes} traces de suppression purgées')
@@ -0,0 +1,30 @@
+"""
+Recalcule la table des effectifs d'inscription depuis les inscriptions.
+
+La table est tenue à jour par les signaux de Inscription ; les écritures qui
+les contournent (bulk_create, update, imports) la désynchronisent. Cette
+commande la reconstruit, pour une année ou pour toutes.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les effectifs d'inscription (tableaux de bord)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=int, help='Année académique à reconstruire (toutes par défaut)')
+
+    def handle(self, *args, **options):
+        from academics.models import AnneeAcademique
+        from users.models import EffectifInscription
+
+        annee = None
+        if options['annee']:
+            try:
+                annee = AnneeAcademique.objects.get(pk=options['annee'])
+            except AnneeAcademique.DoesNotExist:
+                raise CommandError(f"Année académique {options['annee']} introuvable")
+
+        lignes = EffectifInscription.reconstruire(annee)
+        self.stdout.write(f'{lignes} lignes d\'effectifs reconstruites')
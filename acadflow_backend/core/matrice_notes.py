@@ -0,0 +1,509 @@
+# ========================================
+# FICHIER: acadflow_backend/core/matrice_notes.py
+# ========================================
+"""
+Calcul vectorisé des moyennes UE et semestrielles d'une classe.
+
+Les moyennes EC d'une promotion sont chargées dans une matrice dense
+étudiants × EC, puis les moyennes UE et semestrielles sont obtenues par
+opérations matricielles. Les calculs se font en centièmes entiers avec un
+arrondi bancaire, ce qui reproduit exactement les résultats Decimal de
+calculer_moyenne_ue et calculer_moyenne_semestre.
+"""
+
+from django.db import transaction
+from django.db.models import Q, F
+from decimal import Decimal
+import numpy as np
+import logging
+
+from academics.models import UE, EC, Semestre
+from evaluations.models import MoyenneEC, MoyenneUE, MoyenneSemestre
+from core.statistiques import invalider_statistiques_semestre
+from core.services import NoteService
+
+logger = logging.getLogger('acadflow')
+
+NOTE_VALIDATION = 1000  # 10.00 en centièmes
+
+
+def _centiemes(valeur):
+    """Convertit une valeur Decimal à deux décimales en centièmes entiers"""
+    return int(valeur * 100)
+
+
+def _en_decimal(centiemes):
+    """Convertit des centièmes entiers en Decimal à deux décimales"""
+    return Decimal(centiemes).scaleb(-2)
+
+
+def _diviser_arrondi(numerateur, denominateur):
+    """
+    Division entière élément par élément avec arrondi au pair le plus proche,
+    comme round(Decimal, 2). Les cases de dénominateur nul valent 0.
+    """
+    denominateur_sur = np.where(denominateur > 0, denominateur, 1)
+    quotient, reste = np.divmod(numerateur, denominateur_sur)
+    double_reste = 2 * reste
+    arrondi_superieur = (double_reste > denominateur_sur) | (
+        (double_reste == denominateur_sur) & (quotient % 2 == 1)
+    )
+    return np.where(denominateur > 0, quotient + arrondi_superieur, 0)
+
+
+class MatriceNotesClasse:
+    """Matrices de moyennes d'une classe pour une session"""
+
+    def __init__(self, classe, session, etudiants=None):
+        from users.models import Inscription
+
+        self.classe = classe
+        self.session = session
+        self.annee_academique = classe.annee_academique
+
+        inscriptions = Inscription.objects.filter(classe=classe, active=True)
+        if etudiants is not None:
+            inscriptions = inscriptions.filter(
+                etudiant_id__in=[getattr(e, 'pk', e) for e in etudiants]
+            )
+        self.etudiants_ids = list(
+            inscriptions.order_by('etudiant_id').values_list('etudiant_id', flat=True)
+        )
+        self.ues = list(
+            UE.objects.filter(niveau=classe.niveau, actif=True)
+            .select_related('semestre')
+            .order_by('semestre__numero', 'code')
+        )
+        self.ecs = list(
+            EC.objects.filter(ue__in=self.ues, actif=True).order_by('ue_id', 'id')
+        )
+
+        self.index_etudiants = {e: i for i, e in enumerate(self.etudiants_ids)}
+        self.index_ues = {ue.id: j for j, ue in enumerate(self.ues)}
+        self.index_ecs = {ec.id: k for k, ec in enumerate(self.ecs)}
+
+        # Structure pédagogique sous forme de tableaux
+        self.poids_ecs = np.array([_centiemes(ec.poids_ec) for ec in self.ecs], dtype=np.int64)
+        self.credits_ues = np.array([ue.credits for ue in self.ues], dtype=np.int64)
+        self.ec_vers_ue = np.zeros((len(self.ecs), len(self.ues)), dtype=np.int64)
+        for k, ec in enumerate(self.ecs):
+            self.ec_vers_ue[k, self.index_ues[ec.ue_id]] = 1
+
+    @property
+    def forme(self):
+        return len(self.etudiants_ids), len(self.ues)
+
+    def _matrice_vide(self, colonnes):
+        n = len(self.etudiants_ids)
+        return np.zeros((n, colonnes), dtype=np.int64), np.zeros((n, colonnes), dtype=bool)
+
+    def charger_moyennes_ec(self, completer=True):
+        """
+        Construit la matrice étudiants × EC des moyennes EC (en centièmes).
+
+        Avec completer=True, les moyennes EC manquantes sont calculées en lot
+        au préalable, comme le fait calculer_moyenne_ue étudiant par étudiant.
+        """
+        from core.utils import calculer_moyennes_ec_classe
+
+        moyennes, presentes = self._matrice_vide(len(self.ecs))
+        if not self.etudiants_ids or not self.ecs:
+            return moyennes, presentes
+
+        lignes = MoyenneEC.objects.filter(
+            etudiant_id__in=self.etudiants_ids,
+            ec__in=self.ecs,
+            session=self.session,
+            annee_academique=self.annee_academique
+        ).values_list('etudiant_id', 'ec_id', 'moyenne')
+        self._remplir(moyennes, presentes, lignes, self.index_ecs)
+
+        if completer and not presentes.all():
+            lignes_manquantes, colonnes_manquantes = np.nonzero(~presentes)
+            calculees = calculer_moyennes_ec_classe(
+                self.classe,
+                self.session,
+                ecs=[self.ecs[k] for k in np.unique(colonnes_manquantes)],
+                etudiants=[self.etudiants_ids[i] for i in np.unique(lignes_manquantes)]
+            )
+            self._remplir(
+                moyennes, presentes,
+                ((m.etudiant_id, m.ec_id, m.moyenne) for m in calculees),
+                self.index_ecs
+            )
+
+        return moyennes, presentes
+
+    def charger_moyennes_ue(self):
+        """Construit la matrice étudiants × UE des moyennes UE enregistrées"""
+        moyennes, presentes = self._matrice_vide(len(self.ues))
+        credits, _ = self._matrice_vide(len(self.ues))
+        if not self.etudiants_ids or not self.ues:
+            return moyennes, presentes, credits
+
+        lignes = MoyenneUE.objects.filter(
+            etudiant_id__in=self.etudiants_ids,
+            ue__in=self.ues,
+            session=self.session,
+            annee_academique=self.annee_academique
+        ).values_list('etudiant_id', 'ue_id', 'moyenne', 'credits_obtenus')
+        for etudiant_id, ue_id, moyenne, credits_obtenus in lignes:
+            i, j = self.index_etudiants[etudiant_id], self.index_ues[ue_id]
+            moyennes[i, j] = _centiemes(moyenne)
+            presentes[i, j] = True
+            credits[i, j] = credits_obtenus
+
+        return moyennes, presentes, credits
+
+    def moyennes_ue_completees(self, calculees=None):
+        """
+        Moyennes UE enregistrées, complétées par le calcul (et l'enregistrement)
+        des seules moyennes manquantes, comme calculer_moyenne_semestre.
+        """
+        moyennes_ue, presentes_ue, credits_ue = self.charger_moyennes_ue()
+
+        if not presentes_ue.all():
+            if calculees is None:
+                calculees = self.calculer_moyennes_ue(*self.charger_moyennes_ec())
+            moyennes_calc, presentes_calc, credits_calc = calculees
+            manquantes = ~presentes_ue & presentes_calc
+            self.enregistrer_moyennes_ue(moyennes_calc, presentes_calc, masque=manquantes)
+
+            moyennes_ue = np.where(manquantes, moyennes_calc, moyennes_ue)
+            credits_ue = np.where(manquantes, credits_calc, credits_ue)
+            presentes_ue = presentes_ue | manquantes
+
+        return moyennes_ue, presentes_ue, credits_ue
+
+    def _remplir(self, moyennes, presentes, lignes, index_colonnes):
+        for etudiant_id, colonne_id, moyenne in lignes:
+            i = self.index_etudiants.get(etudiant_id)
+            k = index_colonnes.get(colonne_id)
+            if i is None or k is None:
+                continue
+            moyennes[i, k] = _centiemes(moyenne)
+            presentes[i, k] = True
+
+    def calculer_moyennes_ue(self, moyennes_ec, presentes_ec):
+        """
+        Moyennes UE pondérées par poids_ec, seulement sur les EC disposant
+        d'une moyenne. Retourne (moyennes, présentes, crédits obtenus).
+        """
+        poids = presentes_ec * self.poids_ecs[np.newaxis, :]
+        somme_ponderee = (moyennes_ec * poids) @ self.ec_vers_ue
+        total_poids = poids @ self.ec_vers_ue
+
+        presentes = total_poids > 0
+        moyennes = _diviser_arrondi(somme_ponderee, total_poids)
+        credits = np.where(
+            presentes & (moyennes >= NOTE_VALIDATION),
+            self.credits_ues[np.newaxis, :],
+            0
+        )
+        return moyennes, presentes, credits
+
+    def calculer_moyennes_semestre(self, semestre, moyennes_ue, presentes_ue, credits_ue):
+        """
+        Moyenne arithmétique des UE du semestre disposant d'une moyenne.
+        Retourne (moyennes, présentes, crédits obtenus, crédits requis).
+        """
+        colonnes = np.array([ue.semestre_id == semestre.id for ue in self.ues], dtype=bool)
+        presentes_sem = presentes_ue & colonnes[np.newaxis, :]
+
+        nombre_ues = presentes_sem.sum(axis=1)
+        somme = np.where(presentes_sem, moyennes_ue, 0).sum(axis=1)
+        credits_obtenus = np.where(presentes_sem, credits_ue, 0).sum(axis=1)
+        credits_requis = (presentes_sem * self.credits_ues[np.newaxis, :]).sum(axis=1)
+
+        presentes = nombre_ues > 0
+        moyennes = _diviser_arrondi(somme, nombre_ues)
+        return moyennes, presentes, credits_obtenus, credits_requis
+
+    def enregistrer_moyennes_ue(self, moyennes, presentes, masque=None):
+        """Écrit en un seul upsert les moyennes UE présentes (et dans le masque)"""
+        a_ecrire = presentes if masque is None else presentes & masque
+        objets = []
+        for i, j in zip(*np.nonzero(a_ecrire)):
+            moyenne = int(moyennes[i, j])
+            validee = moyenne >= NOTE_VALIDATION
+            objets.append(MoyenneUE(
+                etudiant_id=self.etudiants_ids[i],
+                ue=self.ues[j],
+                session=self.session,
+                annee_academique=self.annee_academique,
+                moyenne=_en_decimal(moyenne),
+                credits_obtenus=self.ues[j].credits if validee else 0,
+                validee=validee
+            ))
+
+        if objets:
+            MoyenneUE.objects.bulk_create(
+                objets,
+                update_conflicts=True,
+                unique_fields=['etudiant', 'ue', 'session', 'annee_academique'],
+                update_fields=['moyenne', 'credits_obtenus', 'validee', 'updated_at']
+            )
+            # bulk_create n'envoie pas de signaux
+            NoteService.invalider_releves(objet.etudiant_id for objet in objets)
+        return objets
+
+    def enregistrer_moyennes_semestre(self, semestre, moyennes, presentes, credits_obtenus, credits_requis):
+        """Écrit en un seul upsert les moyennes semestrielles présentes"""
+        objets = [
+            MoyenneSemestre(
+                etudiant_id=self.etudiants_ids[i],
+                classe=self.classe,
+                semestre=semestre,
+                session=self.session,
+                annee_academique=self.annee_academique,
+                moyenne_generale=_en_decimal(int(moyennes[i])),
+                credits_obtenus=int(credits_obtenus[i]),
+                credits_requis=int(credits_requis[i])
+            )
+            for i in np.nonzero(presentes)[0]
+        ]
+
+        if objets:
+            MoyenneSemestre.objects.bulk_create(
+                objets,
+                update_conflicts=True,
+                unique_fields=['etudiant', 'classe', 'semestre', 'session', 'annee_academique'],
+                update_fields=['moyenne_generale', 'credits_obtenus', 'credits_requis', 'updated_at']
+            )
+            # bulk_create n'envoie pas de signaux
+            invalider_statistiques_semestre(self.classe.id, self.session.id)
+            NoteService.invalider_releves(objet.etudiant_id for objet in objets)
+        return objets
+
+
+def recalculer_moyennes_ue_classe(classe, session):
+    """Recalcule en une passe toutes les moyennes UE d'une classe"""
+    try:
+        with transaction.atomic():
+            matrice = MatriceNotesClasse(classe, session)
+            moyennes_ec, presentes_ec = matrice.charger_moyennes_ec()
+            moyennes, presentes, _ = matrice.calculer_moyennes_ue(moyennes_ec, presentes_ec)
+            objets = matrice.enregistrer_moyennes_ue(moyennes, presentes)
+
+            logger.info(f"Moyennes UE calculées en lot: {classe.code} - {session.code}: {len(objets)} moyennes")
+            return objets
+
+    except Exception as e:
+        logger.error(f"Erreur calcul en lot des moyennes UE pour {classe.code}: {e}")
+        return []
+
+
+def recalculer_moyennes_semestre_classe(classe, session, semestres=None):
+    """
+    Recalcule en une passe les moyennes semestrielles d'une classe.
+
+    Comme calculer_moyenne_semestre, les moyennes UE déjà enregistrées sont
+    utilisées telles quelles et seules les manquantes sont calculées.
+    """
+    try:
+        with transaction.atomic():
+            matrice = MatriceNotesClasse(classe, session)
+            moyennes_ue, presentes_ue, credits_ue = matrice.moyennes_ue_completees()
+
+            return _enregistrer_semestres(
+                matrice, semestres, moyennes_ue, presentes_ue, credits_ue
+            )
+
+    except Exception as e:
+        logger.error(f"Erreur calcul en lot des moyennes semestrielles pour {classe.code}: {e}")
+        return []
+
+
+def recalculer_classe(classe, session, semestres=None):
+    """
+    Recalcule en une seule passe les moyennes UE puis semestrielles d'une
+    classe à partir des moyennes EC.
+    """
+    try:
+        with transaction.atomic():
+            matrice = MatriceNotesClasse(classe, session)
+            moyennes_ec, presentes_ec = matrice.charger_moyennes_ec()
+            moyennes_ue, presentes_ue, credits_ue = matrice.calculer_moyennes_ue(
+                moyennes_ec, presentes_ec
+            )
+            moyennes_ue_ecrites = matrice.enregistrer_moyennes_ue(moyennes_ue, presentes_ue)
+            moyennes_semestre = _enregistrer_semestres(
+                matrice, semestres, moyennes_ue, presentes_ue, credits_ue
+            )
+
+            return {
+                'moyennes_ue': len(moyennes_ue_ecrites),
+                'moyennes_semestre': len(moyennes_semestre)
+            }
+
+    except Exception as e:
+        logger.error(f"Erreur recalcul complet de la classe {classe.code}: {e}")
+        return {'moyennes_ue': 0, 'moyennes_semestre': 0}
+
+
+def _enregistrer_semestres(matrice, semestres, moyennes_ue, presentes_ue, credits_ue):
+    if semestres is None:
+        semestres = Semestre.objects.all()
+
+    objets = []
+    for semestre in semestres:
+        resultats = matrice.calculer_moyennes_semestre(
+            semestre, moyennes_ue, presentes_ue, credits_ue
+        )
+        objets.extend(matrice.enregistrer_moyennes_semestre(semestre, *resultats))
+
+    logger.info(
+        f"Moyennes semestrielles calculées en lot: {matrice.classe.code} - "
+        f"{matrice.session.code}: {len(objets)} moyennes"
+    )
+    return objets
+
+
+def propager_cellules(classe, session, etudiants, ecs):
+    """
+    Recalcule la chaîne EC → UE → semestre des seuls étudiants et EC donnés.
+
+    Seules les UE contenant un de ces EC et les semestres de ces UE sont
+    réécrits. Les moyennes devenues incalculables (plus aucune note) sont
+    supprimées. Les erreurs sont propagées à l'appelant.
+    """
+    from core.utils import calculer_moyennes_ec_classe
+
+    etudiants_ids = [getattr(e, 'pk', e) for e in etudiants]
+    ecs = list(ecs)
+
+    with transaction.atomic():
+        # Moyennes EC
+        calculees = calculer_moyennes_ec_classe(
+            classe, session, ecs=ecs, etudiants=etudiants_ids
+        )
+        recalculees = {(m.etudiant_id, m.ec_id) for m in calculees}
+        _supprimer_obsoletes(
+            MoyenneEC.objects.filter(session=session, annee_academique=classe.annee_academique),
+            'ec_id',
+            [(e, ec.id) for e in etudiants_ids for ec in ecs if (e, ec.id) not in recalculees]
+        )
+
+        matrice = MatriceNotesClasse(classe, session, etudiants=etudiants_ids)
+        if not matrice.etudiants_ids:
+            return {'moyennes_ec': len(calculees), 'moyennes_ue': 0, 'moyennes_semestre': 0}
+
+        # Moyennes UE des seules UE touchées
+        ues_touchees = {ec.ue_id for ec in ecs}
+        colonnes = np.array([ue.id in ues_touchees for ue in matrice.ues], dtype=bool)
+        masque = np.broadcast_to(colonnes[np.newaxis, :], matrice.forme)
+
+        calculees_ue = matrice.calculer_moyennes_ue(*matrice.charger_moyennes_ec())
+        moyennes_ue, presentes_ue, _ = calculees_ue
+        ecrites_ue = matrice.enregistrer_moyennes_ue(moyennes_ue, presentes_ue, masque=masque)
+        _supprimer_obsoletes(
+            MoyenneUE.objects.filter(session=session, annee_academique=classe.annee_academique),
+            'ue_id',
+            [
+                (matrice.etudiants_ids[i], matrice.ues[j].id)
+                for i, j in zip(*np.nonzero(masque & ~presentes_ue))
+            ]
+        )
+
+        # Moyennes semestrielles des semestres touchés
+        semestres = {ue.semestre_id: ue.semestre for ue in matrice.ues if ue.id in ues_touchees}
+        moyennes_ue, presentes_ue, credits_ue = matrice.moyennes_ue_completees(calculees_ue)
+        ecrites_semestre = []
+        for semestre in semestres.values():
+            resultats = matrice.calculer_moyennes_semestre(
+                semestre, moyennes_ue, presentes_ue, credits_ue
+            )
+            ecrites_semestre.extend(matrice.enregistrer_moyennes_semestre(semestre, *resultats))
+            MoyenneSemestre.objects.filter(
+                classe=classe,
+                semestre=semestre,
+                session=session,
+                annee_academique=classe.annee_academique,
+                etudiant_id__in=[
+                    matrice.etudiants_ids[i] for i in np.nonzero(~resultats[1])[0]
+                ]
+            ).delete()
+
+        return {
+            'moyennes_ec': len(calculees),
+            'moyennes_ue': len(ecrites_ue),
+            'moyennes_semestre': len(ecrites_semestre)
+        }
+
+
+def _supprimer_obsoletes(queryset, champ, cellules):
+    if not cellules:
+        return
+    filtre = Q()
+    for etudiant_id, objet_id in cellules:
+        filtre |= Q(etudiant_id=etudiant_id, **{champ: objet_id})
+    queryset.filter(filtre).delete()
+
+
+def propager_moyennes_a_recalculer(limite=None, **filtres):
+    """
+    Traite les cellules marquées dans MoyenneARecalculer, regroupées par
+    classe et session. Une marque n'est supprimée qu'après le recalcul
+    réussi de sa chaîne et si elle n'a pas été re-marquée entre-temps ;
+    en cas d'échec elle reste en attente avec l'erreur rencontrée.
+    """
+    from evaluations.models import MoyenneARecalculer
+    from users.models import Inscription
+
+    marques = MoyenneARecalculer.objects.filter(**filtres).select_related(
+        'ec', 'session'
+    ).order_by('created_at')
+    if limite:
+        marques = marques[:limite]
+    marques = list(marques)
+
+    resultats = {'traitees': 0, 'echecs': 0, 'moyennes_ec': 0, 'moyennes_ue': 0, 'moyennes_semestre': 0}
+    if not marques:
+        return resultats
+
+    # Classe de chaque étudiant pour l'année concernée
+    classes = {}
+    inscriptions = Inscription.objects.filter(
+        etudiant_id__in={m.etudiant_id for m in marques},
+        classe__annee_academique_id__in={m.annee_academique_id for m in marques},
+        active=True
+    ).select_related('classe__annee_academique')
+    for inscription in inscriptions:
+        classes[(inscription.etudiant_id, inscription.classe.annee_academique_id)] = inscription.classe
+
+    groupes = {}
+    for marque in marques:
+        classe = classes.get((marque.etudiant_id, marque.annee_academique_id))
+        groupes.setdefault((classe, marque.session), []).append(marque)
+
+    for (classe, session), groupe in groupes.items():
+        try:
+            if classe is None:
+                raise ValueError("Aucune inscription active pour cette année académique")
+
+            compteurs = propager_cellules(
+                classe,
+                session,
+                {m.etudiant_id for m in groupe},
+                {m.ec_id: m.ec for m in groupe}.values()
+            )
+        except Exception as e:
+            logger.error(f"Erreur propagation des moyennes ({len(groupe)} cellules): {e}")
+            MoyenneARecalculer.objects.filter(pk__in=[m.pk for m in groupe]).update(
+                tentatives=F('tentatives') + 1,
+                derniere_erreur=str(e)
+            )
+            resultats['echecs'] += len(groupe)
+            continue
+
+        filtre = Q()
+        for marque in groupe:
+            filtre |= Q(pk=marque.pk, updated_at=marque.updated_at)
+        MoyenneARecalculer.objects.filter(filtre).delete()
+
+        resultats['traitees'] += len(groupe)
+        for cle, valeur in compteurs.items():
+            resultats[cle] += valeur
+
+    logger.info(f"Propagation des moyennes: {resultats}")
+    return resultats
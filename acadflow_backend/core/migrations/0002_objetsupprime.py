@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjetSupprime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(max_length=100)),
+                ('objet_id', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'objets_supprimes',
+                'indexes': [models.Index(fields=['type_objet', 'updated_at', 'id'], name='objets_supp_type_ob_1b1eab_idx')],
+            },
+        ),
+    ]
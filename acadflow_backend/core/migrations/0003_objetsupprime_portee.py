@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_objetsupprime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objetsupprime',
+            name='classe_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='objetsupprime',
+            name='enseignant_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='objetsupprime',
+            name='etudiant_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='objetsupprime',
+            name='session_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,265 @@
+# ========================================
+# FICHIER: core/mixins.py
+# ========================================
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+
+class SynchronisationMixin:
+    """
+    Ajoute une action `synchroniser` renvoyant les objets créés ou modifiés
+    depuis un curseur, ainsi que les identifiants supprimés depuis.
+
+    Le curseur est de la forme "<updated_at ISO>,<id>" ; il est renvoyé par
+    chaque réponse et doit être repassé tel quel à l'appel suivant. Sans
+    curseur, tous les objets sont renvoyés (synchronisation initiale).
+
+    updated_at est fixé avant la validation de la transaction : une longue
+    transaction (import de notes, propagation des moyennes) peut devenir
+    visible après une plus rapide de date plus récente. Le curseur ne
+    dépasse donc jamais maintenant moins `marge_synchronisation` ; les
+    objets plus récents sont renvoyés à chaque appel tant qu'ils sont dans
+    la marge, et les clients doivent appliquer les réponses de façon
+    idempotente.
+
+    Les traces de suppression sont purgées après
+    SYNCHRONISATION_RETENTION_JOURS : un curseur plus ancien reçoit une
+    réponse 410 et le client doit repartir d'une synchronisation complète.
+    """
+    limite_synchronisation = 500
+    limite_synchronisation_max = 2000
+    # Portée des suppressions renvoyées, à l'image de get_queryset : types
+    # d'utilisateur limités à leurs propres objets (par leur profil
+    # etudiant / enseignant) et paramètres de filtre → champ de ObjetSupprime
+    portee_utilisateurs = ()
+    portee_parametres = {}
+    marge_synchronisation = timedelta(seconds=getattr(settings, 'SYNCHRONISATION_MARGE_SECONDES', 300))
+
+    @action(detail=False, methods=['get'])
+    def synchroniser(self, request):
+        from core.models import ObjetSupprime
+
+        try:
+            depuis = self._lire_curseur(request.query_params.get('curseur'))
+            limite = int(request.query_params.get('limite', self.limite_synchronisation))
+            if limite < 1:
+                raise ValueError(limite)
+            limite = min(limite, self.limite_synchronisation_max)
+        except ValueError:
+            return Response(
+                {'error': 'Paramètres de synchronisation invalides'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if depuis and depuis[0] < ObjetSupprime.limite_retention():
+            return Response(
+                {
+                    'error': 'Curseur expiré : synchronisation complète requise',
+                    'resynchronisation_complete': True
+                },
+                status=status.HTTP_410_GONE
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        suppressions = self._filtrer_suppressions(ObjetSupprime.objects.filter(
+            type_objet=queryset.model._meta.label_lower
+        ))
+        if depuis:
+            date, identifiant = depuis
+            queryset = queryset.filter(
+                Q(updated_at__gt=date) | Q(updated_at=date, id__gt=identifiant)
+            )
+            suppressions = suppressions.filter(updated_at__gt=date)
+
+        # Seuls les objets antérieurs à la borne sont paginés
+        borne = timezone.now() - self.marge_synchronisation
+        objets = list(queryset.filter(updated_at__lte=borne).order_by('updated_at', 'id')[:limite + 1])
+        complet = len(objets) <= limite
+        objets = objets[:limite]
+
+        if complet:
+            # Objets dans la marge : renvoyés, puis de nouveau au prochain
+            # appel puisque le curseur s'arrête à la borne
+            objets += queryset.filter(updated_at__gt=borne).order_by(
+                'updated_at', 'id'
+            )[:self.limite_synchronisation_max]
+            curseur = depuis if depuis and depuis[0] > borne else (borne, 0)
+        else:
+            # Les suppressions sont bornées à la page renvoyée pour ne pas
+            # en sauter lors de la page suivante
+            suppressions = suppressions.filter(updated_at__lte=objets[-1].updated_at)
+            curseur = (objets[-1].updated_at, objets[-1].id)
+        suppressions = list(suppressions.order_by('updated_at').values_list('objet_id', flat=True))
+
+        return Response({
+            'resultats': self.get_serializer(objets, many=True).data,
+            'supprimes': suppressions,
+            'curseur': self._ecrire_curseur(curseur),
+            'complet': complet
+        })
+
+    def _filtrer_suppressions(self, suppressions):
+        """Suppressions des seuls objets que l'utilisateur pouvait voir"""
+        user = self.request.user
+        if user.type_utilisateur in self.portee_utilisateurs:
+            profil = getattr(user, user.type_utilisateur, None)
+            if profil is None:
+                return suppressions.none()
+            suppressions = suppressions.filter(**{f'{user.type_utilisateur}_id': profil.pk})
+
+        for parametre, champ in self.portee_parametres.items():
+            valeur = self.request.query_params.get(parametre)
+            if valeur:
+                suppressions = suppressions.filter(**{champ: valeur})
+        return suppressions
+
+    @staticmethod
+    def _ecrire_curseur(curseur):
+        if not curseur:
+            return None
+        # UTC avec suffixe Z : pas de '+' à échapper dans l'URL
+        date = curseur[0].astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        return f"{date},{curseur[1]}"
+
+    @staticmethod
+    def _lire_curseur(curseur):
+        if not curseur:
+            return None
+        date, identifiant = curseur.rsplit(',', 1)
+        date = datetime.fromisoformat(date.strip().replace('Z', '+00:00'))
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date, int(identifiant)
+
+
+class GetConditionnelMixin:
+    """
+    GET conditionnel (ETag / Last-Modified) pour `list` et `retrieve`.
+
+    Le validateur est calculé par une seule requête d'agrégation sur le
+    queryset filtré (nombre d'objets et dernier updated_at) et complété par
+    la version des `modeles_dependants` (voir core.cache.suivre_modeles),
+    dont le serializer affiche des champs. Si le client a déjà la réponse,
+    un 304 est renvoyé sans exécuter le serializer.
+
+    Last-Modified ne voit pas les suppressions : une liste dont un objet a
+    été supprimé garderait la même date. Il n'est donc émis (et
+    If-Modified-Since pris en compte) que pour `retrieve` ; les listes ne
+    portent que l'ETag. If-None-Match, lorsqu'il est présent, l'emporte sur
+    If-Modified-Since (RFC 9110, 13.2.2).
+    """
+    modeles_dependants = ()
+    # Le modèle du viewset est lui-même suivi par version : pas de requête
+    validateur_par_versions = False
+
+    def list(self, request, *args, **kwargs):
+        return self._reponse_conditionnelle(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._reponse_conditionnelle(request, super().retrieve, *args, **kwargs)
+
+    def _validateur(self, request, **kwargs):
+        """Retourne (etag, date de dernière modification ou None)"""
+        import hashlib
+
+        from django.db.models import Count, Max
+        from core import cache
+
+        modeles = tuple(self.modeles_dependants)
+        derniere_maj = None
+        # Sans cache partagé, les versions ignorent les écritures des autres processus
+        if self.validateur_par_versions and cache.cache_partage():
+            modeles = (self.queryset.model,) + modeles
+            elements = []
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.action == 'retrieve':
+                cle = self.lookup_url_kwarg or self.lookup_field
+                queryset = queryset.filter(**{self.lookup_field: kwargs[cle]})
+            agregat = queryset.order_by().aggregate(nombre=Count('pk'), derniere_maj=Max('updated_at'))
+            derniere_maj = agregat['derniere_maj']
+            elements = [agregat['nombre'], derniere_maj.isoformat() if derniere_maj else '']
+
+        if modeles:
+            elements += cache.versions(*[cache.espace_modele(modele) for modele in modeles])
+        # Même données, autre URL (filtres, page) ou autre utilisateur : autre réponse
+        elements += [request.get_full_path(), request.user.pk]
+        etag = hashlib.sha256('|'.join(map(str, elements)).encode()).hexdigest()[:32]
+        return etag, derniere_maj
+
+    def _reponse_conditionnelle(self, request, vue, *args, **kwargs):
+        from django.utils.cache import get_conditional_response, quote_etag
+        from django.utils.http import http_date
+
+        etag, derniere_maj = self._validateur(request, **kwargs)
+        etag = quote_etag(etag)
+        horodatage = None
+        if derniere_maj and self.action == 'retrieve':
+            horodatage = int(derniere_maj.timestamp())
+
+        non_modifiee = get_conditional_response(request, etag=etag, last_modified=horodatage)
+        if non_modifiee is not None:
+            non_modifiee['ETag'] = etag
+            non_modifiee['Cache-Control'] = 'private, no-cache'
+            return non_modifiee
+
+        reponse = self._produire_reponse(request, vue, *args, **kwargs)
+        if reponse.status_code == status.HTTP_200_OK:
+            reponse['ETag'] = etag
+            if horodatage is not None:
+                reponse['Last-Modified'] = http_date(horodatage)
+            reponse['Cache-Control'] = 'private, no-cache'
+        return reponse
+
+    def _produire_reponse(self, request, vue, *args, **kwargs):
+        return vue(request, *args, **kwargs)
+
+
+class CacheReferentielMixin(GetConditionnelMixin):
+    """
+    Met en cache les réponses `list` et `retrieve` d'un référentiel.
+
+    La clé inclut la version du modèle du viewset et celles des
+    `modeles_dependants` (relations affichées par le serializer) : toute
+    écriture sur l'un d'eux, suivie par core.cache.suivre_modeles, rend les
+    réponses obsolètes sur tous les processus. En régime établi, ces
+    requêtes ne touchent pas la base ; le GET conditionnel repose sur les
+    mêmes versions.
+
+    Sans cache partagé (voir core.cache.cache_partage), une écriture ne
+    changerait la version que dans le processus qui l'a faite : les réponses
+    ne sont alors pas mises en cache et le validateur est lu en base.
+    """
+    duree_cache = 3600
+    validateur_par_versions = True
+
+    def _produire_reponse(self, request, vue, *args, **kwargs):
+        import hashlib
+
+        from django.core.cache import cache as cache_django
+        from core import cache
+
+        if not cache.cache_partage():
+            return vue(request, *args, **kwargs)
+
+        modeles = (self.queryset.model,) + tuple(self.modeles_dependants)
+        versions = cache.versions(*[cache.espace_modele(modele) for modele in modeles])
+        # L'URL complète : paramètres de filtre et liens de pagination
+        requete = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+        cle = f"reponse:{modeles[0]._meta.label_lower}:{'.'.join(map(str, versions))}:{requete}"
+
+        donnees = cache_django.get(cle)
+        if donnees is not None:
+            return Response(donnees)
+
+        reponse = vue(request, *args, **kwargs)
+        if reponse.status_code == status.HTTP_200_OK:
+            cache_django.set(cle, reponse.data, self.duree_cache)
+        return reponse
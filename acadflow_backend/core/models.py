@@ -272,3 +272,43 @@ class ConfigurationEtablissement(TimestampedModel):
     class Meta:
         db_table = 'configuration_etablissement'
         verbose_name = 'Configuration établissement'
+
+class ObjetSupprime(models.Model):
+    """Traces des suppressions, pour la synchronisation incrémentale des clients"""
+    type_objet = models.CharField(max_length=100)  # app_label.modele
+    objet_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now_add=True)
+    
+    # Portée de l'objet supprimé : seuls les clients qui pouvaient le voir
+    # reçoivent sa suppression (voir SynchronisationMixin)
+    etudiant_id = models.IntegerField(null=True, blank=True)
+    enseignant_id = models.IntegerField(null=True, blank=True)
+    classe_id = models.IntegerField(null=True, blank=True)
+    session_id = models.IntegerField(null=True, blank=True)
+    
+    @classmethod
+    def enregistrer(cls, instance, **portee):
+        cls.objects.create(type_objet=instance._meta.label_lower, objet_id=instance.pk, **portee)
+    
+    @classmethod
+    def limite_retention(cls):
+        """Date avant laquelle les traces sont purgées"""
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+        
+        return timezone.now() - timedelta(days=settings.SYNCHRONISATION_RETENTION_JOURS)
+    
+    @classmethod
+    def purger(cls):
+        """Supprime les traces plus anciennes que la durée de rétention ; retourne leur nombre"""
+        return cls.objects.filter(updated_at__lt=cls.limite_retention()).delete()[0]
+    
+    def __str__(self):
+        return f"{self.type_objet} #{self.objet_id}"
+    
+    class Meta:
+        db_table = 'objets_supprimes'
+        indexes = [
+            models.Index(fields=['type_objet', 'updated_at', 'id']),
+        ]
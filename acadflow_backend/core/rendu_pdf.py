@@ -0,0 +1,249 @@
+# ========================================
+# FICHIER: core/rendu_pdf.py
+# ========================================
+
+"""
+Rendu PDF des récapitulatifs et des relevés de notes.
+
+Les fonctions de rendu ne reçoivent que des dictionnaires (jamais d'objets
+ORM) et n'accèdent pas à la base : elles peuvent donc être exécutées dans
+des processus séparés. flux_archive_pdf répartit le rendu sur le pool de
+processus du serveur et produit une archive ZIP au fil de l'eau, sans écrire
+les fichiers intermédiaires sur disque.
+
+Le pool est partagé par toutes les requêtes du processus serveur et borné
+par RENDU_PDF_PROCESSUS : des exports simultanés se répartissent les mêmes
+processus de rendu au lieu d'en créer chacun autant que de cœurs.
+"""
+
+import io
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+# Nombre de documents en attente par processus : borne la mémoire
+# occupée par les données et les PDF pas encore écrits dans l'archive
+DOCUMENTS_EN_ATTENTE_PAR_PROCESSUS = 4
+
+
+def _document(titre, sous_titre, tableaux, paysage=False):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    tampon = io.BytesIO()
+    document = SimpleDocTemplate(
+        tampon,
+        pagesize=landscape(A4) if paysage else A4,
+        leftMargin=1.5 * cm, rightMargin=1.5 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+        title=titre
+    )
+
+    elements = [Paragraph(titre, styles['Title']), Paragraph(sous_titre, styles['Normal']), Spacer(1, 0.5 * cm)]
+    for intitule, lignes in tableaux:
+        if intitule:
+            elements.append(Paragraph(intitule, styles['Heading4']))
+        tableau = Table(lignes, repeatRows=1)
+        tableau.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements += [tableau, Spacer(1, 0.3 * cm)]
+
+    document.build(elements)
+    return tampon.getvalue()
+
+
+def _valeur(valeur):
+    if valeur is None:
+        return '-'
+    if isinstance(valeur, float):
+        return f'{valeur:.2f}'
+    return str(valeur)
+
+
+def rendre_recapitulatif_pdf(donnees):
+    """PDF du récapitulatif d'une classe (données de _generer_donnees_recap)"""
+    classe = donnees['classe']
+    codes_ue = []
+    for etudiant in donnees['etudiants']:
+        for moyenne in etudiant['moyennes_ue']:
+            if moyenne['ue_code'] not in codes_ue:
+                codes_ue.append(moyenne['ue_code'])
+
+    lignes = [['Matricule', 'Nom et prénom'] + codes_ue + ['Moyenne', 'Crédits', 'Mention', 'Décision']]
+    for etudiant in donnees['etudiants']:
+        moyennes = {moyenne['ue_code']: moyenne['moyenne'] for moyenne in etudiant['moyennes_ue']}
+        lignes.append(
+            [etudiant['matricule'], etudiant['nom_complet']]
+            + [_valeur(moyennes.get(code)) for code in codes_ue]
+            + [
+                _valeur(etudiant['moyenne_semestre']),
+                f"{etudiant['credits_obtenus']}/{etudiant['credits_requis']}",
+                _valeur(etudiant['mention']),
+                _valeur(etudiant['decision'])
+            ]
+        )
+
+    return _document(
+        f"Récapitulatif {classe['nom']} - {donnees['semestre']}",
+        f"{classe['filiere']} - {classe['niveau']} - {donnees['session']} - Effectif : {classe['effectif']}",
+        [(None, lignes)],
+        paysage=True
+    )
+
+
+def rendre_releve_pdf(donnees):
+    """PDF du relevé de notes d'un étudiant (données de NoteService.releves_notes)"""
+    from datetime import date
+
+    etudiant = donnees['etudiant']
+    tableaux = []
+    for bloc in donnees['notes_par_ec']:
+        ec = bloc['ec']
+        lignes = [['Évaluation', 'Type', 'Date', 'Note', 'Sur 20', 'Observation']]
+        for note in bloc['notes']:
+            observation = ''
+            if note['absent']:
+                observation = 'Absence justifiée' if note['justifie'] else 'Absent'
+            lignes.append([
+                note['evaluation_nom'], note['type_evaluation'],
+                date.fromisoformat(note['date_evaluation']).strftime('%d/%m/%Y'),
+                f"{_valeur(note['note_obtenue'])}/{_valeur(note['note_sur'])}",
+                _valeur(note['note_sur_20']), observation
+            ])
+        intitule = f"{ec['code']} - {ec['nom']} ({ec['ue']})"
+        if bloc.get('moyenne') is not None:
+            intitule += f" — Moyenne : {_valeur(bloc['moyenne'])}"
+        tableaux.append((intitule, lignes))
+
+    if donnees['moyennes_ue']:
+        lignes = [['UE', 'Semestre', 'Année', 'Moyenne', 'Crédits', 'Validée']]
+        for moyenne in donnees['moyennes_ue']:
+            ue = moyenne['ue']
+            lignes.append([
+                f"{ue['code']} - {ue['nom']}", ue['semestre'], moyenne['annee_academique'],
+                _valeur(moyenne['moyenne']), f"{moyenne['credits_obtenus']}/{ue['credits']}",
+                'Oui' if moyenne['validee'] else 'Non'
+            ])
+        tableaux.append(('Moyennes des UE', lignes))
+
+    if donnees['moyennes_semestre']:
+        lignes = [['Semestre', 'Année', 'Moyenne', 'Crédits', 'Mention']]
+        for moyenne in donnees['moyennes_semestre']:
+            lignes.append([
+                moyenne['semestre'], moyenne['annee_academique'], _valeur(moyenne['moyenne_generale']),
+                f"{moyenne['credits_obtenus']}/{moyenne['credits_requis']}", _valeur(moyenne['mention'])
+            ])
+        tableaux.append(('Moyennes semestrielles', lignes))
+
+    return _document(
+        'Relevé de notes',
+        f"{etudiant['nom_complet']} ({etudiant['matricule']}) - {donnees['classe']} - "
+        f"{donnees['session']} - {donnees['annee_academique']}",
+        tableaux
+    )
+
+
+RENDUS = {
+    'recapitulatif': rendre_recapitulatif_pdf,
+    'releve': rendre_releve_pdf,
+}
+
+
+def _rendre(travail):
+    nom, type_document, donnees = travail
+    return nom, RENDUS[type_document](donnees)
+
+
+class _TamponFlux:
+    """Fichier en écriture seule, vidé à chaque morceau envoyé au client"""
+
+    def __init__(self):
+        self.morceaux = []
+        self.position = 0
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        self.position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        contenu = b''.join(self.morceaux)
+        self.morceaux = []
+        return contenu
+
+
+_pool = None
+_pool_pid = None
+_verrou_pool = threading.Lock()
+
+
+def _nombre_processus():
+    from django.conf import settings
+
+    return getattr(settings, 'RENDU_PDF_PROCESSUS', None) or os.cpu_count() or 1
+
+
+def _pool_rendu():
+    """Pool de rendu du processus serveur, créé au premier export"""
+    global _pool, _pool_pid
+
+    with _verrou_pool:
+        # Recréé après un fork (serveur préchargé) ou si un processus de rendu est mort
+        if _pool is None or _pool_pid != os.getpid() or getattr(_pool, '_broken', False):
+            # 'spawn' : les processus de rendu n'héritent ni des connexions à
+            # la base ni des threads du serveur
+            _pool = ProcessPoolExecutor(
+                max_workers=_nombre_processus(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def flux_archive_pdf(travaux):
+    """
+    Génère une archive ZIP morceau par morceau.
+
+    `travaux` est un itérable de (nom du fichier, type de document, données).
+    Le rendu est réparti sur le pool partagé ; l'ordre des fichiers dans
+    l'archive suit celui des travaux.
+    """
+    pool = _pool_rendu()
+    tampon = _TamponFlux()
+    limite = _nombre_processus() * DOCUMENTS_EN_ATTENTE_PAR_PROCESSUS
+    en_attente = deque()
+
+    try:
+        with zipfile.ZipFile(tampon, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for travail in travaux:
+                en_attente.append(pool.submit(_rendre, travail))
+                if len(en_attente) >= limite:
+                    archive.writestr(*en_attente.popleft().result())
+                    yield tampon.vider()
+
+            while en_attente:
+                archive.writestr(*en_attente.popleft().result())
+                yield tampon.vider()
+    finally:
+        # Client déconnecté : libérer le pool des rendus devenus inutiles
+        for futur in en_attente:
+            futur.cancel()
+
+    yield tampon.vider()
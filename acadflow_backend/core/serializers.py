@@ -8,6 +8,7 @@ from .models import (
     TypeEtablissement, Universite, Etablissement, Campus, ConfigurationEtablissement,
     Domaine, Cycle, TypeFormation, Filiere, Option, Niveau
 )
+from .contexte import ContexteAcademique
 
 class TypeEtablissementSerializer(serializers.ModelSerializer):
     class Meta:
@@ -217,13 +218,13 @@ class FiliereDetailSerializer(serializers.ModelSerializer):
             from academics.models import AnneeAcademique, Classe
             from academics.serializers import ClasseSerializer
             
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             classes = Classe.objects.filter(
                 filiere=obj,
                 annee_academique=annee_active,
                 active=True
             )
-            return ClasseSerializer(classes, many=True).data
+            return ClasseSerializer(ClasseSerializer.optimiser_queryset(classes), many=True).data
         except:
             return []
     
@@ -232,7 +233,7 @@ class FiliereDetailSerializer(serializers.ModelSerializer):
             from users.models import Inscription
             from academics.models import AnneeAcademique
             
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             inscriptions = Inscription.objects.filter(
                 classe__filiere=obj,
                 annee_academique=annee_active,
@@ -3,10 +3,13 @@ from django.db import transaction
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from decimal import Decimal
 import logging
 
+from core.contexte import ContexteAcademique
+
 logger = logging.getLogger(__name__)
 
 class AutomationService:
@@ -64,32 +67,65 @@ class AutomationService:
             }
     
     @staticmethod
-    def generer_recapitulatif_semestriel(classe, semestre, session):
-        """Génération automatique du récapitulatif semestriel"""
-        from academics.models import RecapitulatifSemestriel, UE
-        from evaluations.models import MoyenneSemestre, MoyenneUE
+    def generer_recapitulatif_semestriel(classe, semestre, session, forcer=False):
+        """
+        Génération automatique du récapitulatif semestriel.
+        
+        Un récapitulatif terminé dont l'empreinte des données d'entrée n'a pas
+        changé est réutilisé tel quel, sauf si `forcer` est vrai ; le résultat
+        indique si le récapitulatif a été réutilisé ou reconstruit.
+        
+        La génération se fait en trois temps pour ne garder aucun verrou
+        pendant l'écriture des fichiers (XLSX, PDF) : calcul sur un
+        instantané en lecture seule, écriture des fichiers hors transaction,
+        puis transaction courte enregistrant les métadonnées, les lignes
+        par étudiant et l'état de la classe.
+        """
+        from academics.models import RecapitulatifSemestriel, LigneRecapitulatif, Classe
+        from evaluations.models import MoyenneSemestre
         from users.models import Inscription
+        from core.exports import ecrire_recapitulatif_excel
+        from core.rendu_pdf import rendre_recapitulatif_pdf
+        from django.core.files import File
         from django.core.files.base import ContentFile
-        import json
+        import tempfile
+        
+        recap = None
+        fichiers = []
+        classeur = tempfile.TemporaryFile()
         
         try:
-            with transaction.atomic():
-                # Créer ou récupérer le récapitulatif
-                recap, created = RecapitulatifSemestriel.objects.get_or_create(
-                    classe=classe,
-                    semestre=semestre,
-                    session=session,
-                    annee_academique=classe.annee_academique,
-                    defaults={'statut': 'en_cours'}
+            # Créer ou récupérer le récapitulatif
+            recap, created = RecapitulatifSemestriel.objects.get_or_create(
+                classe=classe,
+                semestre=semestre,
+                session=session,
+                annee_academique=classe.annee_academique,
+                defaults={'statut': 'en_cours'}
+            )
+            
+            empreinte = AutomationService.empreinte_recapitulatif(classe, semestre, session)
+            
+            if not created and not forcer and recap.statut == 'termine' and recap.empreinte == empreinte:
+                return {
+                    'success': True,
+                    'message': 'Récapitulatif à jour, réutilisé',
+                    'recap_id': recap.id,
+                    'reutilise': True
+                }
+            
+            if not created:
+                # Régénération visible pendant le calcul ; la mise à jour
+                # finale (ou l'échec) fixe le nouveau statut
+                recap.statut = 'en_cours'
+                RecapitulatifSemestriel.objects.filter(pk=recap.pk).update(
+                    statut='en_cours', updated_at=timezone.now()
                 )
-                
-                if not created and recap.statut == 'termine':
-                    return {
-                        'success': True,
-                        'message': 'Récapitulatif déjà généré',
-                        'recap_id': recap.id
-                    }
-                
+            
+            anciens_fichiers = [fichier.name for fichier in (recap.fichier_excel, recap.fichier_pdf) if fichier]
+            
+            # 1. Calcul sur un instantané cohérent, sans verrou
+            with AutomationService._lecture_coherente():
                 # Récupérer tous les étudiants de la classe
                 inscriptions = Inscription.objects.filter(
                     classe=classe,
@@ -97,72 +133,193 @@ class AutomationService:
                 ).select_related('etudiant__user')
                 
                 # Statistiques globales
-                moyennes_semestre = MoyenneSemestre.objects.filter(
-                    classe=classe,
-                    semestre=semestre,
-                    session=session,
-                    annee_academique=classe.annee_academique
-                )
-                
-                if moyennes_semestre.exists():
-                    moyennes_values = [float(m.moyenne_generale) for m in moyennes_semestre]
-                    
-                    recap.nombre_etudiants = len(moyennes_values)
-                    recap.moyenne_classe = sum(moyennes_values) / len(moyennes_values)
-                    recap.taux_reussite = (len([m for m in moyennes_values if m >= 10]) / len(moyennes_values)) * 100
+                moyennes_values = [
+                    float(moyenne) for moyenne in MoyenneSemestre.objects.filter(
+                        classe=classe,
+                        semestre=semestre,
+                        session=session,
+                        annee_academique=classe.annee_academique
+                    ).values_list('moyenne_generale', flat=True)
+                ]
                 
                 # Générer les données détaillées
                 donnees_recap = AutomationService._generer_donnees_recap(
                     classe, semestre, session, inscriptions
                 )
                 
-                # Sauvegarder les données (ici vous pourriez générer PDF/Excel)
-                fichier_json = ContentFile(
-                    json.dumps(donnees_recap, indent=2, default=str).encode('utf-8')
-                )
-                recap.fichier_excel.save(
-                    f'recap_{classe.code}_{semestre.nom}_{session.code}.json',
-                    fichier_json
+                # Classeur XLSX écrit en streaming dans un fichier temporaire local
+                ecrire_recapitulatif_excel(classe, semestre, session, classeur)
+            
+            if moyennes_values:
+                recap.nombre_etudiants = len(moyennes_values)
+                recap.moyenne_classe = sum(moyennes_values) / len(moyennes_values)
+                recap.taux_reussite = (len([m for m in moyennes_values if m >= 10]) / len(moyennes_values)) * 100
+            
+            # 2. Écriture des fichiers hors transaction
+            nom_fichier = f'recap_{classe.code}_{semestre.nom}_{session.code}'
+            classeur.seek(0)
+            recap.fichier_excel.save(f'{nom_fichier}.xlsx', File(classeur), save=False)
+            fichiers.append(recap.fichier_excel)
+            recap.fichier_pdf.save(
+                f'{nom_fichier}.pdf',
+                ContentFile(rendre_recapitulatif_pdf(donnees_recap)),
+                save=False
+            )
+            fichiers.append(recap.fichier_pdf)
+            
+            # 3. Mise à jour courte des métadonnées
+            maintenant = timezone.now()
+            champs_classe = (
+                {'recap_s1_genere': True, 'date_recap_s1': maintenant}
+                if semestre.numero == 1 else
+                {'recap_s2_genere': True, 'date_recap_s2': maintenant}
+            )
+            
+            with transaction.atomic():
+                RecapitulatifSemestriel.objects.filter(pk=recap.pk).update(
+                    statut='termine',
+                    nombre_etudiants=recap.nombre_etudiants,
+                    moyenne_classe=recap.moyenne_classe,
+                    taux_reussite=recap.taux_reussite,
+                    fichier_excel=recap.fichier_excel.name,
+                    fichier_pdf=recap.fichier_pdf.name,
+                    empreinte=empreinte,
+                    updated_at=maintenant
                 )
-                
-                recap.statut = 'termine'
-                recap.save()
-                
+                # Données détaillées : une ligne par étudiant, consultables par page
+                LigneRecapitulatif.objects.filter(recapitulatif=recap).delete()
+                LigneRecapitulatif.objects.bulk_create([
+                    LigneRecapitulatif(
+                        recapitulatif=recap,
+                        etudiant_id=etudiant['etudiant_id'],
+                        rang=rang,
+                        matricule=etudiant['matricule'],
+                        nom_complet=etudiant['nom_complet'],
+                        moyennes_ue=etudiant['moyennes_ue'],
+                        moyenne_semestre=etudiant['moyenne_semestre'],
+                        credits_obtenus=etudiant['credits_obtenus'],
+                        credits_requis=etudiant['credits_requis'],
+                        mention=etudiant['mention'] or '',
+                        decision=etudiant['decision'] or ''
+                    )
+                    for rang, etudiant in enumerate(donnees_recap['etudiants'], start=1)
+                ], batch_size=500)
                 # Marquer la classe comme ayant son récap généré
-                if semestre.numero == 1:
-                    classe.recap_s1_genere = True
-                    classe.date_recap_s1 = timezone.now()
-                else:
-                    classe.recap_s2_genere = True
-                    classe.date_recap_s2 = timezone.now()
-                classe.save()
-                
-                return {
-                    'success': True,
-                    'message': f'Récapitulatif généré pour {classe.nom} - {semestre.nom}',
-                    'recap_id': recap.id,
-                    'stats': {
-                        'nombre_etudiants': recap.nombre_etudiants,
-                        'moyenne_classe': float(recap.moyenne_classe) if recap.moyenne_classe else 0,
-                        'taux_reussite': float(recap.taux_reussite) if recap.taux_reussite else 0
-                    }
+                Classe.objects.filter(pk=classe.pk).update(updated_at=maintenant, **champs_classe)
+            
+            recap.statut = 'termine'
+            recap.empreinte = empreinte
+            for champ, valeur in champs_classe.items():
+                setattr(classe, champ, valeur)
+            
+            # Fichiers de la génération précédente, remplacés
+            for nom in anciens_fichiers:
+                if nom not in (recap.fichier_excel.name, recap.fichier_pdf.name):
+                    recap.fichier_excel.storage.delete(nom)
+            
+            return {
+                'success': True,
+                'message': f'Récapitulatif généré pour {classe.nom} - {semestre.nom}',
+                'recap_id': recap.id,
+                'reutilise': False,
+                'stats': {
+                    'nombre_etudiants': recap.nombre_etudiants,
+                    'moyenne_classe': float(recap.moyenne_classe) if recap.moyenne_classe else 0,
+                    'taux_reussite': float(recap.taux_reussite) if recap.taux_reussite else 0
                 }
-                
+            }
+            
         except Exception as e:
             logger.error(f"Erreur génération récapitulatif {classe.nom} - {semestre.nom}: {str(e)}")
-            if 'recap' in locals():
-                recap.statut = 'erreur'
-                recap.save()
+            if recap is not None:
+                # Fichiers écrits mais métadonnées non enregistrées : ne pas les laisser orphelins
+                for fichier in fichiers:
+                    fichier.storage.delete(fichier.name)
+                RecapitulatifSemestriel.objects.filter(pk=recap.pk).update(
+                    statut='erreur', updated_at=timezone.now()
+                )
             return {
                 'success': False,
                 'error': str(e)
             }
+        
+        finally:
+            classeur.close()
+    
+    @staticmethod
+    def empreinte_recapitulatif(classe, semestre, session):
+        """
+        Empreinte des données d'entrée d'un récapitulatif : nombre de lignes et
+        dernière mise à jour des inscriptions, de la structure UE/EC et des
+        moyennes EC, UE et semestrielles de la classe.
+        """
+        import hashlib
+        from django.db.models import Count, Max
+        from academics.models import UE, EC
+        from evaluations.models import MoyenneEC, MoyenneUE, MoyenneSemestre
+        from users.models import Inscription
+        
+        annee = classe.annee_academique
+        ues = UE.objects.filter(niveau=classe.niveau, semestre=semestre)
+        etudiants = Inscription.objects.filter(classe=classe, active=True).values('etudiant_id')
+        
+        sources = [
+            Inscription.objects.filter(classe=classe),
+            ues,
+            EC.objects.filter(ue__in=ues),
+            MoyenneEC.objects.filter(
+                etudiant_id__in=etudiants, ec__ue__in=ues, session=session, annee_academique=annee
+            ),
+            MoyenneUE.objects.filter(
+                etudiant_id__in=etudiants, ue__in=ues, session=session, annee_academique=annee
+            ),
+            MoyenneSemestre.objects.filter(
+                classe=classe, semestre=semestre, session=session, annee_academique=annee
+            ),
+        ]
+        
+        etat = []
+        for queryset in sources:
+            agregat = queryset.aggregate(nombre=Count('id'), derniere_maj=Max('updated_at'))
+            derniere_maj = agregat['derniere_maj'].isoformat() if agregat['derniere_maj'] else ''
+            etat.append(f"{agregat['nombre']}:{derniere_maj}")
+        
+        return hashlib.sha256('|'.join(etat).encode()).hexdigest()
+    
+    @staticmethod
+    @contextmanager
+    def _lecture_coherente():
+        """
+        Transaction en lecture seule sur un instantané de la base.
+        
+        Sous PostgreSQL, l'isolation REPEATABLE READ garantit que toutes les
+        lectures voient le même état sans poser de verrou ; la saisie des
+        notes n'est donc pas bloquée pendant le calcul.
+        """
+        from django.db import connection
+        
+        externe = not connection.in_atomic_block
+        with transaction.atomic():
+            # Le niveau d'isolation ne peut être choisi qu'en début de transaction
+            if externe and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+            yield
     
     @staticmethod
     def _generer_donnees_recap(classe, semestre, session, inscriptions):
-        """Génère les données détaillées du récapitulatif"""
+        """
+        Génère les données détaillées du récapitulatif.
+        
+        Les moyennes UE et semestrielles de toute la classe sont chargées en
+        une requête chacune puis indexées : le nombre de requêtes ne dépend
+        pas de l'effectif.
+        """
         from academics.models import UE
-        from evaluations.models import MoyenneUE, MoyenneSemestre, MoyenneEC
+        from evaluations.models import MoyenneUE, MoyenneSemestre
+        
+        inscriptions = list(inscriptions)
+        etudiants_ids = [inscription.etudiant_id for inscription in inscriptions]
         
         donnees = {
             'classe': {
@@ -170,7 +327,7 @@ class AutomationService:
                 'code': classe.code,
                 'niveau': classe.niveau.nom,
                 'filiere': classe.filiere.nom,
-                'effectif': inscriptions.count()
+                'effectif': len(inscriptions)
             },
             'semestre': semestre.nom,
             'session': session.nom,
@@ -179,14 +336,36 @@ class AutomationService:
         }
         
         # UEs du semestre
-        ues_semestre = UE.objects.filter(
+        ues_semestre = list(UE.objects.filter(
             niveau=classe.niveau,
             semestre=semestre,
             actif=True
-        ).order_by('code')
+        ).order_by('code'))
+        
+        # Moyennes indexées par étudiant
+        moyennes_ue = {
+            (moyenne.etudiant_id, moyenne.ue_id): moyenne
+            for moyenne in MoyenneUE.objects.filter(
+                etudiant_id__in=etudiants_ids,
+                ue__in=ues_semestre,
+                session=session,
+                annee_academique=classe.annee_academique
+            )
+        }
+        moyennes_semestre = {
+            moyenne.etudiant_id: moyenne
+            for moyenne in MoyenneSemestre.objects.filter(
+                etudiant_id__in=etudiants_ids,
+                classe=classe,
+                semestre=semestre,
+                session=session,
+                annee_academique=classe.annee_academique
+            )
+        }
         
         for inscription in inscriptions:
             etudiant_data = {
+                'etudiant_id': inscription.etudiant_id,
                 'matricule': inscription.etudiant.user.matricule,
                 'nom_complet': inscription.etudiant.user.get_full_name(),
                 'moyennes_ue': [],
@@ -199,12 +378,7 @@ class AutomationService:
             
             # Moyennes UE
             for ue in ues_semestre:
-                moyenne_ue = MoyenneUE.objects.filter(
-                    etudiant=inscription.etudiant,
-                    ue=ue,
-                    session=session,
-                    annee_academique=classe.annee_academique
-                ).first()
+                moyenne_ue = moyennes_ue.get((inscription.etudiant_id, ue.id))
                 
                 if moyenne_ue:
                     etudiant_data['moyennes_ue'].append({
@@ -220,13 +394,7 @@ class AutomationService:
                     etudiant_data['credits_requis'] += ue.credits
             
             # Moyenne semestrielle
-            moyenne_sem = MoyenneSemestre.objects.filter(
-                etudiant=inscription.etudiant,
-                classe=classe,
-                semestre=semestre,
-                session=session,
-                annee_academique=classe.annee_academique
-            ).first()
+            moyenne_sem = moyennes_semestre.get(inscription.etudiant_id)
             
             if moyenne_sem:
                 etudiant_data['moyenne_semestre'] = float(moyenne_sem.moyenne_generale)
@@ -399,11 +567,11 @@ class AutomationService:
     @staticmethod
     def planifier_recapitulatifs_automatiques():
         """Planifie la génération automatique des récapitulatifs semestriels"""
-        from academics.models import Classe, Semestre, Session, AnneeAcademique
+        from academics.models import Classe, Semestre, Session, AnneeAcademique, RecapitulatifSemestriel
         from evaluations.models import TacheAutomatisee
         
         try:
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             if not annee_active.generation_auto_recaps:
                 return {'message': 'Génération automatique désactivée'}
             
@@ -413,6 +581,7 @@ class AutomationService:
                 date_fin_session__isnull=False
             )
             
+            semestres = list(Semestre.objects.all())
             taches_planifiees = 0
             
             for session in sessions:
@@ -425,29 +594,46 @@ class AutomationService:
                     active=True
                 )
                 
-                for classe in classes:
-                    for semestre in Semestre.objects.all():
-                        # Vérifier si le récap n'est pas déjà généré
-                        if semestre.numero == 1 and classe.recap_s1_genere:
+                recaps = {
+                    (recap.classe_id, recap.semestre_id): recap
+                    for recap in RecapitulatifSemestriel.objects.filter(
+                        annee_academique=annee_active,
+                        session=session,
+                        statut='termine'
+                    ).only('classe_id', 'semestre_id', 'empreinte')
+                }
+                en_attente = set(TacheAutomatisee.objects.filter(
+                    type_tache='recap_semestriel',
+                    session=session,
+                    annee_academique=annee_active,
+                    statut__in=['planifiee', 'en_cours']
+                ).values_list('classe_id', 'semestre_id'))
+                
+                for classe in classes.select_related('niveau', 'annee_academique'):
+                    for semestre in semestres:
+                        # Déjà planifiée ou en cours
+                        if (classe.id, semestre.id) in en_attente:
                             continue
-                        if semestre.numero == 2 and classe.recap_s2_genere:
+                        
+                        # Récapitulatif déjà généré et à jour (les anciens, sans
+                        # empreinte, ne sont pas régénérés automatiquement)
+                        recap = recaps.get((classe.id, semestre.id))
+                        if recap and (
+                            not recap.empreinte or
+                            recap.empreinte == AutomationService.empreinte_recapitulatif(classe, semestre, session)
+                        ):
                             continue
                         
-                        # Planifier la tâche si elle n'existe pas
-                        tache, created = TacheAutomatisee.objects.get_or_create(
+                        TacheAutomatisee.objects.create(
                             type_tache='recap_semestriel',
                             classe=classe,
                             semestre=semestre,
                             session=session,
                             annee_academique=annee_active,
-                            defaults={
-                                'date_planifiee': timezone.now() + timedelta(hours=1),
-                                'statut': 'planifiee'
-                            }
+                            date_planifiee=timezone.now() + timedelta(hours=1),
+                            statut='planifiee'
                         )
-                        
-                        if created:
-                            taches_planifiees += 1
+                        taches_planifiees += 1
             
             return {
                 'success': True,
@@ -461,14 +647,293 @@ class AutomationService:
                 'error': str(e)
             }
     
+    @staticmethod
+    def planifier_calcul_moyennes(classe, ec, session):
+        """
+        Planifie le recalcul des moyennes d'une classe pour un EC et une session.
+        
+        Les demandes successives pour la même (classe, ec, session) pendant le
+        délai de regroupement sont fusionnées dans une seule tâche, dont
+        l'échéance est repoussée à chaque nouvelle demande.
+        """
+        from evaluations.models import TacheAutomatisee
+        from core.tasks import calculer_moyennes_async
+        
+        delai = timedelta(seconds=settings.CALCUL_MOYENNES_DELAI_REGROUPEMENT)
+        
+        with transaction.atomic():
+            tache = TacheAutomatisee.objects.select_for_update().filter(
+                type_tache='calcul_moyennes',
+                classe=classe,
+                ec=ec,
+                session=session,
+                statut='planifiee'
+            ).first()
+            
+            if tache:
+                tache.date_planifiee = timezone.now() + delai
+                tache.save(update_fields=['date_planifiee', 'updated_at'])
+                return tache
+            
+            tache = TacheAutomatisee.objects.create(
+                type_tache='calcul_moyennes',
+                classe=classe,
+                ec=ec,
+                session=session,
+                annee_academique=classe.annee_academique,
+                date_planifiee=timezone.now() + delai,
+                statut='planifiee'
+            )
+            
+            def envoyer():
+                try:
+                    calculer_moyennes_async.apply_async(
+                        args=[tache.id], countdown=delai.total_seconds()
+                    )
+                except Exception as e:
+                    # La tâche reste planifiée et sera reprise par executer_taches_planifiees
+                    logger.error(f"Impossible d'envoyer la tâche {tache.id} à Celery: {str(e)}")
+            
+            transaction.on_commit(envoyer)
+        
+        return tache
+    
+    @staticmethod
+    def executer_tache_calcul_moyennes(tache_id):
+        """
+        Exécute une tâche de recalcul des moyennes si son échéance est atteinte.
+        
+        Retourne {'reporter_de': secondes} si l'échéance a été repoussée par une
+        saisie plus récente, afin que l'appelant se reprogramme.
+        """
+        from evaluations.models import TacheAutomatisee
+        
+        maintenant = timezone.now()
+        prise = TacheAutomatisee.objects.filter(
+            pk=tache_id,
+            statut='planifiee',
+            date_planifiee__lte=maintenant
+        ).update(statut='en_cours', date_execution=maintenant)
+        
+        tache = TacheAutomatisee.objects.select_related('classe', 'ec', 'session').get(pk=tache_id)
+        
+        if not prise:
+            if tache.statut == 'planifiee':
+                return {'reporter_de': max((tache.date_planifiee - maintenant).total_seconds(), 0)}
+            return {'success': True, 'message': f'Tâche déjà {tache.get_statut_display().lower()}'}
+        
+        resultat = AutomationService.calculer_moyennes_planifiees(tache)
+        
+        tache.statut = 'terminee' if resultat['success'] else 'erreur'
+        tache.resultats = resultat
+        tache.erreurs = resultat.get('error', '')
+        tache.date_fin = timezone.now()
+        tache.save()
+        
+        return resultat
+    
+    @staticmethod
+    def calculer_moyennes_planifiees(tache):
+        """Propage les notes modifiées de la classe/EC/session d'une tâche"""
+        from core.matrice_notes import propager_moyennes_a_recalculer
+        
+        try:
+            resultats = propager_moyennes_a_recalculer(
+                ec=tache.ec,
+                session=tache.session,
+                annee_academique=tache.annee_academique,
+                etudiant__inscription__classe=tache.classe,
+                etudiant__inscription__active=True
+            )
+            
+            if resultats['echecs']:
+                return {
+                    'success': False,
+                    'error': f"{resultats['echecs']} moyennes n'ont pas pu être recalculées",
+                    **resultats
+                }
+            
+            return {'success': True, **resultats}
+            
+        except Exception as e:
+            logger.error(f"Erreur recalcul des moyennes (tâche {tache.id}): {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def lancer_recapitulatifs_masse(annee, semestre, session, classes):
+        """
+        Lance la génération des récapitulatifs de plusieurs classes en parallèle.
+
+        Une tâche 'recap_semestriel' est créée par classe et rattachée à une
+        tâche parente 'recaps_masse' (le lot). Les tâches sont réparties sur les
+        workers Celery puis le lot est clôturé par finaliser_lot_recapitulatifs
+        une fois toutes les classes traitées.
+        """
+        from evaluations.models import TacheAutomatisee
+        from core.tasks import generer_recapitulatif_async, finaliser_lot_recapitulatifs
+        from celery import chord
+
+        maintenant = timezone.now()
+
+        with transaction.atomic():
+            lot = TacheAutomatisee.objects.create(
+                type_tache='recaps_masse',
+                semestre=semestre,
+                session=session,
+                annee_academique=annee,
+                statut='en_cours',
+                date_planifiee=maintenant,
+                date_execution=maintenant,
+                resultats={'total_classes': len(classes)}
+            )
+
+            taches = TacheAutomatisee.objects.bulk_create([
+                TacheAutomatisee(
+                    type_tache='recap_semestriel',
+                    classe=classe,
+                    semestre=semestre,
+                    session=session,
+                    annee_academique=annee,
+                    lot=lot,
+                    date_planifiee=maintenant,
+                    statut='planifiee'
+                )
+                for classe in classes
+            ])
+
+            def envoyer():
+                try:
+                    chord(
+                        generer_recapitulatif_async.s(
+                            tache.classe_id, semestre.id, session.id, tache_id=tache.id
+                        )
+                        for tache in taches
+                    )(finaliser_lot_recapitulatifs.s(lot.id))
+                except Exception as e:
+                    # Les tâches restent planifiées et seront reprises par executer_taches_planifiees
+                    logger.error(f"Impossible d'envoyer le lot {lot.id} à Celery: {str(e)}")
+
+            transaction.on_commit(envoyer)
+
+        return lot
+
+    @staticmethod
+    def executer_tache_recapitulatif(tache_id):
+        """Exécute une tâche de récapitulatif si elle n'a pas déjà été prise"""
+        from evaluations.models import TacheAutomatisee
+
+        prise = TacheAutomatisee.objects.filter(
+            pk=tache_id,
+            statut='planifiee'
+        ).update(statut='en_cours', date_execution=timezone.now())
+
+        tache = TacheAutomatisee.objects.select_related('classe', 'semestre', 'session').get(pk=tache_id)
+
+        if not prise:
+            return {
+                'success': tache.statut != 'erreur',
+                'message': f'Tâche déjà {tache.get_statut_display().lower()}'
+            }
+
+        # La tâche ne doit pas rester en cours : le lot ne serait jamais clôturé
+        resultat = {'success': False, 'error': 'Exécution interrompue'}
+        try:
+            resultat = AutomationService.generer_recapitulatif_semestriel(
+                tache.classe, tache.semestre, tache.session
+            )
+        except Exception as e:
+            logger.error(f"Erreur exécution tâche {tache.id}: {str(e)}")
+            resultat = {'success': False, 'error': str(e)}
+        finally:
+            tache.statut = 'terminee' if resultat['success'] else 'erreur'
+            tache.resultats = resultat
+            tache.erreurs = resultat.get('error', '')
+            tache.date_fin = timezone.now()
+            tache.save()
+
+        return resultat
+
+    @staticmethod
+    def progression_lot(lot):
+        """Avancement d'un lot de tâches : terminées, en échec et restantes"""
+        from django.db.models import Count
+
+        compteurs = dict(
+            lot.taches_lot.values_list('statut').annotate(nombre=Count('id')).order_by()
+        )
+        total = sum(compteurs.values())
+        terminees = compteurs.get('terminee', 0)
+        echecs = compteurs.get('erreur', 0)
+
+        return {
+            'lot_id': lot.id,
+            'statut': lot.statut,
+            'total': total,
+            'terminees': terminees,
+            'echecs': echecs,
+            'en_cours': compteurs.get('en_cours', 0),
+            'restantes': total - terminees - echecs,
+            'pourcentage': round((terminees + echecs) / total * 100, 1) if total else 100.0,
+            'classes_en_echec': [
+                {'classe': nom, 'erreur': erreur}
+                for nom, erreur in lot.taches_lot.filter(statut='erreur').values_list('classe__nom', 'erreurs')
+            ]
+        }
+
+    @staticmethod
+    def finaliser_lot(lot_id, echecs=None):
+        """
+        Clôture un lot dont toutes les tâches sont traitées et en agrège les résultats.
+
+        `echecs` ({tache_id: erreur}) : tâches du lot dont l'exécution a échoué
+        sans qu'elles aient pu être marquées ; elles sont comptées en erreur.
+        """
+        from evaluations.models import TacheAutomatisee
+
+        with transaction.atomic():
+            lot = TacheAutomatisee.objects.select_for_update().get(pk=lot_id)
+            if lot.statut != 'en_cours':
+                return lot.resultats
+
+            for tache_id, erreur in (echecs or {}).items():
+                lot.taches_lot.filter(
+                    pk=tache_id,
+                    statut__in=['planifiee', 'en_cours']
+                ).update(statut='erreur', erreurs=erreur, date_fin=timezone.now())
+
+            progression = AutomationService.progression_lot(lot)
+            if progression['restantes']:
+                return progression
+
+            lot.statut = 'erreur' if progression['echecs'] else 'terminee'
+            lot.resultats = {
+                'total_classes': progression['total'],
+                'recaps_generes': progression['terminees'],
+                'echecs': progression['echecs'],
+                'classes_en_echec': progression['classes_en_echec']
+            }
+            lot.erreurs = f"{progression['echecs']} classe(s) en échec" if progression['echecs'] else ''
+            lot.date_fin = timezone.now()
+            lot.save()
+
+        logger.info(
+            f"Lot {lot.id} terminé: {progression['terminees']} récapitulatifs générés, "
+            f"{progression['echecs']} échecs"
+        )
+        return lot.resultats
+
     @staticmethod
     def executer_taches_planifiees():
         """Exécute les tâches automatisées planifiées"""
         from evaluations.models import TacheAutomatisee
         
+        maintenant = timezone.now()
         taches_a_executer = TacheAutomatisee.objects.filter(
             statut='planifiee',
-            date_planifiee__lte=timezone.now()
+            date_planifiee__lte=maintenant
         ).order_by('date_planifiee')
         
         resultats = {
@@ -477,12 +942,22 @@ class AutomationService:
             'details': []
         }
         
+        lots = set()
+        
         for tache in taches_a_executer:
+            # Prise atomique : une tâche déjà prise par un worker Celery ou une
+            # autre exécution périodique n'est pas exécutée deux fois
+            prise = TacheAutomatisee.objects.filter(
+                pk=tache.pk,
+                statut='planifiee',
+                date_planifiee__lte=maintenant
+            ).update(statut='en_cours', date_execution=timezone.now())
+            if not prise:
+                continue
+            
+            lots.add(tache.lot_id)
+            tache.refresh_from_db(fields=['statut', 'date_execution'])
             try:
-                tache.statut = 'en_cours'
-                tache.date_execution = timezone.now()
-                tache.save()
-                
                 if tache.type_tache == 'recap_semestriel':
                     resultat = AutomationService.generer_recapitulatif_semestriel(
                         tache.classe,
@@ -493,6 +968,8 @@ class AutomationService:
                     resultat = AutomationService.inscrire_etudiants_ecs_automatique(
                         tache.classe
                     )
+                elif tache.type_tache == 'calcul_moyennes':
+                    resultat = AutomationService.calculer_moyennes_planifiees(tache)
                 else:
                     resultat = {'success': False, 'error': 'Type de tâche non supporté'}
                 
@@ -530,6 +1007,10 @@ class AutomationService:
                     'erreur': str(e)
                 })
         
+        # Lots repris ici faute de worker Celery : les clôturer s'ils sont complets
+        for lot_id in lots - {None}:
+            AutomationService.finaliser_lot(lot_id)
+        
         return resultats
 
 class NotificationService:
@@ -544,7 +1025,7 @@ class NotificationService:
         User = get_user_model()
         
         try:
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
             classes = Classe.objects.filter(
                 annee_academique=annee_active,
                 active=True
@@ -630,6 +1111,547 @@ class NotificationService:
         )
 
 
+class NoteService:
+    """Service d'enregistrement des notes"""
+    
+    CHAMPS_MODIFIABLES = [
+        'note_obtenue', 'absent', 'justifie', 'commentaire',
+        'modifiee', 'date_modification', 'note_precedente', 'updated_at'
+    ]
+    
+    @staticmethod
+    def version_feuille(evaluation):
+        """
+        Jeton de version de la feuille de notes d'une évaluation, dérivé du
+        nombre de notes et de leur dernière date de mise à jour.
+        """
+        import hashlib
+        from django.db.models import Count, Max
+        from evaluations.models import Note
+        
+        etat = Note.objects.filter(evaluation=evaluation).aggregate(
+            nombre=Count('id'),
+            derniere_maj=Max('updated_at')
+        )
+        derniere_maj = etat['derniere_maj'].isoformat() if etat['derniere_maj'] else ''
+        return hashlib.sha1(
+            f"{evaluation.pk}:{etat['nombre']}:{derniere_maj}".encode()
+        ).hexdigest()[:16]
+    
+    @staticmethod
+    def enregistrer_notes(evaluation, notes_data):
+        """
+        Enregistre en lot les notes d'une évaluation.
+        
+        Les étudiants et les notes existantes sont chargés en deux requêtes,
+        comparés en mémoire puis écrits en un seul upsert, avec la
+        même traçabilité que Note.save() (modifiee, date_modification,
+        note_precedente) et le marquage des moyennes à recalculer.
+        Retourne un dict avec notes_sauvees (notes créées ou modifiées),
+        notes_inchangees (lignes identiques aux notes existantes, non
+        réécrites), erreurs et les notes écrites.
+        
+        Les erreurs des notes portant un numéro de `ligne` (import de
+        fichier) sont des dicts {'ligne', 'matricule', 'erreur'}, les autres
+        de simples messages.
+        """
+        from django.core.exceptions import ValidationError
+        from users.models import Etudiant
+        from evaluations.models import Note, MoyenneARecalculer
+        
+        champ_note = Note._meta.get_field('note_obtenue')
+        enseignement = evaluation.enseignement
+        
+        identifiants = {}
+        for note_data in notes_data:
+            etudiant_id = note_data.get('etudiant_id')
+            try:
+                identifiants[etudiant_id] = int(etudiant_id)
+            except (TypeError, ValueError):
+                continue
+        
+        etudiants = Etudiant.objects.select_related('user').in_bulk(set(identifiants.values()))
+        notes = {}
+        for note in Note.objects.filter(evaluation=evaluation, etudiant_id__in=etudiants):
+            # Étudiant déjà chargé avec son utilisateur : pas de requête par note
+            note.etudiant = etudiants[note.etudiant_id]
+            notes[note.etudiant_id] = note
+        
+        maintenant = timezone.now()
+        notes_creees = {}
+        notes_modifiees = {}
+        cellules = set()
+        erreurs = []
+        notes_inchangees = 0
+        
+        def signaler(note_data, erreur):
+            if note_data.get('ligne') is None:
+                erreurs.append(erreur)
+            else:
+                erreurs.append({
+                    'ligne': note_data['ligne'],
+                    'matricule': note_data.get('matricule'),
+                    'erreur': erreur
+                })
+        
+        for note_data in notes_data:
+            etudiant_id = note_data.get('etudiant_id')
+            note_obtenue = note_data.get('note_obtenue')
+            absent = note_data.get('absent', False)
+            justifie = note_data.get('justifie', False)
+            commentaire = note_data.get('commentaire', '')
+            
+            if not etudiant_id:
+                signaler(note_data, "etudiant_id manquant")
+                continue
+            
+            etudiant = etudiants.get(identifiants.get(etudiant_id))
+            if etudiant is None:
+                signaler(note_data, f"Étudiant ID {etudiant_id} non trouvé")
+                continue
+            
+            try:
+                valeur = champ_note.to_python(note_obtenue or 0)
+            except ValidationError:
+                signaler(note_data, f"Note invalide pour {etudiant.user.matricule}: {note_obtenue}")
+                continue
+            
+            # Validation de la note
+            if not absent and note_obtenue is not None:
+                if valeur < 0 or valeur > evaluation.note_sur:
+                    signaler(note_data, f"Note invalide pour {etudiant.user.matricule}: {note_obtenue}")
+                    continue
+            
+            note = notes.get(etudiant.id)
+            if note is None:
+                note = Note(
+                    etudiant=etudiant,
+                    evaluation=evaluation,
+                    note_obtenue=valeur,
+                    absent=absent,
+                    justifie=justifie,
+                    commentaire=commentaire
+                )
+                notes[etudiant.id] = notes_creees[etudiant.id] = note
+                a_recalculer = True
+            else:
+                a_recalculer = note.note_obtenue != valeur or note.absent != absent
+                modifiee = (
+                    a_recalculer or
+                    note.justifie != justifie or
+                    note.commentaire != commentaire
+                )
+                
+                # Traçabilité des modifications, comme Note.save()
+                if note.note_obtenue != valeur:
+                    note.modifiee = True
+                    note.date_modification = maintenant
+                    note.note_precedente = note.note_obtenue
+                
+                note.note_obtenue = valeur
+                note.absent = absent
+                note.justifie = justifie
+                note.commentaire = commentaire
+                
+                # Une ligne répétée ne compte qu'une fois
+                if etudiant.id not in notes_creees and etudiant.id not in notes_modifiees:
+                    if modifiee:
+                        notes_modifiees[etudiant.id] = note
+                    else:
+                        notes_inchangees += 1
+            
+            if a_recalculer:
+                cellules.add((
+                    etudiant.id,
+                    enseignement.ec_id,
+                    evaluation.session_id,
+                    enseignement.annee_academique_id
+                ))
+        
+        # Un seul INSERT ... ON CONFLICT pour les créations et les modifications
+        notes_a_ecrire = list(notes_creees.values()) + list(notes_modifiees.values())
+        with transaction.atomic():
+            if notes_a_ecrire:
+                Note.objects.bulk_create(
+                    notes_a_ecrire,
+                    update_conflicts=True,
+                    unique_fields=['etudiant', 'evaluation'],
+                    update_fields=NoteService.CHAMPS_MODIFIABLES,
+                    batch_size=1000
+                )
+                # bulk_create n'envoie pas de signaux
+                NoteService.invalider_releves(note.etudiant_id for note in notes_a_ecrire)
+            MoyenneARecalculer.marquer(cellules)
+        
+        return {
+            'notes_sauvees': len(notes_a_ecrire),
+            'notes_inchangees': notes_inchangees,
+            'erreurs': erreurs,
+            'notes_creees': list(notes_creees.values()),
+            'notes_modifiees': list(notes_modifiees.values())
+        }
+
+    
+    COLONNES_IMPORT = {
+        'matricule': 'matricule',
+        'note': 'note_obtenue',
+        'note_obtenue': 'note_obtenue',
+        'absent': 'absent',
+        'justifie': 'justifie',
+        'commentaire': 'commentaire',
+    }
+    VALEURS_VRAIES = {'1', 'oui', 'o', 'vrai', 'true', 'x', 'abs', 'absent'}
+    TAILLE_LOT_IMPORT = 500
+    
+    @staticmethod
+    def lire_fichier_notes(fichier):
+        """
+        Parcourt un fichier CSV ou XLSX ligne par ligne, sans le charger en
+        mémoire. Produit (numero_ligne, {colonne: valeur}) pour chaque ligne
+        non vide, avec les colonnes normalisées de COLONNES_IMPORT.
+        """
+        import csv
+        import io
+        
+        nom = (fichier.name or '').lower()
+        
+        if nom.endswith('.xlsx'):
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise ValueError("Import XLSX indisponible (openpyxl non installé)")
+            
+            classeur = load_workbook(fichier, read_only=True, data_only=True)
+            try:
+                lignes = classeur.active.iter_rows(values_only=True)
+                yield from NoteService._lignes_normalisees(lignes)
+            finally:
+                classeur.close()
+        
+        elif nom.endswith('.csv') or nom.endswith('.txt'):
+            texte = io.TextIOWrapper(fichier.file, encoding='utf-8-sig', newline='')
+            try:
+                entete = texte.readline()
+                separateur = ';' if entete.count(';') > entete.count(',') else ','
+                lignes = csv.reader(texte, delimiter=separateur)
+                yield from NoteService._lignes_normalisees(
+                    lignes, entete=next(csv.reader([entete], delimiter=separateur), [])
+                )
+            finally:
+                texte.detach()
+        
+        else:
+            raise ValueError("Format de fichier non supporté (CSV ou XLSX attendu)")
+    
+    @staticmethod
+    def _lignes_normalisees(lignes, entete=None):
+        if entete is None:
+            entete = next(lignes, None) or []
+        
+        colonnes = [
+            NoteService.COLONNES_IMPORT.get(str(nom or '').strip().lower().replace(' ', '_'))
+            for nom in entete
+        ]
+        if 'matricule' not in colonnes or 'note_obtenue' not in colonnes:
+            raise ValueError("Colonnes 'matricule' et 'note' requises")
+        
+        # Ligne 1 = en-tête
+        for numero, valeurs in enumerate(lignes, start=2):
+            ligne = {
+                colonne: valeur
+                for colonne, valeur in zip(colonnes, valeurs)
+                if colonne and valeur not in (None, '')
+            }
+            if ligne:
+                yield numero, ligne
+    
+    @staticmethod
+    def importer_notes(evaluation, fichier):
+        """
+        Importe les notes d'une évaluation depuis un fichier CSV/XLSX.
+        
+        Les lignes sont rattachées aux étudiants de la classe par matricule,
+        validées contre le barème puis écrites par lots via enregistrer_notes.
+        Les lignes invalides sont rapportées sans interrompre l'import.
+        """
+        from django.core.exceptions import ValidationError
+        from users.models import Inscription
+        from evaluations.models import Note
+        
+        enseignement = evaluation.enseignement
+        index_matricules = dict(
+            Inscription.objects.filter(
+                classe=enseignement.classe,
+                annee_academique=enseignement.annee_academique,
+                active=True
+            ).values_list('etudiant__user__matricule', 'etudiant_id')
+        )
+        champ_note = Note._meta.get_field('note_obtenue')
+        
+        erreurs = []
+        lot = []
+        resultat = {'lignes_lues': 0, 'notes_sauvees': 0, 'notes_inchangees': 0}
+        
+        def ecrire_lot():
+            enregistrement = NoteService.enregistrer_notes(evaluation, lot)
+            resultat['notes_sauvees'] += enregistrement['notes_sauvees']
+            resultat['notes_inchangees'] += enregistrement['notes_inchangees']
+            erreurs.extend(enregistrement['erreurs'])
+            lot.clear()
+        
+        with transaction.atomic():
+            for numero, ligne in NoteService.lire_fichier_notes(fichier):
+                resultat['lignes_lues'] += 1
+                matricule = str(ligne.get('matricule', '')).strip()
+                
+                etudiant_id = index_matricules.get(matricule)
+                if etudiant_id is None:
+                    erreurs.append({
+                        'ligne': numero,
+                        'matricule': matricule,
+                        'erreur': "Matricule inconnu dans la classe"
+                    })
+                    continue
+                
+                note_brute = str(ligne.get('note_obtenue', '')).strip().replace(',', '.')
+                absent = (
+                    str(ligne.get('absent', '')).strip().lower() in NoteService.VALEURS_VRAIES or
+                    note_brute.lower() in ('abs', 'absent')
+                )
+                
+                note_obtenue = None
+                if not absent:
+                    try:
+                        note_obtenue = champ_note.to_python(note_brute)
+                    except ValidationError:
+                        note_obtenue = None
+                    if note_obtenue is None or note_obtenue < 0 or note_obtenue > evaluation.note_sur:
+                        erreurs.append({
+                            'ligne': numero,
+                            'matricule': matricule,
+                            'erreur': f"Note invalide (0 à {evaluation.note_sur}): {ligne.get('note_obtenue', '')}"
+                        })
+                        continue
+                
+                lot.append({
+                    'ligne': numero,
+                    'matricule': matricule,
+                    'etudiant_id': etudiant_id,
+                    'note_obtenue': note_obtenue,
+                    'absent': absent,
+                    'justifie': str(ligne.get('justifie', '')).strip().lower() in NoteService.VALEURS_VRAIES,
+                    'commentaire': str(ligne.get('commentaire', '')).strip()
+                })
+                if len(lot) >= NoteService.TAILLE_LOT_IMPORT:
+                    ecrire_lot()
+            
+            if lot:
+                ecrire_lot()
+        
+        resultat['erreurs'] = erreurs
+        return resultat
+
+    # Espace de cache des relevés, versionné par étudiant
+    ESPACE_RELEVE = 'releve_notes'
+    DUREE_CACHE_RELEVE = 24 * 3600
+
+    @staticmethod
+    def construire_releves(etudiants, session, notes=None):
+        """
+        Relevés de notes assemblés de plusieurs étudiants pour une session :
+        notes par EC avec la moyenne de l'EC, moyennes UE et semestrielles.
+
+        Retourne {etudiant_id: relevé}, en quatre requêtes quel que soit le
+        nombre d'étudiants. `notes` restreint les notes affichées (par
+        exemple à celles d'un enseignant).
+        """
+        from evaluations.models import Note, MoyenneEC, MoyenneUE, MoyenneSemestre
+        from evaluations.serializers import NoteSerializer
+
+        etudiants = {etudiant.id: etudiant for etudiant in etudiants}
+        ids = list(etudiants)
+        releves = {
+            etudiant.id: {
+                'etudiant': {
+                    'id': etudiant.id,
+                    'matricule': etudiant.user.matricule,
+                    'nom_complet': etudiant.user.get_full_name()
+                },
+                'notes_par_ec': {},
+                'moyennes_ue': [],
+                'moyennes_semestre': []
+            }
+            for etudiant in etudiants.values()
+        }
+
+        moyennes_ec = {
+            (etudiant_id, ec_id): moyenne
+            for etudiant_id, ec_id, moyenne in MoyenneEC.objects.filter(
+                etudiant_id__in=ids, session=session
+            ).values_list('etudiant_id', 'ec_id', 'moyenne')
+        }
+
+        notes = Note.objects.all() if notes is None else notes
+        for note in notes.filter(
+            etudiant_id__in=ids,
+            evaluation__session=session
+        ).select_related(
+            'evaluation__enseignement__ec__ue', 'evaluation__type_evaluation'
+        ).order_by('evaluation__enseignement__ec__code', 'evaluation__date_evaluation', 'evaluation_id'):
+            # Évite une requête par note pour etudiant_nom / etudiant_matricule
+            note.etudiant = etudiants[note.etudiant_id]
+            ec = note.evaluation.enseignement.ec
+            blocs = releves[note.etudiant_id]['notes_par_ec']
+            if ec.id not in blocs:
+                blocs[ec.id] = {
+                    'ec': {'id': ec.id, 'code': ec.code, 'nom': ec.nom, 'ue': ec.ue.nom},
+                    'moyenne': moyennes_ec.get((note.etudiant_id, ec.id)),
+                    'notes': []
+                }
+            evaluation = note.evaluation
+            blocs[ec.id]['notes'].append({
+                **NoteSerializer(note).data,
+                'type_evaluation': evaluation.type_evaluation.nom,
+                'date_evaluation': evaluation.date_evaluation.isoformat(),
+                'note_sur': evaluation.note_sur
+            })
+
+        for moyenne in MoyenneUE.objects.filter(
+            etudiant_id__in=ids, session=session
+        ).select_related('ue__semestre', 'annee_academique').order_by('annee_academique__date_debut', 'ue__code'):
+            releves[moyenne.etudiant_id]['moyennes_ue'].append({
+                'ue': {
+                    'id': moyenne.ue.id,
+                    'code': moyenne.ue.code,
+                    'nom': moyenne.ue.nom,
+                    'credits': moyenne.ue.credits,
+                    'semestre': moyenne.ue.semestre.nom
+                },
+                'annee_academique': moyenne.annee_academique.libelle,
+                'moyenne': moyenne.moyenne,
+                'credits_obtenus': moyenne.credits_obtenus,
+                'validee': moyenne.validee
+            })
+
+        for moyenne in MoyenneSemestre.objects.filter(
+            etudiant_id__in=ids, session=session
+        ).select_related('semestre', 'classe', 'annee_academique').order_by(
+            'annee_academique__date_debut', 'semestre__numero'
+        ):
+            releves[moyenne.etudiant_id]['moyennes_semestre'].append({
+                'semestre': moyenne.semestre.nom,
+                'classe': moyenne.classe.nom,
+                'annee_academique': moyenne.annee_academique.libelle,
+                'moyenne_generale': moyenne.moyenne_generale,
+                'credits_obtenus': moyenne.credits_obtenus,
+                'credits_requis': moyenne.credits_requis,
+                'mention': AutomationService._get_mention(moyenne.moyenne_generale)
+            })
+
+        for releve in releves.values():
+            releve['notes_par_ec'] = list(releve['notes_par_ec'].values())
+        return releves
+
+    @staticmethod
+    def _variante_releve(session_id):
+        """
+        Session et versions des référentiels affichés par le relevé. Les
+        évaluations, EC et étudiants invalident eux-mêmes les relevés
+        concernés (evaluations/signals.py).
+        """
+        from academics.models import UE, Semestre
+        from core import cache
+
+        versions = cache.versions(*[
+            cache.espace_modele(modele) for modele in (UE, Semestre)
+        ])
+        return f"{session_id}:{'.'.join(map(str, versions))}"
+
+    @staticmethod
+    def releve_en_cache(etudiant_id, session_id):
+        """
+        Relevé complet d'un étudiant, servi depuis le cache tant qu'il est à
+        jour. Lève DoesNotExist si l'étudiant ou la session n'existe pas.
+        """
+        from academics.models import Session
+        from users.models import Etudiant
+        from core import cache
+
+        def construire():
+            etudiant = Etudiant.objects.select_related('user').get(pk=etudiant_id)
+            session = Session.objects.get(pk=session_id)
+            return NoteService.construire_releves([etudiant], session)[etudiant.id]
+
+        return cache.obtenir(
+            NoteService.ESPACE_RELEVE, (etudiant_id,), construire,
+            timeout=NoteService.DUREE_CACHE_RELEVE,
+            variante=NoteService._variante_releve(session_id)
+        )
+
+    @staticmethod
+    def prechauffer_releves(etudiants, session):
+        """Calcule et met en cache les relevés des étudiants ; retourne leur nombre"""
+        from django.core.cache import cache as cache_django
+        from core import cache
+
+        variante = NoteService._variante_releve(session.id)
+        releves = NoteService.construire_releves(etudiants, session)
+        cache_django.set_many({
+            cache.cle_valeur(NoteService.ESPACE_RELEVE, (etudiant_id,), variante): releve
+            for etudiant_id, releve in releves.items()
+        }, NoteService.DUREE_CACHE_RELEVE)
+        return len(releves)
+
+    @staticmethod
+    def invalider_releves(etudiants_ids):
+        """Invalide les relevés en cache des étudiants, après validation de la transaction"""
+        from core import cache
+
+        etudiants_ids = set(etudiants_ids)
+        if not etudiants_ids:
+            return
+
+        def invalider():
+            for etudiant_id in etudiants_ids:
+                cache.invalider(NoteService.ESPACE_RELEVE, etudiant_id)
+
+        transaction.on_commit(invalider)
+
+    @staticmethod
+    def releves_notes(classe, session, taille_lot=200):
+        """
+        Relevés de notes des étudiants d'une classe pour une session, tels que
+        construits par construire_releves (limités aux notes de la classe) et
+        complétés de la classe, de la session et de l'année.
+
+        Générateur : les relevés sont construits par lots d'étudiants pour que
+        la mémoire ne dépende pas de l'effectif.
+        """
+        from itertools import islice
+        from evaluations.models import Note
+        from users.models import Inscription
+
+        notes = Note.objects.filter(evaluation__enseignement__classe=classe)
+        contexte = {
+            'classe': classe.nom,
+            'session': session.nom,
+            'annee_academique': classe.annee_academique.libelle
+        }
+        iterateur = Inscription.objects.filter(
+            classe=classe,
+            active=True
+        ).select_related('etudiant__user').order_by(
+            'etudiant__user__last_name', 'etudiant__user__first_name', 'id'
+        ).iterator(chunk_size=taille_lot)
+
+        while True:
+            etudiants = [inscription.etudiant for inscription in islice(iterateur, taille_lot)]
+            if not etudiants:
+                break
+
+            releves = NoteService.construire_releves(etudiants, session, notes=notes)
+            for etudiant in etudiants:
+                yield {**releves[etudiant.id], **contexte}
 
 # Création des dossiers nécessaires
 import os
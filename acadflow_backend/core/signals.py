@@ -0,0 +1,21 @@
+# ========================================
+# FICHIER: core/signals.py
+# ========================================
+
+from academics.models import AnneeAcademique, ParametrageSysteme, Semestre, Session, TypeEvaluation, ConfigurationEvaluationEC, Classe, UE, EC
+from evaluations.models import Evaluation
+from users.models import User
+from core.cache import suivre_modeles
+from .models import Etablissement, Campus, Domaine, Cycle, TypeFormation, Filiere, Option, Niveau
+
+# Référentiels mis en cache (CacheReferentielMixin) et modèles qu'ils affichent
+suivre_modeles(
+    Etablissement, Campus, Domaine, Cycle, TypeFormation, Filiere, Option, Niveau,
+    Semestre, Session, TypeEvaluation, ConfigurationEvaluationEC
+)
+
+# Modèles affichés par les viewsets à GET conditionnel (GetConditionnelMixin)
+suivre_modeles(Classe, UE, EC, Evaluation, User)
+
+# Contexte académique en mémoire des processus (ContexteAcademique)
+suivre_modeles(AnneeAcademique, ParametrageSysteme)
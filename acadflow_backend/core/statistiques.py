@@ -0,0 +1,69 @@
+# ========================================
+# FICHIER: core/statistiques.py
+# ========================================
+
+"""
+Statistiques de distribution des notes et des moyennes.
+
+L'effectif, la moyenne, les extrêmes et la répartition par mention sont
+calculés par une seule requête d'agrégation conditionnelle.
+"""
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q
+
+from core import cache
+
+# Espace de cache des statistiques semestrielles, par (classe, session)
+STATISTIQUES_SEMESTRE = 'statistiques_semestre'
+
+# (clé, borne inférieure incluse, borne supérieure exclue)
+MENTIONS = [
+    ('tres_bien', 16, None),
+    ('bien', 14, 16),
+    ('assez_bien', 12, 14),
+    ('passable', 10, 12),
+    ('insuffisant', None, 10),
+]
+
+
+def statistiques_distribution(queryset, champ, mentions=MENTIONS, filtre=None, **agregats):
+    """
+    Retourne nombre, moyenne, min, max et le décompte par mention de `champ`.
+
+    `filtre` (Q) restreint les lignes prises en compte dans ces statistiques ;
+    les `agregats` supplémentaires sont calculés dans la même requête, sur
+    toutes les lignes du queryset.
+    """
+    def condition(*criteres):
+        criteres = [critere for critere in (filtre,) + criteres if critere is not None]
+        if not criteres:
+            return None
+        resultat = criteres[0]
+        for critere in criteres[1:]:
+            resultat &= critere
+        return resultat
+
+    expressions = {
+        'nombre': Count('id', filter=condition()),
+        'moyenne': Avg(champ, filter=condition()),
+        'min': Min(champ, filter=condition()),
+        'max': Max(champ, filter=condition()),
+    }
+    for cle, borne_inf, borne_sup in mentions:
+        expressions[f'mention_{cle}'] = Count('id', filter=condition(
+            Q(**{f'{champ}__gte': borne_inf}) if borne_inf is not None else None,
+            Q(**{f'{champ}__lt': borne_sup}) if borne_sup is not None else None
+        ))
+    expressions.update(agregats)
+
+    resultat = queryset.aggregate(**expressions)
+    resultat['mentions'] = {cle: resultat.pop(f'mention_{cle}') for cle, _, _ in mentions}
+    return resultat
+
+
+def invalider_statistiques_semestre(classe_id, session_id):
+    """Invalide les statistiques en cache d'une classe, après validation de la transaction"""
+    transaction.on_commit(
+        lambda: cache.invalider(STATISTIQUES_SEMESTRE, classe_id, session_id)
+    )
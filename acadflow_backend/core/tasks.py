@@ -33,11 +33,19 @@ def executer_taches_automatisees_periodique():
         }
 
 @shared_task
-def generer_recapitulatif_async(classe_id, semestre_id, session_id):
+def generer_recapitulatif_async(classe_id, semestre_id, session_id, tache_id=None):
     """Génération asynchrone d'un récapitulatif semestriel"""
     try:
         from academics.models import Classe, Semestre, Session
         
+        # Tâche d'un lot : son statut est suivi par la progression du lot
+        if tache_id:
+            return {
+                'classe_id': classe_id,
+                'tache_id': tache_id,
+                **AutomationService.executer_tache_recapitulatif(tache_id)
+            }
+        
         classe = Classe.objects.get(id=classe_id)
         semestre = Semestre.objects.get(id=semestre_id)
         session = Session.objects.get(id=session_id)
@@ -48,6 +56,72 @@ def generer_recapitulatif_async(classe_id, semestre_id, session_id):
         
     except Exception as e:
         logger.error(f"Erreur génération récapitulatif async: {str(e)}")
+        return {
+            'success': False,
+            'classe_id': classe_id,
+            'tache_id': tache_id,
+            'error': str(e)
+        }
+
+@shared_task
+def finaliser_lot_recapitulatifs(resultats, lot_id):
+    """Agrège les résultats d'un lot de récapitulatifs une fois toutes les classes traitées"""
+    try:
+        # Tâches en échec restées non marquées : comptées comme traitées
+        echecs = {
+            resultat['tache_id']: resultat.get('error', 'Erreur inconnue')
+            for resultat in resultats or []
+            if isinstance(resultat, dict) and resultat.get('tache_id') and not resultat.get('success')
+        }
+        return AutomationService.finaliser_lot(lot_id, echecs)
+        
+    except Exception as e:
+        logger.error(f"Erreur finalisation du lot {lot_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def propager_moyennes_a_recalculer_periodique():
+    """Recalcule les moyennes restées marquées (échec ou arrêt du processus)"""
+    try:
+        from core.matrice_notes import propager_moyennes_a_recalculer
+        
+        return {
+            'success': True,
+            'resultats': propager_moyennes_a_recalculer(limite=5000)
+        }
+        
+    except Exception as e:
+        logger.error(f"Erreur propagation périodique des moyennes: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@shared_task
+def purger_objets_supprimes():
+    """Purge périodique des traces de suppression expirées"""
+    from core.models import ObjetSupprime
+    
+    return {'success': True, 'supprimes': ObjetSupprime.purger()}
+
+@shared_task(bind=True)
+def calculer_moyennes_async(self, tache_id):
+    """Recalcul différé et regroupé des moyennes après saisie de notes"""
+    try:
+        resultat = AutomationService.executer_tache_calcul_moyennes(tache_id)
+        
+        # Échéance repoussée par une saisie plus récente : attendre encore
+        # (en mode eager, le délai serait ignoré : executer_taches_planifiees prendra le relais)
+        if 'reporter_de' in resultat and not self.request.is_eager:
+            self.apply_async(args=[tache_id], countdown=resultat['reporter_de'])
+        
+        return resultat
+        
+    except Exception as e:
+        logger.error(f"Erreur recalcul des moyennes async: {str(e)}")
         return {
             'success': False,
             'error': str(e)
@@ -1,3 +1,1080 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from academics.models import (
+    AnneeAcademique, Session, Semestre, Classe, UE, EC, TypeEvaluation, ConfigurationEvaluationEC
+)
+from core.models import TypeEtablissement, Etablissement, Domaine, Cycle, TypeFormation, Filiere, Niveau
+from core.contexte import ContexteAcademique
+from core.services import AutomationService, NoteService
+from evaluations.models import (
+    Enseignement, Evaluation, Note, MoyenneARecalculer, MoyenneEC, MoyenneUE, MoyenneSemestre
+)
+from users.models import User, Enseignant, Etudiant, StatutEtudiant, Inscription
+
+
+def creer_structure(cls):
+    """Établissement, filière, niveau, année active, session, semestre et statut"""
+    type_etablissement = TypeEtablissement.objects.create(nom='Université', code='UNIV')
+    etablissement = Etablissement.objects.create(
+        nom='Test', nom_complet='Établissement de test', acronyme='ET',
+        type_etablissement=type_etablissement, adresse='Adresse', ville='Yaoundé',
+        telephone='000', email='test@acadflow.com', numero_autorisation='001',
+        date_creation='2000-01-01', date_autorisation='2000-01-01', ministre_tutelle='MINESUP'
+    )
+    domaine = Domaine.objects.create(nom='Sciences', code='SC', etablissement=etablissement)
+    cycle = Cycle.objects.create(nom='Licence', code='L', etablissement=etablissement, duree_annees=3)
+    type_formation = TypeFormation.objects.create(nom='Licence', code='LIC', cycle=cycle)
+    cls.filiere = Filiere.objects.create(nom='Informatique', code='INF', domaine=domaine, type_formation=type_formation)
+    cls.niveau = Niveau.objects.create(nom='L1', numero=1, cycle=cycle)
+    cls.annee = AnneeAcademique.objects.create(
+        libelle='2024-2025', date_debut='2024-09-01', date_fin='2025-07-31', active=True
+    )
+    cls.session = Session.objects.create(nom='Session normale', code='SN', ordre=1)
+    cls.semestre = Semestre.objects.create(nom='Semestre 1', numero=1)
+    cls.statut = StatutEtudiant.objects.create(nom='Inscrit', code='INS')
+
+
+class GenerationDonneesRecapTest(TestCase):
+    """Le récapitulatif doit être construit en un nombre fixe de requêtes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+        cls.ues = [
+            UE.objects.create(
+                nom=f'UE {i}', code=f'UE{i}', credits=4,
+                niveau=cls.niveau, semestre=cls.semestre
+            )
+            for i in range(4)
+        ]
+
+    def creer_classe(self, code, effectif):
+        classe = Classe.objects.create(
+            nom=f'Classe {code}', code=code, filiere=self.filiere,
+            niveau=self.niveau, annee_academique=self.annee
+        )
+        for i in range(effectif):
+            user = User.objects.create(
+                username=f'{code}-{i}', matricule=f'{code}{i:04d}', type_utilisateur='etudiant'
+            )
+            etudiant = Etudiant.objects.create(user=user, numero_carte=f'{code}-{i}')
+            Inscription.objects.create(
+                etudiant=etudiant, classe=classe, annee_academique=self.annee, statut=self.statut
+            )
+            for ue in self.ues:
+                MoyenneUE.objects.create(
+                    etudiant=etudiant, ue=ue, session=self.session,
+                    annee_academique=self.annee, moyenne=Decimal('12.00')
+                )
+            MoyenneSemestre.objects.create(
+                etudiant=etudiant, classe=classe, semestre=self.semestre, session=self.session,
+                annee_academique=self.annee, moyenne_generale=Decimal('12.00'),
+                credits_obtenus=16, credits_requis=16
+            )
+        return Classe.objects.select_related('niveau', 'filiere', 'annee_academique').get(pk=classe.pk)
+
+    def generer(self, classe):
+        inscriptions = Inscription.objects.filter(
+            classe=classe, active=True
+        ).select_related('etudiant__user')
+        return AutomationService._generer_donnees_recap(
+            classe, self.semestre, self.session, inscriptions
+        )
+
+    def test_nombre_requetes_independant_de_l_effectif(self):
+        petite_classe = self.creer_classe('PC', 2)
+        grande_classe = self.creer_classe('GC', 25)
+
+        # Inscriptions, UEs, moyennes UE, moyennes semestrielles
+        with self.assertNumQueries(4):
+            self.generer(petite_classe)
+        with self.assertNumQueries(4):
+            donnees = self.generer(grande_classe)
+
+        self.assertEqual(donnees['classe']['effectif'], 25)
+        etudiant = donnees['etudiants'][0]
+        self.assertEqual(len(etudiant['moyennes_ue']), 4)
+        self.assertEqual(etudiant['credits_obtenus'], 16)
+        self.assertEqual(etudiant['moyenne_semestre'], 12.0)
+        self.assertEqual(etudiant['decision'], 'Admis(e)')
+
+
+class NotesClassesTest(TestCase):
+    """Deux classes ayant chacune un EC, une évaluation et un étudiant noté"""
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+        ue = UE.objects.create(nom='UE', code='UE', credits=4, niveau=cls.niveau, semestre=cls.semestre)
+        type_evaluation = TypeEvaluation.objects.create(nom='Examen', code='EX')
+        enseignant = Enseignant.objects.create(
+            user=User.objects.create(username='ens', matricule='ENS', type_utilisateur='enseignant'),
+            grade='assistant', specialite='Informatique', statut='permanent'
+        )
+        cls.notes = {}
+        for code in ('A', 'B'):
+            classe = Classe.objects.create(
+                nom=f'Classe {code}', code=code, filiere=cls.filiere,
+                niveau=cls.niveau, annee_academique=cls.annee
+            )
+            etudiant = Etudiant.objects.create(
+                user=User.objects.create(username=code, matricule=f'MAT{code}', type_utilisateur='etudiant'),
+                numero_carte=code
+            )
+            Inscription.objects.create(
+                etudiant=etudiant, classe=classe, annee_academique=cls.annee, statut=cls.statut
+            )
+            enseignement = Enseignement.objects.create(
+                enseignant=enseignant, classe=classe, annee_academique=cls.annee,
+                ec=EC.objects.create(nom=f'EC {code}', code=f'EC{code}', ue=ue, poids_ec=Decimal('100.00'))
+            )
+            evaluation = Evaluation.objects.create(
+                nom=f'Examen {code}', enseignement=enseignement, type_evaluation=type_evaluation,
+                session=cls.session, date_evaluation=date(2025, 1, 15)
+            )
+            cls.notes[code] = Note.objects.create(
+                etudiant=etudiant, evaluation=evaluation, note_obtenue=Decimal('12.00')
+            )
+
+    def setUp(self):
+        cache.clear()
+
+
+class CacheReleveTest(NotesClassesTest):
+    """Une écriture n'invalide que les relevés des étudiants concernés"""
+
+    def releve(self, code):
+        return NoteService.releve_en_cache(self.notes[code].etudiant_id, self.session.id)
+
+    def test_ecriture_dans_une_classe_conserve_les_releves_de_l_autre(self):
+        self.releve('A')
+        self.releve('B')
+
+        note = self.notes['A']
+        evaluation = note.evaluation
+        with self.captureOnCommitCallbacks(execute=True):
+            note.note_obtenue = Decimal('15.00')
+            note.save()
+            evaluation.nom = 'Examen final A'
+            evaluation.save()
+            ec = evaluation.enseignement.ec
+            ec.nom = 'EC renommé'
+            ec.save()
+            user = note.etudiant.user
+            user.first_name = 'Awa'
+            user.save()
+
+        with self.assertNumQueries(0):
+            self.releve('B')
+
+        releve = self.releve('A')
+        bloc = releve['notes_par_ec'][0]
+        self.assertEqual(bloc['ec']['nom'], 'EC renommé')
+        self.assertEqual(bloc['notes'][0]['evaluation_nom'], 'Examen final A')
+        self.assertEqual(releve['etudiant']['nom_complet'], 'Awa')
+
+
+class ExportRelevesTest(NotesClassesTest):
+    """L'export PDF et le relevé d'un étudiant sortent du même constructeur"""
+
+    def test_releves_de_classe_identiques_au_releve_etudiant(self):
+        from core.rendu_pdf import rendre_releve_pdf
+
+        note = self.notes['A']
+        classe = note.evaluation.enseignement.classe
+        ue = note.evaluation.enseignement.ec.ue
+        MoyenneUE.objects.create(
+            etudiant=note.etudiant, ue=ue, session=self.session,
+            annee_academique=self.annee, moyenne=Decimal('12.00')
+        )
+        MoyenneSemestre.objects.create(
+            etudiant=note.etudiant, classe=classe, semestre=self.semestre, session=self.session,
+            annee_academique=self.annee, moyenne_generale=Decimal('12.00'),
+            credits_obtenus=4, credits_requis=4
+        )
+
+        releves = list(NoteService.releves_notes(classe, self.session))
+
+        self.assertEqual(len(releves), 1)
+        releve = releves[0]
+        attendu = NoteService.releve_en_cache(note.etudiant_id, self.session.id)
+        self.assertEqual({cle: releve[cle] for cle in attendu}, attendu)
+        self.assertEqual(
+            (releve['classe'], releve['session'], releve['annee_academique']),
+            ('Classe A', 'Session normale', '2024-2025')
+        )
+        self.assertEqual(len(releve['moyennes_ue']), 1)
+        self.assertEqual(len(releve['moyennes_semestre']), 1)
+        self.assertTrue(rendre_releve_pdf(releve).startswith(b'%PDF'))
+
+
+class SuppressionNotesTest(NotesClassesTest):
+    """Toute suppression de notes, même en cascade, marque la moyenne EC à recalculer"""
+
+    def cellule(self, code):
+        return self.notes[code].cellule_moyenne()
+
+    def cellules_marquees(self):
+        return set(MoyenneARecalculer.objects.values_list(
+            'etudiant_id', 'ec_id', 'session_id', 'annee_academique_id'
+        ))
+
+    def test_suppression_d_une_evaluation(self):
+        MoyenneARecalculer.objects.all().delete()
+        cellule = self.cellule('A')
+
+        Evaluation.objects.get(pk=self.notes['A'].evaluation_id).delete()
+
+        self.assertEqual(self.cellules_marquees(), {cellule})
+
+    def test_suppression_par_queryset(self):
+        MoyenneARecalculer.objects.all().delete()
+        cellules = {self.cellule('A'), self.cellule('B')}
+
+        Note.objects.all().delete()
+
+        self.assertEqual(self.cellules_marquees(), cellules)
+
+    def test_suppression_d_un_etudiant(self):
+        # La moyenne disparaît avec l'étudiant : rien à recalculer
+        MoyenneARecalculer.objects.all().delete()
+
+        self.notes['A'].etudiant.delete()
+
+        self.assertEqual(self.cellules_marquees(), set())
+
+
+class ContexteAcademiqueTest(TestCase):
+    """Le contexte en mémoire suit le changement d'année active"""
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+
+    def setUp(self):
+        cache.clear()
+        ContexteAcademique.vider()
+
+    def activer_nouvelle_annee(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AnneeAcademique.objects.create(
+                libelle='2025-2026', date_debut='2025-09-01', date_fin='2026-07-31', active=True
+            )
+
+    def test_sans_cache_partage(self):
+        self.assertEqual(ContexteAcademique.annee_active().pk, self.annee.pk)
+
+        # Cache local au processus : aucune copie en mémoire, relue en base
+        nouvelle = self.activer_nouvelle_annee()
+
+        self.assertEqual(ContexteAcademique.annee_active().pk, nouvelle.pk)
+        self.assertEqual(ContexteAcademique._valeurs, {})
+
+    def test_avec_cache_partage(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as dossier, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': dossier
+        }}):
+            self.assertEqual(ContexteAcademique.annee_active().pk, self.annee.pk)
+            with self.assertNumQueries(0):
+                ContexteAcademique.annee_active()
+
+            nouvelle = self.activer_nouvelle_annee()
+
+            self.assertEqual(ContexteAcademique.annee_active().pk, nouvelle.pk)
+
+
+class MoyennesECTest(TestCase):
+    """
+    Un EC dont les pourcentages ne totalisent pas 100 (30 + 40), des
+    évaluations notées sur 10, 20 et 40, et des moyennes tombant exactement
+    au milieu de deux centièmes.
+    """
+
+    # Notes par étudiant : (CC sur 10, CC sur 20, examen sur 40) ; None : pas
+    # de note, 'ABS' : absent
+    NOTES = {
+        'courant': ('6.50', '12.00', '23.00'),
+        'egalite_paire': ('6.25', '11.75', None),      # CC 12,125 → 12,12
+        'egalite_impaire': ('6.25', '12.25', None),    # CC 12,375 → 12,38
+        'absent_examen': ('7.00', '9.50', 'ABS'),
+        'decimales': ('7.33', '13.67', '29.99'),
+        'sans_note': (None, None, None),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+        cls.classe = Classe.objects.create(
+            nom='Classe', code='CL', filiere=cls.filiere, niveau=cls.niveau, annee_academique=cls.annee
+        )
+        ue = UE.objects.create(nom='UE', code='UE', credits=6, niveau=cls.niveau, semestre=cls.semestre)
+        cls.ec = EC.objects.create(nom='EC', code='EC', ue=ue, poids_ec=Decimal('100.00'))
+        controle = TypeEvaluation.objects.create(nom='Contrôle continu', code='CC')
+        examen = TypeEvaluation.objects.create(nom='Examen', code='EX')
+        ConfigurationEvaluationEC.objects.create(ec=cls.ec, type_evaluation=controle, pourcentage=Decimal('30.00'))
+        ConfigurationEvaluationEC.objects.create(ec=cls.ec, type_evaluation=examen, pourcentage=Decimal('40.00'))
+
+        enseignement = Enseignement.objects.create(
+            enseignant=Enseignant.objects.create(
+                user=User.objects.create(username='ens', matricule='ENS', type_utilisateur='enseignant'),
+                grade='assistant', specialite='Informatique', statut='permanent'
+            ),
+            classe=cls.classe, ec=cls.ec, annee_academique=cls.annee
+        )
+        evaluations = [
+            Evaluation.objects.create(
+                nom=nom, enseignement=enseignement, type_evaluation=type_evaluation,
+                session=cls.session, date_evaluation=date(2025, 1, 15), note_sur=Decimal(note_sur)
+            )
+            for nom, type_evaluation, note_sur in (
+                ('CC1', controle, '10'), ('CC2', controle, '20'), ('Examen', examen, '40')
+            )
+        ]
+
+        cls.etudiants = {}
+        for code, notes in cls.NOTES.items():
+            etudiant = Etudiant.objects.create(
+                user=User.objects.create(username=code, matricule=code.upper(), type_utilisateur='etudiant'),
+                numero_carte=code
+            )
+            Inscription.objects.create(
+                etudiant=etudiant, classe=cls.classe, annee_academique=cls.annee, statut=cls.statut
+            )
+            cls.etudiants[code] = etudiant
+            for evaluation, note in zip(evaluations, notes):
+                if note is not None:
+                    Note.objects.create(
+                        etudiant=etudiant, evaluation=evaluation, absent=note == 'ABS',
+                        note_obtenue=Decimal('0') if note == 'ABS' else Decimal(note)
+                    )
+
+    def moyennes_enregistrees(self):
+        return dict(MoyenneEC.objects.filter(ec=self.ec).values_list('etudiant__user__username', 'moyenne'))
+
+    def moyennes_par_etudiant(self):
+        """Référence : calcul étudiant par étudiant"""
+        from core.utils import calculer_moyenne_ec
+
+        for etudiant in self.etudiants.values():
+            calculer_moyenne_ec(etudiant, self.ec, self.session, self.annee)
+        moyennes = self.moyennes_enregistrees()
+        MoyenneEC.objects.all().delete()
+        return moyennes
+
+    def test_reference(self):
+        self.assertEqual(self.moyennes_par_etudiant(), {
+            'courant': Decimal('11.93'),
+            'egalite_paire': Decimal('12.12'),
+            'egalite_impaire': Decimal('12.38'),
+            'absent_examen': Decimal('11.75'),
+            'decimales': Decimal('14.64'),
+        })
+
+    @skipUnless(connection.vendor == 'postgresql', 'upsert SQL propre à PostgreSQL')
+    def test_calcul_en_base_identique(self):
+        from core.utils import calculer_moyennes_ec_en_base
+
+        reference = self.moyennes_par_etudiant()
+
+        resultats = calculer_moyennes_ec_en_base(self.classe, self.session)
+
+        self.assertEqual(self.moyennes_enregistrees(), reference)
+        self.assertEqual(
+            {etudiant_id: moyennes[self.ec.id] for etudiant_id, moyennes in resultats.items()},
+            {self.etudiants[code].id: moyenne for code, moyenne in reference.items()}
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'upsert SQL propre à PostgreSQL')
+    def test_calcul_en_base_restreint_aux_etudiants(self):
+        from core.utils import calculer_moyennes_ec_en_base
+
+        reference = self.moyennes_par_etudiant()
+
+        calculer_moyennes_ec_en_base(self.classe, self.session, etudiants=[self.etudiants['decimales']])
+
+        self.assertEqual(self.moyennes_enregistrees(), {'decimales': reference['decimales']})
+
+    def test_calcul_en_lot_identique(self):
+        from core.utils import calculer_moyennes_ec_classe
+
+        reference = self.moyennes_par_etudiant()
+
+        calculees = calculer_moyennes_ec_classe(self.classe, self.session)
+
+        self.assertEqual(self.moyennes_enregistrees(), reference)
+        self.assertEqual(len(calculees), len(reference))
+
+    def test_calcul_en_lot_propage_les_erreurs(self):
+        from unittest import mock
+        from django.db import DatabaseError
+        from core.utils import calculer_moyennes_ec_classe
+
+        with mock.patch.object(MoyenneEC.objects, 'bulk_create', side_effect=DatabaseError('indisponible')), \
+                self.assertLogs('acadflow', 'ERROR'), self.assertRaises(DatabaseError):
+            calculer_moyennes_ec_classe(self.classe, self.session)
+
+
+class MatriceNotesTest(TestCase):
+    """
+    Le moteur matriciel (centièmes entiers) reproduit exactement
+    calculer_moyenne_ue et calculer_moyenne_semestre.
+    """
+
+    # UE : (crédits, [(EC, poids)])
+    UES = {
+        'UE1': (6, [('A', '50.00'), ('B', '50.00')]),
+        'UE2': (0, [('C', '100.00')]),
+        'UE3': (4, [('D', '30.00'), ('E', '70.00')]),
+        'UE4': (3, [('F', '0.00')]),
+    }
+    # Moyennes EC par étudiant ; EC absent : pas de moyenne
+    MOYENNES = {
+        'egalite_paire': {'A': '12.25', 'B': '12.00', 'C': '8.00', 'D': '10.00', 'E': '10.00'},
+        'egalite_impaire': {'A': '12.25', 'B': '12.50', 'C': '11.00', 'D': '9.00', 'E': '11.00'},
+        'validation_arrondie': {'A': '9.99', 'B': '10.00', 'D': '10.00', 'E': '10.00', 'F': '15.00'},
+        'ec_manquant': {'A': '14.00', 'D': '7.50'},
+        'semestre_egalite': {'A': '12.12', 'B': '12.12', 'D': '9.95', 'E': '9.95'},
+        'poids_nul_seul': {'F': '18.00'},
+        'sans_moyenne': {},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        import random
+
+        creer_structure(cls)
+        cls.classe = Classe.objects.create(
+            nom='Classe', code='CL', filiere=cls.filiere, niveau=cls.niveau, annee_academique=cls.annee
+        )
+        ecs = {}
+        for code_ue, (credits, ecs_ue) in cls.UES.items():
+            ue = UE.objects.create(nom=code_ue, code=code_ue, credits=credits, niveau=cls.niveau, semestre=cls.semestre)
+            for code_ec, poids in ecs_ue:
+                ecs[code_ec] = EC.objects.create(nom=code_ec, code=code_ec, ue=ue, poids_ec=Decimal(poids))
+
+        # Moyennes tirées au hasard en plus des cas choisis
+        hasard = random.Random(2)
+        moyennes = dict(cls.MOYENNES)
+        for numero in range(20):
+            moyennes[f'hasard{numero}'] = {
+                code: f'{hasard.randint(0, 2000) / 100:.2f}'
+                for code in ecs if hasard.random() < 0.8
+            }
+
+        cls.etudiants = {}
+        for code, moyennes_ec in moyennes.items():
+            etudiant = Etudiant.objects.create(
+                user=User.objects.create(username=code, matricule=code.upper(), type_utilisateur='etudiant'),
+                numero_carte=code
+            )
+            Inscription.objects.create(
+                etudiant=etudiant, classe=cls.classe, annee_academique=cls.annee, statut=cls.statut
+            )
+            cls.etudiants[code] = etudiant
+            for code_ec, moyenne in moyennes_ec.items():
+                MoyenneEC.objects.create(
+                    etudiant=etudiant, ec=ecs[code_ec], session=cls.session,
+                    annee_academique=cls.annee, moyenne=Decimal(moyenne)
+                )
+
+    def resultats(self):
+        moyennes_ue = set(MoyenneUE.objects.values_list(
+            'etudiant__user__username', 'ue__code', 'moyenne', 'credits_obtenus', 'validee'
+        ))
+        moyennes_semestre = set(MoyenneSemestre.objects.values_list(
+            'etudiant__user__username', 'moyenne_generale', 'credits_obtenus', 'credits_requis'
+        ))
+        MoyenneUE.objects.all().delete()
+        MoyenneSemestre.objects.all().delete()
+        return moyennes_ue, moyennes_semestre
+
+    def test_resultats_identiques_au_calcul_decimal(self):
+        from core.matrice_notes import recalculer_classe
+        from core.utils import calculer_moyenne_semestre
+
+        # Les EC sans moyenne sont signalés (aucune configuration d'évaluation)
+        with self.assertLogs('acadflow', 'WARNING'):
+            for etudiant in self.etudiants.values():
+                calculer_moyenne_semestre(etudiant, self.classe, self.semestre, self.session, self.annee)
+        moyennes_ue, moyennes_semestre = self.resultats()
+
+        with self.assertLogs('acadflow', 'WARNING'):
+            recalculer_classe(self.classe, self.session, semestres=[self.semestre])
+
+        self.assertEqual(self.resultats(), (moyennes_ue, moyennes_semestre))
+
+        # Cas choisis : arrondis au pair, crédits nuls, EC manquants
+        ue = {(etudiant, code): (moyenne, credits) for etudiant, code, moyenne, credits, _ in moyennes_ue}
+        semestre = {etudiant: moyenne for etudiant, moyenne, _, _ in moyennes_semestre}
+        self.assertEqual(ue['egalite_paire', 'UE1'], (Decimal('12.12'), 6))
+        self.assertEqual(ue['egalite_impaire', 'UE1'], (Decimal('12.38'), 6))
+        self.assertEqual(ue['egalite_impaire', 'UE2'], (Decimal('11.00'), 0))
+        self.assertEqual(ue['validation_arrondie', 'UE1'], (Decimal('10.00'), 6))
+        self.assertEqual(ue['ec_manquant', 'UE3'], (Decimal('7.50'), 0))
+        self.assertNotIn(('validation_arrondie', 'UE4'), ue)
+        self.assertEqual(semestre['semestre_egalite'], Decimal('11.04'))
+        self.assertNotIn('poids_nul_seul', semestre)
+        self.assertNotIn('sans_moyenne', semestre)
+
+
+class FeuilleNotesTest(TestCase):
+    """Une évaluation sur 20 et trois étudiants notés 10, 11 et 12"""
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+        cls.classe = Classe.objects.create(
+            nom='Classe', code='CL', filiere=cls.filiere, niveau=cls.niveau, annee_academique=cls.annee
+        )
+        ue = UE.objects.create(nom='UE', code='UE', credits=6, niveau=cls.niveau, semestre=cls.semestre)
+        ec = EC.objects.create(nom='EC', code='EC', ue=ue, poids_ec=Decimal('100.00'))
+        # Seuls les enseignants saisissent des notes, et seulement les leurs
+        cls.enseignant = User.objects.create(username='ens', matricule='ENS', type_utilisateur='enseignant')
+        enseignement = Enseignement.objects.create(
+            enseignant=Enseignant.objects.create(
+                user=cls.enseignant, grade='assistant', specialite='Informatique', statut='permanent'
+            ),
+            classe=cls.classe, ec=ec, annee_academique=cls.annee
+        )
+        cls.evaluation = Evaluation.objects.create(
+            nom='Examen', enseignement=enseignement,
+            type_evaluation=TypeEvaluation.objects.create(nom='Examen', code='EX'),
+            session=cls.session, date_evaluation=date(2025, 1, 15)
+        )
+        cls.etudiants = []
+        for numero in range(3):
+            etudiant = Etudiant.objects.create(
+                user=User.objects.create(
+                    username=f'etu{numero}', matricule=f'MAT{numero}', type_utilisateur='etudiant'
+                ),
+                numero_carte=f'C{numero}'
+            )
+            Inscription.objects.create(
+                etudiant=etudiant, classe=cls.classe, annee_academique=cls.annee, statut=cls.statut
+            )
+            Note.objects.create(etudiant=etudiant, evaluation=cls.evaluation, note_obtenue=Decimal(10 + numero))
+            cls.etudiants.append(etudiant)
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.enseignant)
+
+    def url(self, action):
+        return f'/api/evaluations/evaluations/{self.evaluation.pk}/{action}/'
+
+    def note(self, numero):
+        return Note.objects.get(evaluation=self.evaluation, etudiant=self.etudiants[numero])
+
+
+class ModifierNotesTest(FeuilleNotesTest):
+    """Saisie différentielle : contrôle de version et lignes modifiées seules"""
+
+    def modifier(self, notes, version=None):
+        return self.client.patch(self.url('modifier_notes'), {
+            'version': version or NoteService.version_feuille(self.evaluation),
+            'notes': notes
+        }, format='json')
+
+    def test_version_perimee(self):
+        version = NoteService.version_feuille(self.evaluation)
+        self.modifier([{'etudiant_id': self.etudiants[0].id, 'note_obtenue': '15'}], version)
+
+        reponse = self.modifier([{'etudiant_id': self.etudiants[1].id, 'note_obtenue': '16'}], version)
+
+        self.assertEqual(reponse.status_code, 409)
+        self.assertEqual(reponse.data['version'], NoteService.version_feuille(self.evaluation))
+        self.assertEqual(self.note(1).note_obtenue, Decimal('11.00'))
+
+    def test_seules_les_lignes_modifiees_sont_renvoyees(self):
+        reponse = self.modifier([
+            {'etudiant_id': self.etudiants[0].id, 'note_obtenue': '15'},
+            {'etudiant_id': self.etudiants[1].id, 'note_obtenue': '11'},
+        ])
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual([ligne['matricule'] for ligne in reponse.data['etudiants']], ['MAT0'])
+        self.assertEqual(reponse.data['etudiants'][0]['note_obtenue'], Decimal('15.00'))
+        self.assertEqual(reponse.data['version'], NoteService.version_feuille(self.evaluation))
+
+    def test_requetes_independantes_du_nombre_de_lignes(self):
+        from django.db import connection as connexion
+        from django.test.utils import CaptureQueriesContext
+
+        def requetes(notes):
+            with CaptureQueriesContext(connexion) as contexte:
+                self.assertEqual(self.modifier(notes).status_code, 200)
+            return len(contexte)
+
+        # Première saisie : crée la tâche de recalcul, réutilisée ensuite
+        requetes([{'etudiant_id': self.etudiants[0].id, 'note_obtenue': '15'}])
+        une = requetes([{'etudiant_id': self.etudiants[0].id, 'note_obtenue': '14'}])
+        trois = requetes([
+            {'etudiant_id': etudiant.id, 'note_obtenue': '13'} for etudiant in self.etudiants
+        ])
+
+        self.assertEqual(une, trois)
+
+
+class SaisieNotesTest(FeuilleNotesTest):
+    """Le recalcul des moyennes n'est planifié que si des notes ont été écrites"""
+
+    def saisir(self, notes):
+        return self.client.post(self.url('saisir_notes'), {'notes': notes}, format='json')
+
+    def taches(self):
+        from evaluations.models import TacheAutomatisee
+
+        return TacheAutomatisee.objects.filter(type_tache='calcul_moyennes').count()
+
+    def test_saisie_sans_changement(self):
+        reponse = self.saisir([{'etudiant_id': self.etudiants[0].id, 'note_obtenue': '10'}])
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual((reponse.data['notes_sauvees'], reponse.data['notes_inchangees']), (0, 1))
+        self.assertIsNone(reponse.data['tache_calcul_moyennes'])
+        self.assertEqual(self.taches(), 0)
+
+    def test_saisie_planifie_le_recalcul(self):
+        reponse = self.saisir([{'etudiant_id': self.etudiants[0].id, 'note_obtenue': '14'}])
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIsNotNone(reponse.data['tache_calcul_moyennes'])
+        self.assertEqual(self.taches(), 1)
+
+    def test_echec_de_planification(self):
+        from unittest import mock
+        from django.db import DatabaseError
+
+        with mock.patch.object(
+            AutomationService, 'planifier_calcul_moyennes', side_effect=DatabaseError('indisponible')
+        ):
+            reponse = self.saisir([{'etudiant_id': self.etudiants[0].id, 'note_obtenue': '14'}])
+
+        # Erreur rapportée, saisie annulée avec la planification
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(self.note(0).note_obtenue, Decimal('10.00'))
+
+
+class EnregistrementNotesTest(FeuilleNotesTest):
+    """Créations, modifications tracées et lignes inchangées comptées à part"""
+
+    def enregistrer(self, notes):
+        return NoteService.enregistrer_notes(self.evaluation, notes)
+
+    def test_creation(self):
+        etudiant = Etudiant.objects.create(
+            user=User.objects.create(username='etu3', matricule='MAT3', type_utilisateur='etudiant'),
+            numero_carte='C3'
+        )
+
+        resultat = self.enregistrer([{'etudiant_id': etudiant.id, 'note_obtenue': '15.5'}])
+
+        self.assertEqual((resultat['notes_sauvees'], resultat['notes_inchangees']), (1, 0))
+        self.assertEqual(len(resultat['notes_creees']), 1)
+        note = Note.objects.get(evaluation=self.evaluation, etudiant=etudiant)
+        self.assertEqual(note.note_obtenue, Decimal('15.50'))
+        self.assertFalse(note.modifiee)
+        self.assertIsNone(note.note_precedente)
+
+    def test_modification(self):
+        resultat = self.enregistrer([
+            {'etudiant_id': self.etudiants[0].id, 'note_obtenue': '14'},
+            {'etudiant_id': self.etudiants[1].id, 'note_obtenue': '11'}
+        ])
+
+        self.assertEqual((resultat['notes_sauvees'], resultat['notes_inchangees']), (1, 1))
+        self.assertEqual(len(resultat['notes_modifiees']), 1)
+        note = self.note(0)
+        self.assertEqual(note.note_obtenue, Decimal('14.00'))
+        self.assertTrue(note.modifiee)
+        self.assertEqual(note.note_precedente, Decimal('10.00'))
+        self.assertIsNotNone(note.date_modification)
+        self.assertFalse(self.note(1).modifiee)
+
+    def test_aucun_changement(self):
+        # Étudiants et notes existantes, puis un savepoint vide : aucune écriture
+        with self.assertNumQueries(4):
+            resultat = self.enregistrer([
+                {'etudiant_id': etudiant.id, 'note_obtenue': str(10 + numero)}
+                for numero, etudiant in enumerate(self.etudiants)
+            ])
+
+        self.assertEqual((resultat['notes_sauvees'], resultat['notes_inchangees']), (0, 3))
+        self.assertEqual(resultat['notes_creees'] + resultat['notes_modifiees'], [])
+        note = self.note(0)
+        self.assertFalse(note.modifiee)
+        self.assertIsNone(note.date_modification)
+
+
+class ImportNotesTest(FeuilleNotesTest):
+    """Import CSV/XLSX : séparateur, ABS et erreurs numérotées par ligne"""
+
+    def importer(self, nom, contenu):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return self.client.post(
+            self.url('importer_notes'), {'fichier': SimpleUploadedFile(nom, contenu)}, format='multipart'
+        )
+
+    def xlsx(self, lignes):
+        import io
+        from openpyxl import Workbook
+
+        classeur = Workbook()
+        for ligne in lignes:
+            classeur.active.append(ligne)
+        tampon = io.BytesIO()
+        classeur.save(tampon)
+        return tampon.getvalue()
+
+    def erreurs(self, reponse):
+        return [(erreur['ligne'], erreur['matricule']) for erreur in reponse.data['erreurs']]
+
+    def test_csv_point_virgule(self):
+        reponse = self.importer('notes.csv', 'Matricule;Note\nMAT0;14,5\nMAT1;ABS\n'.encode())
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual((reponse.data['lignes_lues'], reponse.data['notes_sauvees']), (2, 2))
+        self.assertEqual(self.note(0).note_obtenue, Decimal('14.50'))
+        self.assertTrue(self.note(1).absent)
+
+    def test_csv_virgule(self):
+        reponse = self.importer('notes.csv', 'matricule,note,commentaire\nMAT0,15,Bien\nMAT1,11,\n'.encode())
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual((reponse.data['notes_sauvees'], reponse.data['notes_inchangees']), (1, 1))
+        note = self.note(0)
+        self.assertEqual((note.note_obtenue, note.commentaire), (Decimal('15.00'), 'Bien'))
+
+    def test_xlsx(self):
+        reponse = self.importer('notes.xlsx', self.xlsx([
+            ['Matricule', 'Note', 'Absent'],
+            ['MAT0', 16, None],
+            ['MAT1', None, 'oui'],
+            ['MAT2', 'abs', None],
+        ]))
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.data['erreurs'], [])
+        self.assertEqual(self.note(0).note_obtenue, Decimal('16.00'))
+        self.assertTrue(self.note(1).absent)
+        self.assertTrue(self.note(2).absent)
+
+    def test_erreurs_numerotees_par_ligne(self):
+        contenu = 'matricule;note\nMAT0;13\nINCONNU;12\nMAT1;abc\n\nMAT2;25\n'
+        for nom, fichier in (
+            ('notes.csv', contenu.encode()),
+            ('notes.xlsx', self.xlsx([ligne.split(';') if ligne else [] for ligne in contenu.splitlines()])),
+        ):
+            with self.subTest(nom):
+                reponse = self.importer(nom, fichier)
+
+                self.assertEqual(reponse.status_code, 200)
+                # Ligne 1 = en-tête ; la ligne vide garde sa place dans la numérotation
+                self.assertEqual(self.erreurs(reponse), [(3, 'INCONNU'), (4, 'MAT1'), (6, 'MAT2')])
+                self.assertEqual(reponse.data['erreurs'][0]['erreur'], 'Matricule inconnu dans la classe')
+                self.assertTrue(reponse.data['erreurs'][1]['erreur'].startswith('Note invalide'))
+                self.assertTrue(reponse.data['erreurs'][2]['erreur'].startswith('Note invalide'))
+                self.assertEqual(self.note(0).note_obtenue, Decimal('13.00'))
+                self.assertEqual(self.note(1).note_obtenue, Decimal('11.00'))
+                self.assertEqual(self.note(2).note_obtenue, Decimal('12.00'))
+
+
+class SynchronisationTest(FeuilleNotesTest):
+    """Curseur de synchronisation : pagination, suppressions et expiration"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        super().setUp()
+        # Même updated_at pour les trois notes, hors de la marge de synchronisation
+        Note.objects.filter(evaluation=self.evaluation).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+    def synchroniser(self, **parametres):
+        return self.client.get('/api/evaluations/notes/synchroniser/', parametres)
+
+    def test_pagination_a_updated_at_egal(self):
+        identifiants = []
+        parametres = {'limite': 1}
+        for _ in range(4):
+            reponse = self.synchroniser(**parametres)
+            self.assertEqual(reponse.status_code, 200)
+            identifiants += [note['id'] for note in reponse.data['resultats']]
+            if reponse.data['complet']:
+                break
+            parametres['curseur'] = reponse.data['curseur']
+
+        self.assertTrue(reponse.data['complet'])
+        self.assertEqual(identifiants, sorted(self.note(numero).id for numero in range(3)))
+
+    def test_suppressions(self):
+        curseur = self.synchroniser().data['curseur']
+        note = self.note(2)
+        identifiant = note.id
+        note.delete()
+
+        reponse = self.synchroniser(curseur=curseur)
+
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.data['supprimes'], [identifiant])
+        self.assertEqual(reponse.data['resultats'], [])
+
+    def test_curseur_expire(self):
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+        from core.mixins import SynchronisationMixin
+
+        date = timezone.now() - timedelta(days=settings.SYNCHRONISATION_RETENTION_JOURS + 1)
+
+        reponse = self.synchroniser(curseur=SynchronisationMixin._ecrire_curseur((date, 0)))
+
+        self.assertEqual(reponse.status_code, 410)
+        self.assertTrue(reponse.data['resynchronisation_complete'])
+
+    def test_parametres_invalides(self):
+        for parametres in ({'limite': -1}, {'limite': 0}, {'limite': 'abc'}, {'curseur': 'hier'}):
+            with self.subTest(**parametres):
+                self.assertEqual(self.synchroniser(**parametres).status_code, 400)
+
+
+class EffectifsInscriptionTest(TestCase):
+    """Les effectifs suivent les inscriptions et la reconstruction donne le même résultat"""
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+        cls.redoublant = StatutEtudiant.objects.create(nom='Redoublant', code='RED')
+        cls.classes = [
+            Classe.objects.create(
+                nom=f'Classe {code}', code=code, filiere=cls.filiere,
+                niveau=cls.niveau, annee_academique=cls.annee
+            )
+            for code in ('A', 'B')
+        ]
+
+    def inscrire(self, numero, classe, **champs):
+        etudiant = Etudiant.objects.create(
+            user=User.objects.create(username=f'etu{numero}', matricule=f'MAT{numero}', type_utilisateur='etudiant'),
+            numero_carte=f'C{numero}'
+        )
+        return Inscription.objects.create(
+            etudiant=etudiant, classe=classe, annee_academique=self.annee,
+            statut=champs.pop('statut', self.statut), **champs
+        )
+
+    def effectifs(self):
+        from users.models import EffectifInscription
+
+        return {
+            (ligne.classe_id, ligne.statut_id): (ligne.nombre, ligne.redoublants)
+            for ligne in EffectifInscription.objects.exclude(nombre=0, redoublants=0)
+        }
+
+    def comptage_direct(self):
+        comptage = {}
+        for inscription in Inscription.objects.filter(active=True):
+            nombre, redoublants = comptage.get((inscription.classe_id, inscription.statut_id), (0, 0))
+            comptage[(inscription.classe_id, inscription.statut_id)] = (
+                nombre + 1, redoublants + (inscription.nombre_redoublements > 0)
+            )
+        return comptage
+
+    def test_signaux(self):
+        classe_a, classe_b = self.classes
+        inscriptions = [
+            self.inscrire(0, classe_a),
+            self.inscrire(1, classe_a, statut=self.redoublant, nombre_redoublements=1),
+            self.inscrire(2, classe_a),
+            self.inscrire(3, classe_b),
+        ]
+        self.assertEqual(self.effectifs(), {
+            (classe_a.id, self.statut.id): (2, 0),
+            (classe_a.id, self.redoublant.id): (1, 1),
+            (classe_b.id, self.statut.id): (1, 0),
+        })
+
+        etapes = {
+            'changement de classe': lambda: setattr(inscriptions[0], 'classe', classe_b),
+            'désactivation': lambda: setattr(inscriptions[1], 'active', False),
+            'réactivation': lambda: setattr(inscriptions[1], 'active', True),
+            'changement de statut': lambda: setattr(inscriptions[2], 'statut', self.redoublant),
+        }
+        for etape, modifier in etapes.items():
+            with self.subTest(etape):
+                modifier()
+                for inscription in inscriptions:
+                    inscription.save()
+                self.assertEqual(self.effectifs(), self.comptage_direct())
+
+        with self.subTest('suppression'):
+            inscriptions[3].delete()
+            self.assertEqual(self.effectifs(), self.comptage_direct())
+            self.assertEqual(self.effectifs()[(classe_b.id, self.statut.id)], (1, 0))
+
+    def test_commande_de_reconstruction(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from users.models import EffectifInscription
+
+        for numero in range(5):
+            self.inscrire(numero, self.classes[numero % 2], nombre_redoublements=numero % 3)
+        # update() et bulk_create contournent les signaux
+        Inscription.objects.filter(classe=self.classes[0]).update(statut=self.redoublant)
+        self.assertNotEqual(self.effectifs(), self.comptage_direct())
+
+        call_command('reconstruire_effectifs', annee=self.annee.id, stdout=StringIO())
+
+        self.assertEqual(self.effectifs(), self.comptage_direct())
+        self.assertEqual(
+            set(EffectifInscription.objects.values_list('filiere_id', 'niveau_id')),
+            {(self.filiere.id, self.niveau.id)}
+        )
+
+
+class AuthentificationCacheTest(TestCase):
+    """Déconnexion et désactivation invalident l'utilisateur en cache, dans tous les processus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from rest_framework.authtoken.models import Token
+
+        cls.user = User.objects.create(username='ens', matricule='ENS', type_utilisateur='enseignant')
+        cls.jeton = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        import tempfile
+        from core.authentication import CachedTokenAuthentication
+
+        # Les versions des jetons ne sont suivies qu'avec un cache partagé
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': dossier.name
+        }})
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        CachedTokenAuthentication.utilisateurs.vider()
+        self.addCleanup(CachedTokenAuthentication.utilisateurs.vider)
+        # La clé reste lisible une fois le jeton supprimé
+        self.cle = self.jeton.key
+
+    def authentifier(self):
+        from core.authentication import CachedTokenAuthentication
+
+        return CachedTokenAuthentication().authenticate_credentials(self.cle)
+
+    def entree_d_un_autre_processus(self):
+        """Entrée en mémoire telle qu'un autre processus la garde encore"""
+        from core.authentication import CachedTokenAuthentication
+
+        self.authentifier()
+        return CachedTokenAuthentication.utilisateurs.get(self.cle)
+
+    def verifier_refus(self, entree):
+        from rest_framework.exceptions import AuthenticationFailed
+        from core.authentication import CachedTokenAuthentication
+
+        CachedTokenAuthentication.utilisateurs.set(self.cle, entree)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentifier()
+
+    def test_utilisateur_en_cache(self):
+        self.authentifier()
+
+        with self.assertNumQueries(0):
+            user, jeton = self.authentifier()
+
+        self.assertEqual((user.pk, jeton.key), (self.user.pk, self.cle))
+
+    def test_suppression_du_jeton(self):
+        entree = self.entree_d_un_autre_processus()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jeton.delete()
+
+        self.verifier_refus(entree)
+
+    def test_desactivation_de_l_utilisateur(self):
+        for champ in ('is_active', 'actif'):
+            with self.subTest(champ):
+                entree = self.entree_d_un_autre_processus()
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    setattr(self.user, champ, False)
+                    self.user.save()
+
+                self.verifier_refus(entree)
+                setattr(self.user, champ, True)
+                self.user.save()
+
+
+class CacheReferentielTest(TestCase):
+    """Les réponses des référentiels ne sont mises en cache qu'avec un cache partagé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        creer_structure(cls)
+        cls.user = User.objects.create(username='adm', matricule='ADM', type_utilisateur='admin')
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def lister(self, **entetes):
+        return self.client.get('/api/academics/sessions/', **entetes)
+
+    def modifier_depuis_un_autre_processus(self):
+        from django.utils import timezone
+
+        # update() n'envoie pas de signal : aucune version n'est changée ici
+        Session.objects.filter(pk=self.session.pk).update(nom='Session renommée', updated_at=timezone.now())
+
+    def noms(self, reponse):
+        resultats = reponse.data['results'] if 'results' in reponse.data else reponse.data
+        return [session['nom'] for session in resultats]
+
+    def test_sans_cache_partage(self):
+        etag = self.lister()['ETag']
+
+        self.modifier_depuis_un_autre_processus()
+
+        self.assertEqual(self.lister(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.noms(self.lister()), ['Session renommée'])
+
+    def test_avec_cache_partage(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as dossier, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': dossier
+        }}):
+            etag = self.lister()['ETag']
+
+            with self.assertNumQueries(0):
+                reponse = self.lister()
+            self.assertEqual(reponse['ETag'], etag)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.lister(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.session.nom = 'Session renommée'
+                self.session.save()
+
+            self.assertEqual(self.noms(self.lister()), ['Session renommée'])
@@ -6,11 +6,20 @@ from decimal import Decimal, InvalidOperation
 from django.db import transaction
 from django.utils import timezone
 from academics.models import UE, EC, ConfigurationEvaluationEC
-from evaluations.models import Note, MoyenneEC, MoyenneUE, MoyenneSemestre
+from evaluations.models import Enseignement, Evaluation, Note, MoyenneEC, MoyenneUE, MoyenneSemestre, MoyenneARecalculer
 import logging
 
 logger = logging.getLogger('acadflow')
 
+# Les notes sont ramenées sur ce barème avant le calcul des moyennes
+BAREME_NOTES = 20
+
+def normaliser_note(note_obtenue, note_sur):
+    """Ramène une note saisie sur note_sur au barème commun de 20"""
+    if not note_sur or note_sur == BAREME_NOTES:
+        return note_obtenue
+    return note_obtenue * BAREME_NOTES / note_sur
+
 def calculer_moyenne_ec(etudiant, ec, session, annee_academique):
     """Calcule la moyenne d'un EC pour un étudiant avec gestion d'erreur"""
     try:
@@ -33,16 +42,16 @@ def calculer_moyenne_ec(etudiant, ec, session, annee_academique):
                         evaluation__type_evaluation=config.type_evaluation,
                         evaluation__session=session,
                         evaluation__enseignement__annee_academique=annee_academique
-                    ).exclude(absent=True)
+                    ).exclude(absent=True).values_list('note_obtenue', 'evaluation__note_sur')
                     
                     if notes.exists():
                         notes_trouvees = True
-                        # Moyenne des notes pour ce type d'évaluation
-                        notes_values = [note.note_obtenue for note in notes]
+                        # Moyenne des notes (ramenées sur 20) pour ce type d'évaluation
+                        notes_values = [normaliser_note(note, note_sur) for note, note_sur in notes]
                         moyenne_type = sum(notes_values) / len(notes_values)
                         
-                        # Pondération
-                        moyenne_ponderee += moyenne_type * (config.pourcentage / 100)
+                        # Pondération (divisée une seule fois par le total ci-dessous)
+                        moyenne_ponderee += moyenne_type * config.pourcentage
                         total_pourcentage += config.pourcentage
                 
                 except Exception as e:
@@ -55,7 +64,7 @@ def calculer_moyenne_ec(etudiant, ec, session, annee_academique):
             
             if total_pourcentage > 0:
                 # Ajuster si le total des pourcentages n'est pas 100%
-                moyenne_finale = moyenne_ponderee * (100 / total_pourcentage)
+                moyenne_finale = moyenne_ponderee / total_pourcentage
                 
                 # Sauvegarder la moyenne
                 moyenne_ec, created = MoyenneEC.objects.update_or_create(
@@ -78,6 +87,243 @@ def calculer_moyenne_ec(etudiant, ec, session, annee_academique):
         logger.error(f"Erreur calcul moyenne EC {ec.code} pour {etudiant.user.matricule}: {e}")
         return None
 
+def calculer_moyennes_ec_classe(classe, session, ecs=None, etudiants=None):
+    """
+    Calcule en lot les moyennes EC de toute une classe pour une session.
+
+    Même règle de calcul que calculer_moyenne_ec, mais les inscriptions,
+    configurations et notes sont chargées en un nombre fixe de requêtes et
+    les moyennes sont écrites en un seul upsert. Retourne la liste des
+    MoyenneEC enregistrées ; les erreurs sont journalisées puis propagées
+    (une liste vide signifie qu'aucune moyenne n'était calculable).
+    """
+    from users.models import Inscription
+
+    annee_academique = classe.annee_academique
+
+    try:
+        with transaction.atomic():
+            if ecs is None:
+                ecs = EC.objects.filter(ue__niveau=classe.niveau, actif=True)
+            ecs = list(ecs)
+
+            if etudiants is None:
+                etudiants_ids = list(
+                    Inscription.objects.filter(classe=classe, active=True)
+                    .values_list('etudiant_id', flat=True)
+                )
+            else:
+                etudiants_ids = [getattr(e, 'pk', e) for e in etudiants]
+
+            if not ecs or not etudiants_ids:
+                return []
+
+            # Configurations par EC, dans un ordre stable
+            configurations = {}
+            for config in ConfigurationEvaluationEC.objects.filter(ec__in=ecs).order_by('id'):
+                configurations.setdefault(config.ec_id, []).append(config)
+
+            for ec in ecs:
+                if ec.id not in configurations:
+                    logger.warning(f"Aucune configuration d'évaluation pour EC {ec.code}")
+
+            # Notes regroupées par (étudiant, EC, type d'évaluation)
+            notes_par_cle = {}
+            notes = Note.objects.filter(
+                etudiant_id__in=etudiants_ids,
+                evaluation__enseignement__ec__in=list(configurations),
+                evaluation__session=session,
+                evaluation__enseignement__annee_academique=annee_academique
+            ).exclude(absent=True).values_list(
+                'etudiant_id',
+                'evaluation__enseignement__ec_id',
+                'evaluation__type_evaluation_id',
+                'note_obtenue',
+                'evaluation__note_sur'
+            )
+            for etudiant_id, ec_id, type_evaluation_id, note_obtenue, note_sur in notes:
+                notes_par_cle.setdefault(
+                    (etudiant_id, ec_id, type_evaluation_id), []
+                ).append(normaliser_note(note_obtenue, note_sur))
+
+            moyennes = []
+            for etudiant_id in etudiants_ids:
+                for ec in ecs:
+                    moyenne_ponderee = Decimal('0.00')
+                    total_pourcentage = Decimal('0.00')
+                    notes_trouvees = False
+
+                    for config in configurations.get(ec.id, []):
+                        notes_values = notes_par_cle.get(
+                            (etudiant_id, ec.id, config.type_evaluation_id)
+                        )
+                        if notes_values:
+                            notes_trouvees = True
+                            moyenne_type = sum(notes_values) / len(notes_values)
+                            moyenne_ponderee += moyenne_type * config.pourcentage
+                            total_pourcentage += config.pourcentage
+
+                    if not notes_trouvees or total_pourcentage <= 0:
+                        continue
+
+                    moyenne_finale = round(moyenne_ponderee / total_pourcentage, 2)
+                    moyennes.append(MoyenneEC(
+                        etudiant_id=etudiant_id,
+                        ec=ec,
+                        session=session,
+                        annee_academique=annee_academique,
+                        moyenne=moyenne_finale,
+                        # MoyenneEC.save() valide sur la moyenne arrondie
+                        validee=moyenne_finale >= 10
+                    ))
+
+            if moyennes:
+                MoyenneEC.objects.bulk_create(
+                    moyennes,
+                    update_conflicts=True,
+                    unique_fields=['etudiant', 'ec', 'session', 'annee_academique'],
+                    update_fields=['moyenne', 'validee', 'updated_at']
+                )
+                # bulk_create n'envoie pas de signaux
+                from core.services import NoteService
+                NoteService.invalider_releves(moyenne.etudiant_id for moyenne in moyennes)
+
+            logger.info(
+                f"Moyennes EC calculées en lot: {classe.code} - {session.code}: "
+                f"{len(moyennes)} moyennes"
+            )
+            return moyennes
+
+    except Exception as e:
+        logger.error(f"Erreur calcul en lot des moyennes EC pour {classe.code}: {e}")
+        raise
+
+def _marquer_dependances_ec(classe, session, resultats):
+    """Met en file, après validation, les moyennes UE et semestrielles dépendant de moyennes EC réécrites"""
+    cellules = [
+        (etudiant_id, ec_id, session.pk, classe.annee_academique_id)
+        for etudiant_id, moyennes in resultats.items()
+        for ec_id in moyennes
+    ]
+    if cellules:
+        transaction.on_commit(lambda: MoyenneARecalculer.marquer(cellules))
+
+def calculer_moyennes_ec_en_base(classe, session, ecs=None, etudiants=None):
+    """
+    Calcule et enregistre les moyennes EC d'une classe directement dans
+    PostgreSQL, en une seule requête INSERT ... SELECT ... ON CONFLICT.
+
+    Même règle que calculer_moyenne_ec : notes ramenées sur 20, moyenne par
+    configuration d'évaluation, pondération par pourcentage, arrondi au
+    centième (au pair le plus proche). Retourne {etudiant_id: {ec_id: moyenne}}.
+    Sur un autre moteur de base, le calcul en lot Python est utilisé.
+
+    Les moyennes UE et semestrielles dépendantes sont mises en file
+    (MoyenneARecalculer) une fois la transaction validée. Les erreurs sont
+    journalisées puis propagées.
+    """
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        resultats = {}
+        with transaction.atomic():
+            for moyenne in calculer_moyennes_ec_classe(classe, session, ecs=ecs, etudiants=etudiants):
+                resultats.setdefault(moyenne.etudiant_id, {})[moyenne.ec_id] = moyenne.moyenne
+            _marquer_dependances_ec(classe, session, resultats)
+        return resultats
+
+    from users.models import Inscription
+
+    annee_academique = classe.annee_academique
+    if ecs is None:
+        ecs = EC.objects.filter(ue__niveau=classe.niveau, actif=True)
+    ecs_ids = [getattr(ec, 'pk', ec) for ec in ecs]
+    etudiants_ids = None
+    if etudiants is not None:
+        etudiants_ids = [getattr(e, 'pk', e) for e in etudiants]
+
+    if not ecs_ids or etudiants_ids == []:
+        return {}
+
+    requete = f"""
+        WITH moyennes_configuration AS (
+            SELECT n.etudiant_id, ens.ec_id, c.pourcentage,
+                   AVG(n.note_obtenue * {BAREME_NOTES} / e.note_sur) AS moyenne_type
+            FROM {Note._meta.db_table} n
+            JOIN {Evaluation._meta.db_table} e ON e.id = n.evaluation_id
+            JOIN {Enseignement._meta.db_table} ens ON ens.id = e.enseignement_id
+            JOIN {ConfigurationEvaluationEC._meta.db_table} c
+                 ON c.ec_id = ens.ec_id AND c.type_evaluation_id = e.type_evaluation_id
+            JOIN {Inscription._meta.db_table} i
+                 ON i.etudiant_id = n.etudiant_id AND i.classe_id = %(classe)s AND i.active
+            WHERE NOT n.absent
+              AND e.session_id = %(session)s
+              AND ens.annee_academique_id = %(annee)s
+              AND ens.ec_id = ANY(%(ecs)s)
+              AND (%(etudiants)s::bigint[] IS NULL OR n.etudiant_id = ANY(%(etudiants)s))
+            GROUP BY n.etudiant_id, ens.ec_id, c.id, c.pourcentage
+        ),
+        moyennes_brutes AS (
+            -- Une seule division : évite la troncature de 100 / total
+            SELECT etudiant_id, ec_id,
+                   SUM(moyenne_type * pourcentage) / SUM(pourcentage) AS moyenne
+            FROM moyennes_configuration
+            GROUP BY etudiant_id, ec_id
+            HAVING SUM(pourcentage) > 0
+        ),
+        moyennes_arrondies AS (
+            SELECT etudiant_id, ec_id,
+                   CASE
+                       WHEN moyenne * 100 - TRUNC(moyenne * 100) = 0.5
+                            AND MOD(TRUNC(moyenne * 100), 2) = 0
+                       THEN TRUNC(moyenne * 100) / 100
+                       ELSE ROUND(moyenne, 2)
+                   END::numeric(5, 2) AS moyenne
+            FROM moyennes_brutes
+        )
+        INSERT INTO {MoyenneEC._meta.db_table}
+            (etudiant_id, ec_id, session_id, annee_academique_id,
+             moyenne, validee, created_at, updated_at)
+        SELECT etudiant_id, ec_id, %(session)s, %(annee)s,
+               moyenne, moyenne >= 10, NOW(), NOW()
+        FROM moyennes_arrondies
+        ON CONFLICT (etudiant_id, ec_id, session_id, annee_academique_id)
+        DO UPDATE SET moyenne = EXCLUDED.moyenne,
+                      validee = EXCLUDED.validee,
+                      updated_at = EXCLUDED.updated_at
+        RETURNING etudiant_id, ec_id, moyenne
+    """
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(requete, {
+                'classe': classe.pk,
+                'session': session.pk,
+                'annee': annee_academique.pk,
+                'ecs': ecs_ids,
+                'etudiants': etudiants_ids,
+            })
+            lignes = cursor.fetchall()
+
+            resultats = {}
+            for etudiant_id, ec_id, moyenne in lignes:
+                resultats.setdefault(etudiant_id, {})[ec_id] = moyenne
+
+            # L'upsert SQL n'envoie pas de signaux
+            from core.services import NoteService
+            NoteService.invalider_releves(resultats)
+            _marquer_dependances_ec(classe, session, resultats)
+
+        logger.info(
+            f"Moyennes EC calculées en base: {classe.code} - {session.code}: "
+            f"{len(lignes)} moyennes"
+        )
+        return resultats
+
+    except Exception as e:
+        logger.error(f"Erreur calcul en base des moyennes EC pour {classe.code}: {e}")
+        raise
+
 def calculer_moyenne_ue(etudiant, ue, session, annee_academique):
     """Calcule la moyenne d'une UE pour un étudiant avec gestion d'erreur"""
     try:
@@ -4,13 +4,16 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q, Count, Avg, Sum
-from .models import Domaine, Cycle, TypeFormation, Filiere, Option, Niveau
+from .models import Etablissement, Campus, Domaine, Cycle, TypeFormation, Filiere, Option, Niveau
+from .contexte import ContexteAcademique
+from .mixins import CacheReferentielMixin
 from .serializers import (
     DomaineSerializer, CycleSerializer, TypeFormationSerializer,
     FiliereSerializer, OptionSerializer, NiveauSerializer
 )
 
-class DomaineViewSet(viewsets.ModelViewSet):
+class DomaineViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (Etablissement,)
     queryset = Domaine.objects.filter(actif=True)
     serializer_class = DomaineSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -35,29 +38,35 @@ class DomaineViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistiques(self, request):
         """Statistiques des domaines"""
+        domaines = self.get_queryset().annotate(
+            nombre_filieres=Count('filiere', filter=Q(filiere__actif=True))
+        )
+        etudiants = self._compter_etudiants_domaines()
         stats = []
-        for domaine in self.get_queryset():
+        for domaine in domaines:
             stats.append({
                 'id': domaine.id,
                 'nom': domaine.nom,
                 'code': domaine.code,
-                'nombre_filieres': domaine.filiere_set.filter(actif=True).count(),
-                'nombre_etudiants': self._compter_etudiants_domaine(domaine)
+                'nombre_filieres': domaine.nombre_filieres,
+                'nombre_etudiants': etudiants.get(domaine.id, 0)
             })
         return Response(stats)
     
-    def _compter_etudiants_domaine(self, domaine):
-        """Compter les étudiants d'un domaine"""
+    def _compter_etudiants_domaines(self):
+        """Nombre d'étudiants inscrits par domaine, depuis les effectifs pré-agrégés"""
         try:
-            from users.models import Inscription
-            return Inscription.objects.filter(
-                classe__filiere__domaine=domaine,
-                active=True
-            ).count()
-        except:
-            return 0
+            from users.models import EffectifInscription
+            return dict(
+                EffectifInscription.objects.values('filiere__domaine_id').annotate(
+                    total=Sum('nombre')
+                ).values_list('filiere__domaine_id', 'total').order_by()
+            )
+        except ImportError:
+            return {}
 
-class CycleViewSet(viewsets.ModelViewSet):
+class CycleViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (Etablissement,)
     queryset = Cycle.objects.filter(actif=True)
     serializer_class = CycleSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -70,7 +79,8 @@ class CycleViewSet(viewsets.ModelViewSet):
         serializer = NiveauSerializer(niveaux, many=True)
         return Response(serializer.data)
 
-class TypeFormationViewSet(viewsets.ModelViewSet):
+class TypeFormationViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (Cycle, Etablissement)
     queryset = TypeFormation.objects.filter(actif=True)
     serializer_class = TypeFormationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -82,7 +92,8 @@ class TypeFormationViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(cycle_id=cycle_id)
         return queryset
 
-class FiliereViewSet(viewsets.ModelViewSet):
+class FiliereViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (Domaine, TypeFormation, Campus, Etablissement)
     queryset = Filiere.objects.filter(actif=True)
     serializer_class = FiliereSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -117,8 +128,9 @@ class FiliereViewSet(viewsets.ModelViewSet):
             from academics.serializers import ClasseSerializer
             
             # Récupérer l'année académique active
-            annee_active = AnneeAcademique.objects.filter(active=True).first()
-            if not annee_active:
+            try:
+                annee_active = ContexteAcademique.annee_active()
+            except AnneeAcademique.DoesNotExist:
                 return Response({'error': 'Aucune année académique active'}, 
                               status=status.HTTP_404_NOT_FOUND)
             
@@ -141,7 +153,8 @@ class FiliereViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Module academics non disponible'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class OptionViewSet(viewsets.ModelViewSet):
+class OptionViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (Filiere, Domaine, Etablissement)
     queryset = Option.objects.filter(actif=True)
     serializer_class = OptionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -153,7 +166,8 @@ class OptionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(filiere_id=filiere_id)
         return queryset
 
-class NiveauViewSet(viewsets.ModelViewSet):
+class NiveauViewSet(CacheReferentielMixin, viewsets.ModelViewSet):
+    modeles_dependants = (Cycle, Etablissement)
     queryset = Niveau.objects.filter(actif=True)
     serializer_class = NiveauSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -185,7 +199,9 @@ class NiveauViewSet(viewsets.ModelViewSet):
                 ).order_by('code')
                 
                 if ues.exists():
-                    ues_par_semestre[semestre.nom] = UESerializer(ues, many=True).data
+                    ues_par_semestre[semestre.nom] = UESerializer(
+                        UESerializer.optimiser_queryset(ues), many=True
+                    ).data
             
             return Response(ues_par_semestre)
             
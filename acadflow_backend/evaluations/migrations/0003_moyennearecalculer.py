@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+        ('evaluations', '0002_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoyenneARecalculer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('annee_academique', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.anneeacademique')),
+                ('ec', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.ec')),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.etudiant')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.session')),
+            ],
+            options={
+                'db_table': 'moyennes_a_recalculer',
+                'unique_together': {('etudiant', 'ec', 'session', 'annee_academique')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+        ('evaluations', '0003_moyennearecalculer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacheautomatisee',
+            name='ec',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='academics.ec'),
+        ),
+    ]
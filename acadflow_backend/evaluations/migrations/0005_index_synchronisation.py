@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+        ('evaluations', '0004_tacheautomatisee_ec'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['updated_at', 'id'], name='evaluations_updated_6461e5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moyenneec',
+            index=models.Index(fields=['updated_at', 'id'], name='moyennes_ec_updated_6a4d39_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moyennesemestre',
+            index=models.Index(fields=['updated_at', 'id'], name='moyennes_se_updated_ba1992_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moyenneue',
+            index=models.Index(fields=['updated_at', 'id'], name='moyennes_ue_updated_1b8f16_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['updated_at', 'id'], name='notes_updated_9a39f5_idx'),
+        ),
+    ]
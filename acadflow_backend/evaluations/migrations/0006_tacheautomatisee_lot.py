@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluations', '0005_index_synchronisation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacheautomatisee',
+            name='lot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='taches_lot', to='evaluations.tacheautomatisee'),
+        ),
+        migrations.AlterField(
+            model_name='tacheautomatisee',
+            name='type_tache',
+            field=models.CharField(choices=[('recap_semestriel', 'Récapitulatif semestriel'), ('inscription_ec', 'Inscription aux ECs'), ('calcul_moyennes', 'Calcul des moyennes'), ('notification_delai', 'Notification délai saisie'), ('recaps_masse', 'Récapitulatifs en masse')], max_length=30),
+        ),
+    ]
@@ -115,6 +115,9 @@ class Evaluation(TimestampedModel):
     
     class Meta:
         db_table = 'evaluations'
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
 class Note(TimestampedModel):
     """Notes individuelles des étudiants"""
@@ -161,6 +164,8 @@ class Note(TimestampedModel):
                 pass
     
     def save(self, *args, **kwargs):
+        a_recalculer = True
+        
         # Traçabilité des modifications
         if self.pk:  # Si la note existe déjà
             try:
@@ -169,10 +174,28 @@ class Note(TimestampedModel):
                     self.modifiee = True
                     self.date_modification = timezone.now()
                     self.note_precedente = old_note.note_obtenue
+                a_recalculer = (
+                    old_note.note_obtenue != self.note_obtenue or
+                    old_note.absent != self.absent
+                )
             except Note.DoesNotExist:
                 pass
         
         super().save(*args, **kwargs)
+        
+        # Seule la moyenne EC de cet étudiant est impactée
+        if a_recalculer:
+            MoyenneARecalculer.marquer([self.cellule_moyenne()])
+    
+    def cellule_moyenne(self):
+        """(etudiant, ec, session, annee) de la moyenne EC dépendant de cette note"""
+        enseignement = self.evaluation.enseignement
+        return (
+            self.etudiant_id,
+            enseignement.ec_id,
+            self.evaluation.session_id,
+            enseignement.annee_academique_id
+        )
     
     def __str__(self):
         return f"{self.etudiant.user.matricule} - {self.evaluation.nom}: {self.note_obtenue}"
@@ -180,6 +203,54 @@ class Note(TimestampedModel):
     class Meta:
         db_table = 'notes'
         unique_together = ['etudiant', 'evaluation']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
+
+class MoyenneARecalculer(TimestampedModel):
+    """
+    Moyennes EC invalidées par une modification de notes.
+    
+    Chaque ligne représente une cellule (étudiant, EC, session) dont la
+    moyenne EC, puis les moyennes UE et semestrielles dépendantes, doivent
+    être recalculées. Les lignes ne sont supprimées qu'après un recalcul
+    réussi, ce qui permet de reprendre le travail après un arrêt.
+    """
+    etudiant = models.ForeignKey('users.Etudiant', on_delete=models.CASCADE)
+    ec = models.ForeignKey('academics.EC', on_delete=models.CASCADE)
+    session = models.ForeignKey('academics.Session', on_delete=models.CASCADE)
+    annee_academique = models.ForeignKey('academics.AnneeAcademique', on_delete=models.CASCADE)
+    tentatives = models.PositiveIntegerField(default=0)
+    derniere_erreur = models.TextField(blank=True)
+    
+    @classmethod
+    def marquer(cls, cellules):
+        """Marque des cellules (etudiant_id, ec_id, session_id, annee_academique_id) à recalculer"""
+        objets = [
+            cls(
+                etudiant_id=etudiant_id,
+                ec_id=ec_id,
+                session_id=session_id,
+                annee_academique_id=annee_academique_id
+            )
+            for etudiant_id, ec_id, session_id, annee_academique_id in set(cellules)
+        ]
+        if objets:
+            # Un nouveau marquage repousse updated_at pour ne pas être
+            # effacé par un recalcul déjà en cours
+            cls.objects.bulk_create(
+                objets,
+                update_conflicts=True,
+                unique_fields=['etudiant', 'ec', 'session', 'annee_academique'],
+                update_fields=['updated_at']
+            )
+    
+    def __str__(self):
+        return f"{self.etudiant_id} - EC {self.ec_id} - Session {self.session_id}"
+    
+    class Meta:
+        db_table = 'moyennes_a_recalculer'
+        unique_together = ['etudiant', 'ec', 'session', 'annee_academique']
 
 class MoyenneEC(TimestampedModel):
     """Moyennes par EC"""
@@ -203,6 +274,9 @@ class MoyenneEC(TimestampedModel):
     class Meta:
         db_table = 'moyennes_ecs'
         unique_together = ['etudiant', 'ec', 'session', 'annee_academique']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
 class MoyenneUE(TimestampedModel):
     """Moyennes par UE"""
@@ -242,6 +316,9 @@ class MoyenneUE(TimestampedModel):
     class Meta:
         db_table = 'moyennes_ues'
         unique_together = ['etudiant', 'ue', 'session', 'annee_academique']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
 class MoyenneSemestre(TimestampedModel):
     """Moyennes semestrielles"""
@@ -286,6 +363,9 @@ class MoyenneSemestre(TimestampedModel):
     class Meta:
         db_table = 'moyennes_semestres'
         unique_together = ['etudiant', 'classe', 'semestre', 'session', 'annee_academique']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
 class InscriptionEC(TimestampedModel):
     """Inscription automatique des étudiants aux ECs de leur classe"""
@@ -307,13 +387,19 @@ class TacheAutomatisee(TimestampedModel):
         ('inscription_ec', 'Inscription aux ECs'),
         ('calcul_moyennes', 'Calcul des moyennes'),
         ('notification_delai', 'Notification délai saisie'),
+        ('recaps_masse', 'Récapitulatifs en masse'),
     ]
     
     type_tache = models.CharField(max_length=30, choices=TYPE_TACHES)
     classe = models.ForeignKey('academics.Classe', on_delete=models.CASCADE, null=True, blank=True)
     semestre = models.ForeignKey('academics.Semestre', on_delete=models.CASCADE, null=True, blank=True)
     session = models.ForeignKey('academics.Session', on_delete=models.CASCADE, null=True, blank=True)
+    ec = models.ForeignKey('academics.EC', on_delete=models.CASCADE, null=True, blank=True)
     annee_academique = models.ForeignKey('academics.AnneeAcademique', on_delete=models.CASCADE)
+    # Tâche parente regroupant les tâches d'une génération en masse
+    lot = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='taches_lot'
+    )
     
     statut = models.CharField(
         max_length=20,
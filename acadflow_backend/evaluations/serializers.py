@@ -1,5 +1,7 @@
 # evaluations/serializers.py - Version corrigée avec tous les imports
 from rest_framework import serializers
+from django.db.models import Count
+from django.utils.functional import cached_property
 from .models import (
     Enseignement, Evaluation, Note, MoyenneEC, MoyenneUE, MoyenneSemestre
 )
@@ -25,7 +27,17 @@ class EvaluationSerializer(serializers.ModelSerializer):
         model = Evaluation
         fields = '__all__'
     
+    @staticmethod
+    def optimiser_queryset(queryset):
+        """Charge les relations et le nombre de notes en une requête pour toute la liste"""
+        return queryset.select_related(
+            'enseignement__enseignant__user', 'enseignement__ec__ue', 'enseignement__classe',
+            'type_evaluation', 'session'
+        ).annotate(nombre_notes=Count('note', distinct=True))
+    
     def get_nombre_notes(self, obj):
+        if hasattr(obj, 'nombre_notes'):
+            return obj.nombre_notes
         return obj.note_set.count()
 
 class NoteSerializer(serializers.ModelSerializer):
@@ -222,6 +234,17 @@ class RelveNotesSerializer(serializers.Serializer):
         self.annee_academique_obj = annee_academique
         super().__init__(*args, **kwargs)
     
+    @cached_property
+    def inscription(self):
+        """Inscription active de l'étudiant, chargée une seule fois"""
+        from users.models import Inscription
+        
+        return Inscription.objects.filter(
+            etudiant=self.etudiant_obj,
+            annee_academique=self.annee_academique_obj,
+            active=True
+        ).select_related('classe__niveau').first()
+    
     def get_etudiant(self, obj):
         from users.serializers import EtudiantSerializer
         return EtudiantSerializer(self.etudiant_obj).data
@@ -235,26 +258,17 @@ class RelveNotesSerializer(serializers.Serializer):
         return AnneeAcademiqueSerializer(self.annee_academique_obj).data
     
     def get_classe(self, obj):
-        from users.models import Inscription
         from academics.serializers import ClasseSerializer
         
-        inscription = Inscription.objects.filter(
-            etudiant=self.etudiant_obj,
-            annee_academique=self.annee_academique_obj,
-            active=True
-        ).first()
+        inscription = self.inscription
         
         return ClasseSerializer(inscription.classe).data if inscription else None
     
     def get_notes_par_ue(self, obj):
-        from users.models import Inscription
-        from academics.models import UE
+        from django.db.models import Prefetch
+        from academics.models import UE, EC
         
-        inscription = Inscription.objects.filter(
-            etudiant=self.etudiant_obj,
-            annee_academique=self.annee_academique_obj,
-            active=True
-        ).first()
+        inscription = self.inscription
         
         if not inscription:
             return []
@@ -263,26 +277,31 @@ class RelveNotesSerializer(serializers.Serializer):
         ues = UE.objects.filter(
             niveau=inscription.classe.niveau,
             actif=True
-        ).prefetch_related('elements_constitutifs')
+        ).select_related('semestre').prefetch_related(
+            Prefetch('elements_constitutifs', queryset=EC.objects.filter(actif=True), to_attr='ecs_actifs')
+        )
+        
+        # Moyennes de l'étudiant chargées en une requête par modèle
+        filtres = {
+            'etudiant': self.etudiant_obj,
+            'session': self.session_obj,
+            'annee_academique': self.annee_academique_obj
+        }
+        moyennes_ue_par_ue = {
+            moyenne.ue_id: moyenne for moyenne in MoyenneUE.objects.filter(**filtres)
+        }
+        moyennes_ec_par_ec = {
+            moyenne.ec_id: moyenne for moyenne in MoyenneEC.objects.filter(**filtres)
+        }
         
         for ue in ues:
             # Moyenne UE
-            moyenne_ue = MoyenneUE.objects.filter(
-                etudiant=self.etudiant_obj,
-                ue=ue,
-                session=self.session_obj,
-                annee_academique=self.annee_academique_obj
-            ).first()
+            moyenne_ue = moyennes_ue_par_ue.get(ue.id)
             
             # Moyennes EC
             moyennes_ec = []
-            for ec in ue.elements_constitutifs.filter(actif=True):
-                moyenne_ec = MoyenneEC.objects.filter(
-                    etudiant=self.etudiant_obj,
-                    ec=ec,
-                    session=self.session_obj,
-                    annee_academique=self.annee_academique_obj
-                ).first()
+            for ec in ue.ecs_actifs:
+                moyenne_ec = moyennes_ec_par_ec.get(ec.id)
                 
                 if moyenne_ec:
                     moyennes_ec.append({
@@ -313,13 +332,7 @@ class RelveNotesSerializer(serializers.Serializer):
         return ues_data
     
     def get_moyennes_semestre(self, obj):
-        from users.models import Inscription
-        
-        inscription = Inscription.objects.filter(
-            etudiant=self.etudiant_obj,
-            annee_academique=self.annee_academique_obj,
-            active=True
-        ).first()
+        inscription = self.inscription
         
         if not inscription:
             return []
@@ -346,13 +359,7 @@ class RelveNotesSerializer(serializers.Serializer):
         ]
     
     def get_bilan(self, obj):
-        from users.models import Inscription
-        
-        inscription = Inscription.objects.filter(
-            etudiant=self.etudiant_obj,
-            annee_academique=self.annee_academique_obj,
-            active=True
-        ).first()
+        inscription = self.inscription
         
         if not inscription:
             return {}
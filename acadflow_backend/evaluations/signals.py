@@ -0,0 +1,167 @@
+# ========================================
+# FICHIER: evaluations/signals.py
+# ========================================
+
+from itertools import chain
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from academics.models import EC, TypeEvaluation
+from core.models import ObjetSupprime
+from core.statistiques import invalider_statistiques_semestre
+from core.services import NoteService
+from users.models import User, Etudiant
+from .models import (
+    Enseignement, Evaluation, Note, MoyenneEC, MoyenneUE, MoyenneSemestre, MoyenneARecalculer
+)
+
+
+@receiver(post_delete, sender=Evaluation)
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=MoyenneEC)
+@receiver(post_delete, sender=MoyenneUE)
+@receiver(post_delete, sender=MoyenneSemestre)
+def tracer_suppression(sender, instance, origin=None, **kwargs):
+    """Conserve une trace des suppressions pour la synchronisation des clients"""
+    ObjetSupprime.enregistrer(instance, **_portee_suppression(instance, origin))
+
+
+def _contexte_note(note, origin=None):
+    """Contexte de l'évaluation d'une note supprimée, lu une seule fois par note"""
+    if not hasattr(note, '_contexte_evaluation'):
+        note._contexte_evaluation = _contexte_evaluation(note.evaluation_id, origin) or {}
+    return note._contexte_evaluation
+
+
+def _contexte_evaluation(evaluation_id, origin=None):
+    """
+    Enseignement et session d'une évaluation. Lors d'une suppression en
+    cascade depuis l'évaluation, l'objet d'origine évite une requête par note.
+    """
+    if isinstance(origin, Evaluation) and origin.pk == evaluation_id:
+        enseignement = origin.enseignement
+        return {
+            'enseignant_id': enseignement.enseignant_id,
+            'classe_id': enseignement.classe_id,
+            'ec_id': enseignement.ec_id,
+            'annee_academique_id': enseignement.annee_academique_id,
+            'session_id': origin.session_id,
+        }
+    return Evaluation.objects.filter(pk=evaluation_id).values(
+        'session_id',
+        enseignant_id=F('enseignement__enseignant_id'),
+        classe_id=F('enseignement__classe_id'),
+        ec_id=F('enseignement__ec_id'),
+        annee_academique_id=F('enseignement__annee_academique_id'),
+    ).first()
+
+
+def _portee_suppression(instance, origin):
+    """Étudiant, enseignant, classe et session auxquels l'objet supprimé était visible"""
+    if isinstance(instance, Evaluation):
+        enseignement = (
+            origin if isinstance(origin, Enseignement) and origin.pk == instance.enseignement_id
+            else instance.enseignement
+        )
+        return {
+            'enseignant_id': enseignement.enseignant_id,
+            'classe_id': enseignement.classe_id,
+            'session_id': instance.session_id,
+        }
+    if isinstance(instance, Note):
+        contexte = _contexte_note(instance, origin)
+        return {
+            'etudiant_id': instance.etudiant_id,
+            'enseignant_id': contexte.get('enseignant_id'),
+            'classe_id': contexte.get('classe_id'),
+            'session_id': contexte.get('session_id'),
+        }
+    portee = {'etudiant_id': instance.etudiant_id, 'session_id': instance.session_id}
+    if isinstance(instance, MoyenneSemestre):
+        portee['classe_id'] = instance.classe_id
+    return portee
+
+
+# Suppressions après lesquelles la moyenne EC de l'étudiant reste à recalculer.
+# Les autres (étudiant, EC, session, année, classe...) emportent la moyenne
+# ou ses références : marquer la cellule n'aurait pas de sens.
+ORIGINES_RECALCUL = (Note, Evaluation, Enseignement, TypeEvaluation)
+
+
+@receiver(post_delete, sender=Note)
+def marquer_moyenne_note_supprimee(sender, instance, origin=None, **kwargs):
+    """
+    La moyenne EC dépendant de la note est à recalculer. Reçu aussi pour
+    les suppressions en cascade et QuerySet.delete(), contrairement à une
+    surcharge de Note.delete().
+    """
+    modele_origine = getattr(origin, 'model', type(origin))
+    if origin is not None and not issubclass(modele_origine, ORIGINES_RECALCUL):
+        return
+
+    contexte = _contexte_note(instance, origin)
+    if contexte:
+        MoyenneARecalculer.marquer([(
+            instance.etudiant_id,
+            contexte['ec_id'],
+            contexte['session_id'],
+            contexte['annee_academique_id']
+        )])
+
+
+@receiver(post_save, sender=MoyenneSemestre)
+@receiver(post_delete, sender=MoyenneSemestre)
+def invalider_statistiques(sender, instance, **kwargs):
+    """Les statistiques en cache de la classe ne sont plus à jour"""
+    invalider_statistiques_semestre(instance.classe_id, instance.session_id)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+@receiver(post_save, sender=MoyenneEC)
+@receiver(post_delete, sender=MoyenneEC)
+@receiver(post_save, sender=MoyenneUE)
+@receiver(post_delete, sender=MoyenneUE)
+@receiver(post_save, sender=MoyenneSemestre)
+@receiver(post_delete, sender=MoyenneSemestre)
+def invalider_releve(sender, instance, **kwargs):
+    """Le relevé en cache de l'étudiant n'est plus à jour"""
+    NoteService.invalider_releves([instance.etudiant_id])
+
+
+@receiver(post_save, sender=Evaluation)
+def invalider_releves_evaluation(sender, instance, raw=False, **kwargs):
+    """Le relevé affiche le nom, le type et la date de l'évaluation"""
+    if not raw:
+        NoteService.invalider_releves(
+            Note.objects.filter(evaluation=instance).values_list('etudiant_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=EC)
+def invalider_releves_ec(sender, instance, raw=False, **kwargs):
+    """Relevés des seuls étudiants ayant des notes ou une moyenne dans l'EC"""
+    if not raw:
+        NoteService.invalider_releves(chain(
+            Note.objects.filter(evaluation__enseignement__ec=instance).values_list('etudiant_id', flat=True),
+            MoyenneEC.objects.filter(ec=instance).values_list('etudiant_id', flat=True)
+        ))
+
+
+@receiver(post_save, sender=User)
+def invalider_releve_utilisateur(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Le relevé affiche le nom et le matricule de l'étudiant"""
+    if raw or instance.type_utilisateur != 'etudiant' or update_fields == frozenset(['last_login']):
+        return
+    NoteService.invalider_releves(
+        Etudiant.objects.filter(user=instance).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Etudiant)
+def invalider_releve_etudiant(sender, instance, raw=False, **kwargs):
+    """Modification du profil étudiant affiché par le relevé"""
+    if not raw:
+        NoteService.invalider_releves([instance.pk])
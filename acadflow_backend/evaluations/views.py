@@ -2,7 +2,7 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Avg, Count, Sum, F
+from django.db.models import Q, Avg, Count, Sum, F, Max
 from django.db import transaction
 from django.core.paginator import Paginator
 from django.utils import timezone
@@ -18,23 +18,33 @@ from .serializers import (
     SaisieNotesSerializer
 )
 from core.permissions import IsEnseignantOrReadOnly, IsEtudiantOwner
-from users.models import Inscription, Etudiant
+from core.mixins import SynchronisationMixin, GetConditionnelMixin
+from core.statistiques import statistiques_distribution, STATISTIQUES_SEMESTRE
+from core import cache as cache_versionne
+from users.models import User, Inscription, Etudiant
 
 # Import conditionnel pour les utilitaires
 try:
-    from core.utils import calculer_moyenne_ec, calculer_moyenne_ue, calculer_moyenne_semestre
+    from core.utils import (
+        calculer_moyenne_ec, calculer_moyennes_ec_classe, calculer_moyennes_ec_en_base,
+        calculer_moyenne_ue, calculer_moyenne_semestre
+    )
 except ImportError:
     # Fonctions simplifiées si les utilitaires ne sont pas disponibles
     def calculer_moyenne_ec(etudiant, ec, session, annee_academique):
         return None
+    def calculer_moyennes_ec_classe(classe, session, ecs=None, etudiants=None):
+        return []
+    def calculer_moyennes_ec_en_base(classe, session, ecs=None, etudiants=None):
+        return {}
     def calculer_moyenne_ue(etudiant, ue, session, annee_academique):
         return None
     def calculer_moyenne_semestre(etudiant, classe, semestre, session, annee_academique):
         return None
 
 # New imports for notifications and planning
-from core.services import AutomationService, NotificationService
-from academics.models import Classe, Session
+from core.services import AutomationService, NotificationService, NoteService
+from academics.models import Classe, Session, Semestre, UE, EC
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import get_object_or_404
@@ -63,13 +73,14 @@ class EnseignantPlanningView(APIView):
 
         # Fetch planning data for the teacher
         # For example, upcoming evaluations and deadlines
-        evaluations_a_venir = Evaluation.objects.filter(
-            enseignement__enseignant__id=enseignant_id,
+        evaluations = EvaluationSerializer.optimiser_queryset(
+            Evaluation.objects.filter(enseignement__enseignant__id=enseignant_id)
+        )
+        evaluations_a_venir = evaluations.filter(
             date_evaluation__gte=timezone.now()
         ).order_by('date_evaluation')[:10]
 
-        prochaines_echeances = Evaluation.objects.filter(
-            enseignement__enseignant__id=enseignant_id,
+        prochaines_echeances = evaluations.filter(
             date_limite_saisie__gte=timezone.now()
         ).order_by('date_limite_saisie')[:10]
 
@@ -171,9 +182,9 @@ class EnseignementViewSet(viewsets.ModelViewSet):
     def evaluations(self, request, pk=None):
         """Toutes les évaluations d'un enseignement"""
         enseignement = self.get_object()
-        evaluations = Evaluation.objects.filter(
-            enseignement=enseignement
-        ).select_related('type_evaluation', 'session')
+        evaluations = EvaluationSerializer.optimiser_queryset(
+            Evaluation.objects.filter(enseignement=enseignement)
+        )
         
         serializer = EvaluationSerializer(evaluations, many=True)
         return Response(serializer.data)
@@ -210,13 +221,15 @@ class EnseignementViewSet(viewsets.ModelViewSet):
         
         return Response(sorted(etudiants, key=lambda x: x['matricule']))
 
-class EvaluationViewSet(viewsets.ModelViewSet):
+class EvaluationViewSet(SynchronisationMixin, viewsets.ModelViewSet):
     queryset = Evaluation.objects.all()
     serializer_class = EvaluationSerializer
     permission_classes = [IsEnseignantOrReadOnly]
+    portee_utilisateurs = ('enseignant',)
+    portee_parametres = {'session': 'session_id'}
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = EvaluationSerializer.optimiser_queryset(super().get_queryset())
         
         if self.request.user.type_utilisateur == 'enseignant':
             queryset = queryset.filter(enseignement__enseignant__user=self.request.user)
@@ -236,7 +249,12 @@ class EvaluationViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def feuille_notes(self, request, pk=None):
-        """Feuille de notes pour une évaluation"""
+        """
+        Feuille de notes pour une évaluation.
+        
+        Avec ?compact=1, les données sont renvoyées en colonnes (tableaux
+        parallèles), plus légères pour les grandes classes.
+        """
         evaluation = self.get_object()
         from users.models import Inscription
         
@@ -245,30 +263,51 @@ class EvaluationViewSet(viewsets.ModelViewSet):
             classe=evaluation.enseignement.classe,
             annee_academique=evaluation.enseignement.annee_academique,
             active=True
-        ).select_related('etudiant__user').order_by('etudiant__user__matricule')
+        ).select_related('etudiant__user').only(
+            'etudiant__id', 'etudiant__user__matricule',
+            'etudiant__user__first_name', 'etudiant__user__last_name'
+        ).order_by('etudiant__user__matricule')
+        
+        # Toutes les notes de l'évaluation en une requête
+        notes = {
+            note.etudiant_id: note
+            for note in Note.objects.filter(evaluation=evaluation).only(
+                'etudiant_id', 'note_obtenue', 'absent', 'justifie', 'commentaire'
+            )
+        }
         
         feuille = {
             'evaluation': EvaluationSerializer(evaluation).data,
-            'etudiants': []
+            'version': NoteService.version_feuille(evaluation)
         }
         
-        for inscription in inscriptions:
-            # Récupérer la note existante si elle existe
-            note_obj = Note.objects.filter(
-                etudiant=inscription.etudiant,
-                evaluation=evaluation
-            ).first()
-            
-            etudiant_data = {
-                'etudiant_id': inscription.etudiant.id,
-                'matricule': inscription.etudiant.user.matricule,
-                'nom_complet': inscription.etudiant.user.get_full_name(),
-                'note_obtenue': note_obj.note_obtenue if note_obj else None,
-                'absent': note_obj.absent if note_obj else False,
-                'justifie': note_obj.justifie if note_obj else False,
-                'commentaire': note_obj.commentaire if note_obj else ''
+        if request.query_params.get('compact') in ('1', 'true'):
+            colonnes = {
+                'etudiant_id': [], 'matricule': [], 'nom_complet': [],
+                'note_obtenue': [], 'absent': [], 'justifie': []
             }
-            feuille['etudiants'].append(etudiant_data)
+            commentaires = {}
+            
+            for inscription in inscriptions:
+                etudiant = inscription.etudiant
+                note_obj = notes.get(etudiant.id)
+                colonnes['etudiant_id'].append(etudiant.id)
+                colonnes['matricule'].append(etudiant.user.matricule)
+                colonnes['nom_complet'].append(etudiant.user.get_full_name())
+                colonnes['note_obtenue'].append(note_obj.note_obtenue if note_obj else None)
+                colonnes['absent'].append(note_obj.absent if note_obj else False)
+                colonnes['justifie'].append(note_obj.justifie if note_obj else False)
+                if note_obj and note_obj.commentaire:
+                    commentaires[etudiant.id] = note_obj.commentaire
+            
+            feuille['colonnes'] = colonnes
+            feuille['commentaires'] = commentaires
+            return Response(feuille)
+        
+        feuille['etudiants'] = [
+            self._ligne_feuille(inscription.etudiant, notes.get(inscription.etudiant.id))
+            for inscription in inscriptions
+        ]
         
         return Response(feuille)
     
@@ -293,68 +332,26 @@ class EvaluationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        erreurs = []
-        notes_sauvees = 0
-        
         try:
             with transaction.atomic():
-                for note_data in notes_data:
-                    etudiant_id = note_data.get('etudiant_id')
-                    note_obtenue = note_data.get('note_obtenue')
-                    absent = note_data.get('absent', False)
-                    justifie = note_data.get('justifie', False)
-                    commentaire = note_data.get('commentaire', '')
-                    
-                    if not etudiant_id:
-                        erreurs.append("etudiant_id manquant")
-                        continue
-                    
-                    try:
-                        from users.models import Etudiant
-                        etudiant = Etudiant.objects.get(id=etudiant_id)
-                        
-                        # Validation de la note
-                        if not absent and note_obtenue is not None:
-                            if note_obtenue < 0 or note_obtenue > evaluation.note_sur:
-                                erreurs.append(f"Note invalide pour {etudiant.user.matricule}: {note_obtenue}")
-                                continue
-                        
-                        # Créer ou mettre à jour la note
-                        note, created = Note.objects.update_or_create(
-                            etudiant=etudiant,
-                            evaluation=evaluation,
-                            defaults={
-                                'note_obtenue': note_obtenue or 0,
-                                'absent': absent,
-                                'justifie': justifie,
-                                'commentaire': commentaire
-                            }
-                        )
-                        notes_sauvees += 1
-                        
-                    except Etudiant.DoesNotExist:
-                        erreurs.append(f"Étudiant ID {etudiant_id} non trouvé")
+                # Contrôle de version optionnel (feuille modifiée entre-temps)
+                version = request.data.get('version')
+                if version and self._verrouiller_feuille(evaluation) != version:
+                    return self._reponse_conflit(evaluation)
+                
+                resultat = NoteService.enregistrer_notes(evaluation, notes_data)
+                erreurs = resultat['erreurs']
+                notes_sauvees = resultat['notes_sauvees']
+                notes_inchangees = resultat['notes_inchangees']
                 
                 # Marquer la saisie comme terminée si toutes les notes sont saisies
                 if len(erreurs) == 0:
                     evaluation.saisie_terminee = True
                     evaluation.save()
-                    
-                    # Recalculer les moyennes EC pour tous les étudiants concernés
-                    from users.models import Inscription
-                    inscriptions = Inscription.objects.filter(
-                        classe=evaluation.enseignement.classe,
-                        annee_academique=evaluation.enseignement.annee_academique,
-                        active=True
-                    )
-                    
-                    for inscription in inscriptions:
-                        calculer_moyenne_ec(
-                            inscription.etudiant,
-                            evaluation.enseignement.ec,
-                            evaluation.session,
-                            evaluation.enseignement.annee_academique
-                        )
+                
+                tache = None
+                if resultat['notes_creees'] or resultat['notes_modifiees']:
+                    tache = self._planifier_calcul_moyennes(evaluation)
         
         except Exception as e:
             return Response(
@@ -364,37 +361,218 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         
         return Response({
             'message': f'{notes_sauvees} notes sauvegardées',
+            'notes_sauvees': notes_sauvees,
+            'notes_inchangees': notes_inchangees,
             'erreurs': erreurs,
-            'saisie_terminee': evaluation.saisie_terminee
+            'saisie_terminee': evaluation.saisie_terminee,
+            'tache_calcul_moyennes': tache
+        })
+    
+    @action(detail=True, methods=['patch'])
+    def modifier_notes(self, request, pk=None):
+        """
+        Saisie différentielle : seules les lignes modifiées sont envoyées avec
+        la version de la feuille lue. Une version périmée est refusée (409).
+        """
+        evaluation = self.get_object()
+        
+        # Vérifier les permissions
+        if (request.user.type_utilisateur == 'enseignant' and 
+            evaluation.enseignement.enseignant.user != request.user):
+            return Response(
+                {'error': 'Vous ne pouvez modifier que vos propres évaluations'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        version = request.data.get('version')
+        notes_data = request.data.get('notes', [])
+        
+        if not version:
+            return Response(
+                {'error': 'version requise'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            with transaction.atomic():
+                if self._verrouiller_feuille(evaluation) != version:
+                    return self._reponse_conflit(evaluation)
+                
+                resultat = NoteService.enregistrer_notes(evaluation, notes_data)
+                nouvelle_version = NoteService.version_feuille(evaluation)
+                
+                notes_ecrites = resultat['notes_creees'] + resultat['notes_modifiees']
+                tache = self._planifier_calcul_moyennes(evaluation) if notes_ecrites else None
+        
+        except Exception as e:
+            return Response(
+                {'error': f'Erreur lors de la saisie: {str(e)}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        reponse = {
+            'version': nouvelle_version,
+            'erreurs': resultat['erreurs'],
+            'etudiants': [self._ligne_feuille(note.etudiant, note) for note in notes_ecrites]
+        }
+        if tache:
+            reponse['tache_calcul_moyennes'] = tache
+        
+        return Response(reponse)
+    
+    @action(detail=True, methods=['post'])
+    def importer_notes(self, request, pk=None):
+        """Import des notes depuis un fichier CSV ou XLSX (colonnes matricule, note)"""
+        evaluation = self.get_object()
+        
+        # Vérifier les permissions
+        if (request.user.type_utilisateur == 'enseignant' and 
+            evaluation.enseignement.enseignant.user != request.user):
+            return Response(
+                {'error': 'Vous ne pouvez modifier que vos propres évaluations'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        fichier = request.FILES.get('fichier')
+        if not fichier:
+            return Response(
+                {'error': 'Fichier requis'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            with transaction.atomic():
+                version = request.data.get('version')
+                if version and self._verrouiller_feuille(evaluation) != version:
+                    return self._reponse_conflit(evaluation)
+                
+                resultat = NoteService.importer_notes(evaluation, fichier)
+                if resultat['notes_sauvees']:
+                    resultat['tache_calcul_moyennes'] = self._planifier_calcul_moyennes(evaluation)
+        
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {'error': f"Erreur lors de l'import: {str(e)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        resultat['version'] = NoteService.version_feuille(evaluation)
+        return Response(resultat)
+    
+    def _planifier_calcul_moyennes(self, evaluation):
+        """Recalcul des moyennes hors requête, regroupé avec les saisies proches"""
+        tache = AutomationService.planifier_calcul_moyennes(
+            evaluation.enseignement.classe,
+            evaluation.enseignement.ec,
+            evaluation.session
+        )
+        return {
+            'id': tache.id,
+            'statut': tache.statut,
+            'date_planifiee': tache.date_planifiee
+        }
+    
+    def _verrouiller_feuille(self, evaluation):
+        """Verrouille l'évaluation jusqu'à la fin de la transaction et retourne la version courante"""
+        Evaluation.objects.select_for_update().filter(pk=evaluation.pk).exists()
+        return NoteService.version_feuille(evaluation)
+    
+    def _reponse_conflit(self, evaluation):
+        return Response(
+            {
+                'error': 'La feuille de notes a été modifiée entre-temps, rechargez-la',
+                'version': NoteService.version_feuille(evaluation)
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    @staticmethod
+    def _ligne_feuille(etudiant, note_obj):
+        return {
+            'etudiant_id': etudiant.id,
+            'matricule': etudiant.user.matricule,
+            'nom_complet': etudiant.user.get_full_name(),
+            'note_obtenue': note_obj.note_obtenue if note_obj else None,
+            'absent': note_obj.absent if note_obj else False,
+            'justifie': note_obj.justifie if note_obj else False,
+            'commentaire': note_obj.commentaire if note_obj else ''
+        }
+    
+    @action(detail=True, methods=['get'])
+    def calcul_moyennes(self, request, pk=None):
+        """Suivi du recalcul des moyennes déclenché par la saisie des notes"""
+        from evaluations.models import TacheAutomatisee, MoyenneARecalculer
+        
+        evaluation = self.get_object()
+        enseignement = evaluation.enseignement
+        
+        taches = TacheAutomatisee.objects.filter(
+            type_tache='calcul_moyennes',
+            classe=enseignement.classe,
+            ec=enseignement.ec,
+            session=evaluation.session
+        )
+        tache_id = request.query_params.get('tache_id')
+        tache = taches.filter(id=tache_id).first() if tache_id else taches.order_by('-created_at').first()
+        
+        if not tache:
+            return Response(
+                {'error': 'Aucun recalcul trouvé'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'id': tache.id,
+            'statut': tache.statut,
+            'date_planifiee': tache.date_planifiee,
+            'date_execution': tache.date_execution,
+            'date_fin': tache.date_fin,
+            'resultats': tache.resultats,
+            'erreurs': tache.erreurs,
+            'moyennes_en_attente': MoyenneARecalculer.objects.filter(
+                ec=enseignement.ec,
+                session=evaluation.session,
+                etudiant__inscription__classe=enseignement.classe,
+                etudiant__inscription__active=True
+            ).count()
         })
     
     @action(detail=True, methods=['get'])
     def statistiques(self, request, pk=None):
         """Statistiques d'une évaluation"""
         evaluation = self.get_object()
-        notes = Note.objects.filter(evaluation=evaluation, absent=False)
+        resultat = statistiques_distribution(
+            Note.objects.filter(evaluation=evaluation),
+            'note_obtenue',
+            filtre=Q(absent=False),
+            nombre_absents=Count('id', filter=Q(absent=True))
+        )
         
-        if not notes.exists():
+        if not resultat['nombre']:
             return Response({
                 'message': 'Aucune note saisie',
                 'nombre_notes': 0
             })
         
-        notes_values = [note.note_obtenue for note in notes]
-        
+        mentions = resultat['mentions']
         stats = {
             'evaluation': EvaluationSerializer(evaluation).data,
-            'nombre_notes': len(notes_values),
-            'nombre_absents': Note.objects.filter(evaluation=evaluation, absent=True).count(),
-            'moyenne': sum(notes_values) / len(notes_values),
-            'note_max': max(notes_values),
-            'note_min': min(notes_values),
+            'nombre_notes': resultat['nombre'],
+            'nombre_absents': resultat['nombre_absents'],
+            'moyenne': resultat['moyenne'],
+            'note_max': resultat['max'],
+            'note_min': resultat['min'],
             'repartition': {
-                'excellents': len([n for n in notes_values if n >= 16]),
-                'bien': len([n for n in notes_values if 14 <= n < 16]),
-                'assez_bien': len([n for n in notes_values if 12 <= n < 14]),
-                'passable': len([n for n in notes_values if 10 <= n < 12]),
-                'insuffisant': len([n for n in notes_values if n < 10])
+                'excellents': mentions['tres_bien'],
+                'bien': mentions['bien'],
+                'assez_bien': mentions['assez_bien'],
+                'passable': mentions['passable'],
+                'insuffisant': mentions['insuffisant']
             }
         }
         
@@ -460,10 +638,13 @@ class EvaluationViewSet(viewsets.ModelViewSet):
             'nouvelle_date_limite': evaluation.date_limite_saisie
         })
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(GetConditionnelMixin, SynchronisationMixin, viewsets.ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = NoteSerializer
+    modeles_dependants = (User, Evaluation)
     permission_classes = [permissions.IsAuthenticated]
+    portee_utilisateurs = ('etudiant', 'enseignant')
+    portee_parametres = {'etudiant': 'etudiant_id', 'session': 'session_id'}
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -492,7 +673,11 @@ class NoteViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def releve_notes_etudiant(self, request):
-        """Relevé de notes complet pour un étudiant"""
+        """
+        Relevé de notes complet pour un étudiant : notes par EC, moyennes UE
+        et semestrielles. Mis en cache par étudiant et session, invalidé à
+        chaque modification de ses notes ou moyennes.
+        """
         etudiant_id = request.query_params.get('etudiant')
         session_id = request.query_params.get('session')
         
@@ -502,9 +687,17 @@ class NoteViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        try:
+            etudiant_id, session_id = int(etudiant_id), int(session_id)
+        except ValueError:
+            return Response(
+                {'error': 'etudiant_id et session_id doivent être des entiers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Vérifier les permissions
         if (request.user.type_utilisateur == 'etudiant' and 
-            str(request.user.etudiant.id) != etudiant_id):
+            request.user.etudiant.id != etudiant_id):
             return Response(
                 {'error': 'Accès non autorisé'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -512,49 +705,100 @@ class NoteViewSet(viewsets.ModelViewSet):
         
         from users.models import Etudiant
         try:
-            etudiant = Etudiant.objects.get(id=etudiant_id)
+            if request.user.type_utilisateur == 'enseignant':
+                # Limité aux notes de ses évaluations : pas de cache partagé
+                etudiant = Etudiant.objects.select_related('user').get(id=etudiant_id)
+                session = Session.objects.get(id=session_id)
+                releve = NoteService.construire_releves(
+                    [etudiant], session, notes=self.get_queryset()
+                )[etudiant.id]
+            else:
+                releve = NoteService.releve_en_cache(etudiant_id, session_id)
         except Etudiant.DoesNotExist:
             return Response(
                 {'error': 'Étudiant non trouvé'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        except Session.DoesNotExist:
+            return Response(
+                {'error': 'Session non trouvée'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        # Notes par EC
-        notes = self.get_queryset().filter(
-            etudiant=etudiant,
-            evaluation__session_id=session_id
-        ).select_related('evaluation__enseignement__ec', 'evaluation__type_evaluation')
-        
-        # Organiser par EC
-        notes_par_ec = {}
-        for note in notes:
-            ec_id = note.evaluation.enseignement.ec.id
-            if ec_id not in notes_par_ec:
-                notes_par_ec[ec_id] = {
-                    'ec': {
-                        'id': note.evaluation.enseignement.ec.id,
-                        'code': note.evaluation.enseignement.ec.code,
-                        'nom': note.evaluation.enseignement.ec.nom,
-                        'ue': note.evaluation.enseignement.ec.ue.nom
-                    },
-                    'notes': []
-                }
-            
-            notes_par_ec[ec_id]['notes'].append(NoteSerializer(note).data)
+        return Response(releve)
+    
+    @action(detail=False, methods=['get'])
+    def releves_pdf(self, request):
+        """
+        Archive ZIP des relevés de notes PDF d'une ou plusieurs classes.
+        
+        Les PDF sont rendus en parallèle par un pool de processus et l'archive
+        est envoyée au fur et à mesure, sans fichiers intermédiaires.
+        """
+        from django.http import StreamingHttpResponse
+        from academics.models import Classe, Session
+        from core.rendu_pdf import flux_archive_pdf
+        from core.services import NoteService
+        
+        if request.user.type_utilisateur not in ['admin', 'scolarite', 'direction']:
+            return Response(
+                {'error': 'Permission refusée'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        return Response({
-            'etudiant': {
-                'id': etudiant.id,
-                'matricule': etudiant.user.matricule,
-                'nom_complet': etudiant.user.get_full_name()
-            },
-            'notes_par_ec': list(notes_par_ec.values())
-        })
+        session_id = request.query_params.get('session')
+        classes_ids = request.query_params.get('classes')
+        annee_id = request.query_params.get('annee_academique')
+        
+        if not session_id or not (classes_ids or annee_id):
+            return Response(
+                {'error': 'session et classes (ou annee_academique) requis'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            session = Session.objects.get(id=session_id)
+            classes = Classe.objects.filter(active=True).select_related('annee_academique')
+            if classes_ids:
+                classes = classes.filter(id__in=[int(i) for i in classes_ids.split(',')])
+            else:
+                classes = classes.filter(annee_academique_id=annee_id)
+            classes = list(classes.order_by('code'))
+        except (Session.DoesNotExist, ValueError):
+            return Response(
+                {'error': 'Paramètres invalides'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not classes:
+            return Response(
+                {'error': 'Aucune classe trouvée'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        def travaux():
+            for classe in classes:
+                for releve in NoteService.releves_notes(classe, session):
+                    yield (
+                        f"{classe.code}/releve_{releve['etudiant']['matricule']}_{session.code}.pdf",
+                        'releve',
+                        releve
+                    )
+        
+        reponse = StreamingHttpResponse(
+            flux_archive_pdf(travaux()),
+            content_type='application/zip'
+        )
+        reponse['Content-Disposition'] = f'attachment; filename="releves_{session.code}.zip"'
+        return reponse
 
-class MoyenneECViewSet(viewsets.ReadOnlyModelViewSet):
+class MoyenneECViewSet(GetConditionnelMixin, SynchronisationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = MoyenneEC.objects.all()
     serializer_class = MoyenneECSerializer
+    modeles_dependants = (User, EC)
     permission_classes = [IsEtudiantOwner]
+    portee_utilisateurs = ('etudiant',)
+    portee_parametres = {'etudiant': 'etudiant_id', 'session': 'session_id'}
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -601,42 +845,18 @@ class MoyenneECViewSet(viewsets.ReadOnlyModelViewSet):
         try:
             from academics.models import Classe, Session
             from academics.models import EC
-            from users.models import Inscription
             
-            classe = Classe.objects.get(id=classe_id)
+            classe = Classe.objects.select_related('annee_academique').get(id=classe_id)
             session = Session.objects.get(id=session_id)
             
-            # Récupérer les étudiants de la classe
-            inscriptions = Inscription.objects.filter(
-                classe=classe,
-                active=True
-            )
+            # Récupérer les EC à traiter (par défaut tous les EC du niveau)
+            ecs = [EC.objects.get(id=ec_id)] if ec_id else None
             
-            # Récupérer les EC à traiter
-            if ec_id:
-                ecs = [EC.objects.get(id=ec_id)]
-            else:
-                # Tous les EC du niveau
-                ecs = EC.objects.filter(
-                    ue__niveau=classe.niveau,
-                    actif=True
-                )
-            
-            moyennes_calculees = 0
-            
-            for inscription in inscriptions:
-                for ec in ecs:
-                    moyenne = calculer_moyenne_ec(
-                        inscription.etudiant,
-                        ec,
-                        session,
-                        classe.annee_academique
-                    )
-                    if moyenne:
-                        moyennes_calculees += 1
+            moyennes = calculer_moyennes_ec_en_base(classe, session, ecs=ecs)
+            nombre_moyennes = sum(len(moyennes_etudiant) for moyennes_etudiant in moyennes.values())
             
             return Response({
-                'message': f'{moyennes_calculees} moyennes EC recalculées'
+                'message': f'{nombre_moyennes} moyennes EC recalculées'
             })
             
         except Exception as e:
@@ -645,10 +865,12 @@ class MoyenneECViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class MoyenneUEViewSet(viewsets.ReadOnlyModelViewSet):
+class MoyenneUEViewSet(GetConditionnelMixin, SynchronisationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = MoyenneUE.objects.all()
     serializer_class = MoyenneUESerializer
+    modeles_dependants = (User, UE)
     permission_classes = [IsEtudiantOwner]
+    portee_utilisateurs = ('etudiant',)
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -677,30 +899,16 @@ class MoyenneUEViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         try:
-            from academics.models import Classe, Session, UE
-            from users.models import Inscription
+            from academics.models import Classe, Session
+            from core.matrice_notes import recalculer_moyennes_ue_classe
             
             classe = Classe.objects.get(id=classe_id)
             session = Session.objects.get(id=session_id)
             
-            inscriptions = Inscription.objects.filter(classe=classe, active=True)
-            ues = UE.objects.filter(niveau=classe.niveau, actif=True)
-            
-            moyennes_calculees = 0
-            
-            for inscription in inscriptions:
-                for ue in ues:
-                    moyenne = calculer_moyenne_ue(
-                        inscription.etudiant,
-                        ue,
-                        session,
-                        classe.annee_academique
-                    )
-                    if moyenne:
-                        moyennes_calculees += 1
+            moyennes = recalculer_moyennes_ue_classe(classe, session)
             
             return Response({
-                'message': f'{moyennes_calculees} moyennes UE recalculées'
+                'message': f'{len(moyennes)} moyennes UE recalculées'
             })
             
         except Exception as e:
@@ -709,10 +917,12 @@ class MoyenneUEViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class MoyenneSemestreViewSet(viewsets.ReadOnlyModelViewSet):
+class MoyenneSemestreViewSet(GetConditionnelMixin, SynchronisationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = MoyenneSemestre.objects.all()
     serializer_class = MoyenneSemestreSerializer
+    modeles_dependants = (User, Classe, Semestre)
     permission_classes = [IsEtudiantOwner]
+    portee_utilisateurs = ('etudiant',)
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -740,40 +950,46 @@ class MoyenneSemestreViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        moyennes = self.get_queryset().filter(
-            classe_id=classe_id,
-            session_id=session_id
-        )
+        try:
+            cle = (int(classe_id), int(session_id))
+        except ValueError:
+            return Response(
+                {'error': 'classe_id et session_id doivent être des entiers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if not moyennes.exists():
+        def calculer():
+            return statistiques_distribution(
+                self.get_queryset().filter(classe_id=cle[0], session_id=cle[1]),
+                'moyenne_generale',
+                moyenne_credits_obtenus=Avg('credits_obtenus'),
+                total_credits_requis=Max('credits_requis')
+            )
+        
+        # Invalidé à chaque modification des moyennes semestrielles de la classe
+        resultat = cache_versionne.obtenir(STATISTIQUES_SEMESTRE, cle, calculer)
+        
+        if not resultat['nombre']:
             return Response({
                 'message': 'Aucune moyenne trouvée',
                 'nombre_etudiants': 0
             })
         
-        moyennes_values = [m.moyenne_generale for m in moyennes]
-        
+        mentions = resultat['mentions']
+        admis = mentions['tres_bien'] + mentions['bien'] + mentions['assez_bien'] + mentions['passable']
         stats = {
             'classe_id': classe_id,
             'session_id': session_id,
-            'nombre_etudiants': moyennes.count(),
-            'moyenne_classe': sum(moyennes_values) / len(moyennes_values),
-            'moyenne_max': max(moyennes_values),
-            'moyenne_min': min(moyennes_values),
-            'taux_reussite': moyennes.filter(moyenne_generale__gte=10).count(),
-            'taux_reussite_pct': round(
-                (moyennes.filter(moyenne_generale__gte=10).count() / moyennes.count()) * 100, 2
-            ),
-            'mentions': {
-                'tres_bien': moyennes.filter(moyenne_generale__gte=16).count(),
-                'bien': moyennes.filter(moyenne_generale__gte=14, moyenne_generale__lt=16).count(),
-                'assez_bien': moyennes.filter(moyenne_generale__gte=12, moyenne_generale__lt=14).count(),
-                'passable': moyennes.filter(moyenne_generale__gte=10, moyenne_generale__lt=12).count(),
-                'insuffisant': moyennes.filter(moyenne_generale__lt=10).count(),
-            },
+            'nombre_etudiants': resultat['nombre'],
+            'moyenne_classe': resultat['moyenne'],
+            'moyenne_max': resultat['max'],
+            'moyenne_min': resultat['min'],
+            'taux_reussite': admis,
+            'taux_reussite_pct': round(admis / resultat['nombre'] * 100, 2),
+            'mentions': mentions,
             'credits': {
-                'moyenne_credits_obtenus': moyennes.aggregate(Avg('credits_obtenus'))['credits_obtenus__avg'] or 0,
-                'total_credits_requis': moyennes.first().credits_requis if moyennes.exists() else 0
+                'moyenne_credits_obtenus': resultat['moyenne_credits_obtenus'] or 0,
+                'total_credits_requis': resultat['total_credits_requis'] or 0
             }
         }
         
@@ -798,31 +1014,16 @@ class MoyenneSemestreViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         try:
-            from academics.models import Classe, Session, Semestre
-            from users.models import Inscription
+            from academics.models import Classe, Session
+            from core.matrice_notes import recalculer_moyennes_semestre_classe
             
             classe = Classe.objects.get(id=classe_id)
             session = Session.objects.get(id=session_id)
             
-            inscriptions = Inscription.objects.filter(classe=classe, active=True)
-            semestres = Semestre.objects.all()
-            
-            moyennes_calculees = 0
-            
-            for inscription in inscriptions:
-                for semestre in semestres:
-                    moyenne = calculer_moyenne_semestre(
-                        inscription.etudiant,
-                        classe,
-                        semestre,
-                        session,
-                        classe.annee_academique
-                    )
-                    if moyenne:
-                        moyennes_calculees += 1
+            moyennes = recalculer_moyennes_semestre_classe(classe, session)
             
             return Response({
-                'message': f'{moyennes_calculees} moyennes semestrielles recalculées'
+                'message': f'{len(moyennes)} moyennes semestrielles recalculées'
             })
             
         except Exception as e:
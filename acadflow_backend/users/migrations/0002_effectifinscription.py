@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remplir_effectifs(apps, schema_editor):
+    Inscription = apps.get_model('users', 'Inscription')
+    EffectifInscription = apps.get_model('users', 'EffectifInscription')
+
+    agregats = Inscription.objects.filter(active=True).values(
+        'annee_academique_id', 'classe_id', 'classe__filiere_id', 'classe__niveau_id', 'statut_id'
+    ).annotate(
+        total=models.Count('id'),
+        total_redoublants=models.Count('id', filter=models.Q(nombre_redoublements__gt=0))
+    ).order_by()
+    EffectifInscription.objects.bulk_create([
+        EffectifInscription(
+            annee_academique_id=agregat['annee_academique_id'],
+            classe_id=agregat['classe_id'],
+            filiere_id=agregat['classe__filiere_id'],
+            niveau_id=agregat['classe__niveau_id'],
+            statut_id=agregat['statut_id'],
+            nombre=agregat['total'],
+            redoublants=agregat['total_redoublants']
+        )
+        for agregat in agregats
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0001_initial'),
+        ('core', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectifInscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.IntegerField(default=0)),
+                ('redoublants', models.IntegerField(default=0)),
+                ('annee_academique', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.anneeacademique')),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.classe')),
+                ('filiere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.filiere')),
+                ('niveau', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.niveau')),
+                ('statut', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.statutetudiant')),
+            ],
+            options={
+                'db_table': 'effectifs_inscriptions',
+                'indexes': [models.Index(fields=['annee_academique', 'filiere'], name='effectifs_i_annee_a_77d6a8_idx'), models.Index(fields=['annee_academique', 'niveau'], name='effectifs_i_annee_a_92f8db_idx')],
+                'unique_together': {('annee_academique', 'classe', 'statut')},
+            },
+        ),
+        migrations.RunPython(remplir_effectifs, migrations.RunPython.noop),
+    ]
@@ -120,6 +120,99 @@ class Inscription(TimestampedModel):
         db_table = 'inscriptions'
         unique_together = ['etudiant', 'annee_academique', 'active']
 
+class EffectifInscription(models.Model):
+    """
+    Effectif des inscriptions actives par (année, classe, statut).
+
+    Tenu à jour par les signaux de Inscription ; la filière et le niveau de
+    la classe sont recopiés pour que les tableaux de bord les regroupent
+    sans jointure. `reconstruire` recalcule la table depuis les inscriptions.
+    """
+    annee_academique = models.ForeignKey('academics.AnneeAcademique', on_delete=models.CASCADE)
+    classe = models.ForeignKey('academics.Classe', on_delete=models.CASCADE)
+    filiere = models.ForeignKey('core.Filiere', on_delete=models.CASCADE)
+    niveau = models.ForeignKey('core.Niveau', on_delete=models.CASCADE)
+    statut = models.ForeignKey(StatutEtudiant, on_delete=models.CASCADE)
+    nombre = models.IntegerField(default=0)
+    redoublants = models.IntegerField(default=0)
+    
+    @classmethod
+    def ajuster(cls, annee_academique_id, classe_id, statut_id, nombre, redoublants=0, creer=True):
+        """Ajoute `nombre` (et `redoublants`) à l'effectif d'une combinaison"""
+        from academics.models import Classe
+        
+        if not nombre and not redoublants:
+            return
+        lignes = cls.objects.filter(
+            annee_academique_id=annee_academique_id, classe_id=classe_id, statut_id=statut_id
+        )
+        modifiees = lignes.update(
+            nombre=models.F('nombre') + nombre,
+            redoublants=models.F('redoublants') + redoublants
+        )
+        if modifiees or not creer:
+            return
+        
+        classe = Classe.objects.only('filiere_id', 'niveau_id').get(pk=classe_id)
+        effectif, creee = cls.objects.get_or_create(
+            annee_academique_id=annee_academique_id, classe_id=classe_id, statut_id=statut_id,
+            defaults={
+                'filiere_id': classe.filiere_id, 'niveau_id': classe.niveau_id,
+                'nombre': nombre, 'redoublants': redoublants
+            }
+        )
+        if not creee:
+            # Ligne créée entre-temps par une autre transaction
+            lignes.update(
+                nombre=models.F('nombre') + nombre,
+                redoublants=models.F('redoublants') + redoublants
+            )
+    
+    @classmethod
+    def reconstruire(cls, annee_academique=None):
+        """Recalcule les effectifs depuis les inscriptions actives ; retourne le nombre de lignes"""
+        from django.db import transaction
+        
+        inscriptions = Inscription.objects.filter(active=True)
+        effectifs = cls.objects.all()
+        if annee_academique is not None:
+            inscriptions = inscriptions.filter(annee_academique=annee_academique)
+            effectifs = effectifs.filter(annee_academique=annee_academique)
+        
+        agregats = inscriptions.values(
+            'annee_academique_id', 'classe_id', 'classe__filiere_id', 'classe__niveau_id', 'statut_id'
+        ).annotate(
+            total=models.Count('id'),
+            total_redoublants=models.Count('id', filter=models.Q(nombre_redoublements__gt=0))
+        ).order_by()
+        
+        with transaction.atomic():
+            effectifs.delete()
+            lignes = cls.objects.bulk_create([
+                cls(
+                    annee_academique_id=agregat['annee_academique_id'],
+                    classe_id=agregat['classe_id'],
+                    filiere_id=agregat['classe__filiere_id'],
+                    niveau_id=agregat['classe__niveau_id'],
+                    statut_id=agregat['statut_id'],
+                    nombre=agregat['total'],
+                    redoublants=agregat['total_redoublants']
+                )
+                for agregat in agregats
+            ], batch_size=1000)
+        return len(lignes)
+    
+    def __str__(self):
+        return f"{self.classe} - {self.statut} : {self.nombre}"
+    
+    class Meta:
+        db_table = 'effectifs_inscriptions'
+        unique_together = ['annee_academique', 'classe', 'statut']
+        indexes = [
+            models.Index(fields=['annee_academique', 'filiere']),
+            models.Index(fields=['annee_academique', 'niveau']),
+        ]
+
 class HistoriqueStatut(TimestampedModel):
     """Historique des changements de statut"""
     etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE)
@@ -0,0 +1,98 @@
+# ========================================
+# FICHIER: users/signals.py
+# ========================================
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from academics.models import Classe
+from core.authentication import invalider_jetons, invalider_utilisateur
+
+from .models import User, Enseignant, Etudiant, Inscription, EffectifInscription
+
+
+def _contribution(annee_academique_id, classe_id, statut_id, active, nombre_redoublements):
+    """Clé et contribution (effectif, redoublants) d'une inscription aux effectifs"""
+    if not active:
+        return None
+    return (annee_academique_id, classe_id, statut_id), (1, 1 if nombre_redoublements > 0 else 0)
+
+
+@receiver(pre_save, sender=Inscription)
+def memoriser_etat_inscription(sender, instance, raw=False, **kwargs):
+    """Conserve l'état en base avant modification, pour ajuster les effectifs"""
+    instance._contribution_precedente = None
+    if raw or instance.pk is None:
+        return
+    etat = Inscription.objects.filter(pk=instance.pk).values_list(
+        'annee_academique_id', 'classe_id', 'statut_id', 'active', 'nombre_redoublements'
+    ).first()
+    if etat:
+        instance._contribution_precedente = _contribution(*etat)
+
+
+@receiver(post_save, sender=Inscription)
+def ajuster_effectifs(sender, instance, raw=False, **kwargs):
+    """Reporte la création, la modification ou la désactivation d'une inscription"""
+    if raw:
+        return
+    avant = getattr(instance, '_contribution_precedente', None)
+    apres = _contribution(
+        instance.annee_academique_id, instance.classe_id, instance.statut_id,
+        instance.active, instance.nombre_redoublements
+    )
+    if avant == apres:
+        return
+    if avant:
+        cle, (nombre, redoublants) = avant
+        EffectifInscription.ajuster(*cle, -nombre, -redoublants, creer=False)
+    if apres:
+        cle, (nombre, redoublants) = apres
+        EffectifInscription.ajuster(*cle, nombre, redoublants)
+
+
+@receiver(post_delete, sender=Inscription)
+def retirer_des_effectifs(sender, instance, **kwargs):
+    contribution = _contribution(
+        instance.annee_academique_id, instance.classe_id, instance.statut_id,
+        instance.active, instance.nombre_redoublements
+    )
+    if contribution:
+        cle, (nombre, redoublants) = contribution
+        # Pas de création : la classe peut être en cours de suppression
+        EffectifInscription.ajuster(*cle, -nombre, -redoublants, creer=False)
+
+
+@receiver(post_save, sender=Classe)
+def reporter_filiere_niveau(sender, instance, raw=False, **kwargs):
+    """Les effectifs recopient la filière et le niveau de la classe"""
+    if raw:
+        return
+    EffectifInscription.objects.filter(classe_id=instance.pk).exclude(
+        filiere_id=instance.filiere_id, niveau_id=instance.niveau_id
+    ).update(filiere_id=instance.filiere_id, niveau_id=instance.niveau_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalider_jeton_supprime(sender, instance, **kwargs):
+    """Déconnexion : le jeton ne doit plus être accepté par aucun processus"""
+    invalider_jetons([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalider_authentification_utilisateur(sender, instance, raw=False, **kwargs):
+    """Désactivation ou modification : l'utilisateur en cache n'est plus à jour"""
+    if not raw:
+        invalider_utilisateur(instance.pk)
+
+
+@receiver(post_save, sender=Enseignant)
+@receiver(post_delete, sender=Enseignant)
+@receiver(post_save, sender=Etudiant)
+@receiver(post_delete, sender=Etudiant)
+def invalider_authentification_profil(sender, instance, raw=False, **kwargs):
+    """Le profil est conservé avec l'utilisateur authentifié"""
+    if not raw:
+        invalider_utilisateur(instance.user_id)
@@ -8,12 +8,13 @@ from django.db.models import Q, Count, Avg, Sum
 from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
-from .models import User, Enseignant, Etudiant, StatutEtudiant, Inscription, HistoriqueStatut
+from .models import User, Enseignant, Etudiant, StatutEtudiant, Inscription, HistoriqueStatut, EffectifInscription
 from .serializers import (
     UserSerializer, EnseignantSerializer, EtudiantSerializer,
     StatutEtudiantSerializer, InscriptionSerializer, HistoriqueStatutSerializer,
     LoginSerializer
 )
+from core.contexte import ContexteAcademique
 from core.permissions import IsAdminOrScolarite, IsEtudiantOwner
 
 @api_view(['POST'])
@@ -169,10 +170,8 @@ class EnseignantViewSet(viewsets.ModelViewSet):
         from evaluations.models import Evaluation
         from evaluations.serializers import EvaluationSerializer
         
-        evaluations = Evaluation.objects.filter(
-            enseignement__enseignant=enseignant
-        ).select_related(
-            'enseignement__ec', 'enseignement__classe', 'type_evaluation', 'session'
+        evaluations = EvaluationSerializer.optimiser_queryset(
+            Evaluation.objects.filter(enseignement__enseignant=enseignant)
         ).order_by('date_evaluation')
         
         # Filtrer par date si spécifié
@@ -340,7 +339,7 @@ class EtudiantViewSet(viewsets.ModelViewSet):
         
         from academics.models import AnneeAcademique
         try:
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
         except AnneeAcademique.DoesNotExist:
             return Response(
                 {'error': 'Aucune année académique active'}, 
@@ -410,7 +409,7 @@ class InscriptionViewSet(viewsets.ModelViewSet):
             from academics.models import Classe, AnneeAcademique
             classe = Classe.objects.get(id=classe_id)
             statut = StatutEtudiant.objects.get(id=statut_id)
-            annee_active = AnneeAcademique.objects.get(active=True)
+            annee_active = ContexteAcademique.annee_active()
         except (Classe.DoesNotExist, StatutEtudiant.DoesNotExist, AnneeAcademique.DoesNotExist) as e:
             return Response(
                 {'error': f'Objet non trouvé: {str(e)}'}, 
@@ -460,22 +459,36 @@ class InscriptionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        inscriptions = self.get_queryset().filter(classe_id=classe_id)
+        if request.user.type_utilisateur == 'etudiant' or request.query_params.get('etudiant'):
+            # Limité aux inscriptions d'un étudiant, que la table des effectifs
+            # ne distingue pas : lecture directe
+            inscriptions = self.get_queryset().filter(classe_id=classe_id)
+            effectifs = inscriptions.values('statut_id', 'statut__nom', 'statut__actif').annotate(
+                total=Count('id'),
+                total_redoublants=Count('id', filter=Q(nombre_redoublements__gt=0))
+            )
+        else:
+            effectifs = EffectifInscription.objects.filter(classe_id=classe_id, nombre__gt=0)
+            annee_id = request.query_params.get('annee_academique', None)
+            if annee_id:
+                effectifs = effectifs.filter(annee_academique_id=annee_id)
+            effectifs = effectifs.values('statut_id', 'statut__nom', 'statut__actif').annotate(
+                total=Sum('nombre'),
+                total_redoublants=Sum('redoublants')
+            )
+        effectifs = list(effectifs.order_by('statut_id'))
         
         stats = {
-            'total_inscriptions': inscriptions.count(),
-            'par_statut': {},
+            'total_inscriptions': sum(ligne['total'] for ligne in effectifs),
+            'par_statut': {
+                ligne['statut__nom']: ligne['total']
+                for ligne in effectifs if ligne['statut__actif'] and ligne['total'] > 0
+            },
             'par_genre': {},
-            'redoublants': inscriptions.filter(nombre_redoublements__gt=0).count(),
+            'redoublants': sum(ligne['total_redoublants'] for ligne in effectifs),
             'moyenne_age': 0  # À calculer selon vos besoins
         }
         
-        # Statistiques par statut
-        for statut in StatutEtudiant.objects.filter(actif=True):
-            count = inscriptions.filter(statut=statut).count()
-            if count > 0:
-                stats['par_statut'][statut.nom] = count
-        
         return Response(stats)
 
 class StatutEtudiantViewSet(viewsets.ModelViewSet):